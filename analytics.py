@@ -0,0 +1,546 @@
+"""Offline analytics over recorded scan logs.
+
+Streams NDJSON session logs (session_*.ndjson, .ndjson.gz) and the text logs
+saved by the UI (logs/ble_*.txt) one record at a time and aggregates:
+
+- per device: adverts, visits and dwell time (adverts less than `gap` seconds
+  apart belong to one visit), RSSI distribution, decode hit rate, advert
+  rate, connect and send outcomes;
+- per hour: adverts, distinct devices and decoded adverts;
+- overall: advert rate, decode hit rate, connect/send/dispatch success rates.
+
+UUIDs are decoded again with the current decoder rules, so old and new logs
+are comparable. Each file is analysed on its own and the partial results are
+merged (visits that continue across files are joined), which lets several
+files, typically rotated .gz sessions, run in a process pool (--jobs).
+
+Results export as CSV (devices and hours) and, when NumPy or PyArrow is
+installed, as columns in .npz or Parquet files.
+
+    python analytics.py                              # every log in ./logs
+    python analytics.py logs/session_*.ndjson.gz --jobs 8 --csv devices.csv --hourly-csv hours.csv
+"""
+import argparse
+import csv
+import datetime
+import glob
+import json
+import os
+import re
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from decoder import UuidDecoder
+from device_filter import DeviceFilter, FilterError
+from replay import iter_text_adverts
+from session_log import iter_records, session_files
+
+DEFAULT_GAP = 30.0  # seconds without adverts that end a visit (PRESENCE_TTL in main.py)
+
+TEXT_CONNECT_START = re.compile(r'^\[\d\d:\d\d:\d\d\] \[CONNECT\] Attempting to connect to ([^ .]+)')
+TEXT_CONNECT_OK = re.compile(r'^\[\d\d:\d\d:\d\d\] \[CONNECT\] Successfully connected to ([^ .]+)')
+TEXT_CONNECT_FAILED = re.compile(r'^\[\d\d:\d\d:\d\d\] \[ERROR\] Connection failed')
+TEXT_SEND_RESULT = re.compile(r'^\[\d\d:\d\d:\d\d\]\s+- Result: (Sent successfully|FAILED)')
+
+DEVICE_COLUMNS = (
+    "address", "name", "phone", "card", "adverts", "decoded", "decode_rate", "visits", "dwell_s",
+    "first_seen", "last_seen", "adverts_per_min", "rssi_min", "rssi_p10", "rssi_p50", "rssi_p90", "rssi_max",
+    "rssi_mean", "connects", "connect_failures", "sends", "send_failures",
+)
+HOUR_COLUMNS = ("hour", "adverts", "devices", "decoded")
+
+_decoder = None
+
+
+def _decode(uuids, manufacturer_data=None, service_data=None):
+    global _decoder
+    if _decoder is None:
+        _decoder = UuidDecoder(cache_size=4096)
+    return _decoder.decode(uuids, manufacturer_data, service_data)
+
+
+def percentile(counts, q):
+    """q-quantile (0..1) of integer samples held as a Counter."""
+    total = sum(counts.values())
+    if not total:
+        return None
+    rank = q * (total - 1)
+    seen = 0
+    for value in sorted(counts):
+        seen += counts[value]
+        if seen > rank:
+            return value
+    return max(counts)
+
+
+def coalesce(visits, gap):
+    """Sorts and joins [start, end] intervals that are at most `gap` apart."""
+    merged = []
+    for start, end in sorted(visits):
+        if merged and start - merged[-1][1] <= gap:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+
+class DeviceStats:
+    __slots__ = ("address", "name", "phone", "card", "adverts", "decoded", "rssi", "visits",
+                 "connects", "connect_failures", "sends", "send_failures")
+
+    def __init__(self, address):
+        self.address = address
+        self.name = None
+        self.phone = ""
+        self.card = ""
+        self.adverts = 0
+        self.decoded = 0
+        self.rssi = Counter()
+        self.visits = []  # [start, end] timestamps
+        self.connects = 0
+        self.connect_failures = 0
+        self.sends = 0
+        self.send_failures = 0
+
+    def add_advert(self, ts, name, rssi, phone, card, gap):
+        self.adverts += 1
+        if name and name != "Unknown":
+            self.name = name
+        if phone or card:
+            self.decoded += 1
+            self.phone = phone or self.phone
+            self.card = card or self.card
+        self.rssi[rssi] += 1
+        visits = self.visits
+        if visits and -gap <= ts - visits[-1][1] <= gap:
+            last = visits[-1]
+            if ts > last[1]:
+                last[1] = ts
+            elif ts < last[0]:
+                last[0] = ts
+        else:
+            visits.append([ts, ts])
+
+    def merge(self, other, gap):
+        self.name = other.name or self.name
+        self.phone = other.phone or self.phone
+        self.card = other.card or self.card
+        self.adverts += other.adverts
+        self.decoded += other.decoded
+        self.rssi.update(other.rssi)
+        self.visits = coalesce(self.visits + other.visits, gap)
+        self.connects += other.connects
+        self.connect_failures += other.connect_failures
+        self.sends += other.sends
+        self.send_failures += other.send_failures
+
+    @property
+    def dwell(self):
+        return sum(end - start for start, end in self.visits)
+
+    def row(self):
+        rssi = self.rssi
+        samples = sum(rssi.values())
+        dwell = self.dwell
+        return {
+            "address": self.address,
+            "name": self.name or "Unknown",
+            "phone": self.phone,
+            "card": self.card,
+            "adverts": self.adverts,
+            "decoded": self.decoded,
+            "decode_rate": round(self.decoded / self.adverts, 4) if self.adverts else 0.0,
+            "visits": len(self.visits),
+            "dwell_s": round(dwell, 3),
+            "first_seen": self.visits[0][0] if self.visits else None,
+            "last_seen": self.visits[-1][1] if self.visits else None,
+            "adverts_per_min": round(self.adverts / dwell * 60, 2) if dwell else None,
+            "rssi_min": min(rssi) if rssi else None,
+            "rssi_p10": percentile(rssi, 0.1),
+            "rssi_p50": percentile(rssi, 0.5),
+            "rssi_p90": percentile(rssi, 0.9),
+            "rssi_max": max(rssi) if rssi else None,
+            "rssi_mean": round(sum(v * n for v, n in rssi.items()) / samples, 2) if samples else None,
+            "connects": self.connects,
+            "connect_failures": self.connect_failures,
+            "sends": self.sends,
+            "send_failures": self.send_failures,
+        }
+
+
+class SessionStats:
+    """Mergeable aggregate of one or many log files."""
+
+    def __init__(self, gap=DEFAULT_GAP):
+        self.gap = gap
+        self.files = []
+        self.devices = {}  # address: DeviceStats
+        self.hours = {}  # hour start (epoch seconds): [adverts, decoded, set of addresses]
+        self.rssi = Counter()
+        self.adverts = 0
+        self.decoded = 0
+        self.first_ts = None
+        self.last_ts = None
+        self.outcomes = Counter()  # connect_ok, connect_failed, send_ok, send_failed, dispatch_<outcome>
+        self.connect_kinds = Counter()  # reused / cached / discovered (NDJSON sessions only)
+
+    def device(self, address):
+        stats = self.devices.get(address)
+        if stats is None:
+            stats = self.devices[address] = DeviceStats(address)
+        return stats
+
+    def add_advert(self, ts, address, name, rssi, phone, card):
+        self.adverts += 1
+        decoded = bool(phone or card)
+        if decoded:
+            self.decoded += 1
+        self.rssi[rssi] += 1
+        if self.first_ts is None or ts < self.first_ts:
+            self.first_ts = ts
+        if self.last_ts is None or ts > self.last_ts:
+            self.last_ts = ts
+        hour = self.hours.get(ts // 3600 * 3600)
+        if hour is None:
+            hour = self.hours[ts // 3600 * 3600] = [0, 0, set()]
+        hour[0] += 1
+        hour[1] += decoded
+        hour[2].add(address)
+        self.device(address).add_advert(ts, name, rssi, phone, card, self.gap)
+
+    def add_connect(self, address, ok, kind=None):
+        self.outcomes["connect_ok" if ok else "connect_failed"] += 1
+        if kind:
+            self.connect_kinds[kind] += 1
+        if address:
+            device = self.device(address)
+            if ok:
+                device.connects += 1
+            else:
+                device.connect_failures += 1
+
+    def add_send(self, address, ok):
+        self.outcomes["send_ok" if ok else "send_failed"] += 1
+        if address:
+            device = self.device(address)
+            if ok:
+                device.sends += 1
+            else:
+                device.send_failures += 1
+
+    def merge(self, other):
+        self.files += other.files
+        for address, stats in other.devices.items():
+            mine = self.devices.get(address)
+            if mine is None:
+                self.devices[address] = stats
+            else:
+                mine.merge(stats, self.gap)
+        for hour, (adverts, decoded, addresses) in other.hours.items():
+            mine = self.hours.get(hour)
+            if mine is None:
+                self.hours[hour] = [adverts, decoded, addresses]
+            else:
+                mine[0] += adverts
+                mine[1] += decoded
+                mine[2] |= addresses
+        self.rssi.update(other.rssi)
+        self.adverts += other.adverts
+        self.decoded += other.decoded
+        if other.first_ts is not None and (self.first_ts is None or other.first_ts < self.first_ts):
+            self.first_ts = other.first_ts
+        if other.last_ts is not None and (self.last_ts is None or other.last_ts > self.last_ts):
+            self.last_ts = other.last_ts
+        self.outcomes.update(other.outcomes)
+        self.connect_kinds.update(other.connect_kinds)
+        return self
+
+    def device_rows(self, device_filter=None):
+        """One dict per device (DEVICE_COLUMNS), longest dwell first."""
+        rows = [stats.row() for stats in self.devices.values()]
+        if device_filter:
+            rows = [row for row in rows if device_filter.test(row["name"], row["address"], row["phone"],
+                                                              row["card"], row["rssi_p50"])]
+        rows.sort(key=lambda row: (-row["dwell_s"], -row["adverts"]))
+        return rows
+
+    def hour_rows(self):
+        return [
+            {"hour": datetime.datetime.fromtimestamp(hour).strftime("%Y-%m-%d %H:00"),
+             "adverts": adverts, "devices": len(addresses), "decoded": decoded}
+            for hour, (adverts, decoded, addresses) in sorted(self.hours.items())
+        ]
+
+    def summary(self, device_filter=None):
+        rows = self.device_rows(device_filter)
+        span = (self.last_ts - self.first_ts) if self.adverts else 0.0
+        visits = sorted(end - start for stats in self.devices.values() for start, end in stats.visits)
+        # Time with at least one device in range; the rate ignores nights and gaps between sessions.
+        active = sum(end - start for start, end in coalesce(
+            [visit for stats in self.devices.values() for visit in stats.visits], self.gap))
+        outcomes = self.outcomes
+
+        def rate(ok, failed):
+            total = outcomes[ok] + outcomes[failed]
+            return round(outcomes[ok] / total, 4) if total else None
+
+        dispatch_total = sum(n for key, n in outcomes.items() if key.startswith("dispatch_"))
+        return {
+            "files": len(self.files),
+            "adverts": self.adverts,
+            "devices": len(self.devices),
+            "devices_shown": len(rows),
+            "first_seen": self.first_ts,
+            "last_seen": self.last_ts,
+            "span_s": round(span, 3),
+            "active_s": round(active, 3),
+            "adverts_per_s": round(self.adverts / active, 3) if active else None,
+            "decode_rate": round(self.decoded / self.adverts, 4) if self.adverts else None,
+            "decoded_devices": sum(1 for stats in self.devices.values() if stats.decoded),
+            "visits": len(visits),
+            "dwell_s": {
+                "mean": round(sum(visits) / len(visits), 3) if visits else None,
+                "p50": round(visits[len(visits) // 2], 3) if visits else None,
+                "p90": round(visits[min(len(visits) - 1, int(len(visits) * 0.9))], 3) if visits else None,
+                "max": round(visits[-1], 3) if visits else None,
+            },
+            "rssi": {
+                "p10": percentile(self.rssi, 0.1),
+                "p50": percentile(self.rssi, 0.5),
+                "p90": percentile(self.rssi, 0.9),
+                "histogram": {f"{b}..{b + 9}": n for b, n in sorted(_rssi_bands(self.rssi).items())},
+            },
+            "connect_rate": rate("connect_ok", "connect_failed"),
+            "send_rate": rate("send_ok", "send_failed"),
+            "dispatch_rate": round(outcomes["dispatch_ok"] / dispatch_total, 4) if dispatch_total else None,
+            "outcomes": dict(outcomes),
+            "connect_kinds": dict(self.connect_kinds),
+        }
+
+
+def _rssi_bands(counts):
+    bands = Counter()
+    for value, n in counts.items():
+        bands[value // 10 * 10] += n
+    return bands
+
+
+# --- Reading ---
+
+def _hex_map(values, key=str):
+    return {key(k): bytes.fromhex(v) for k, v in values.items()}
+
+
+def _analyze_ndjson(path, stats):
+    for record in iter_records(path):
+        event = record.get("event")
+        if event == "advert":
+            manufacturer_data = record.get("manufacturer_data")
+            service_data = record.get("service_data")
+            phone, card = _decode(
+                record.get("uuids") or [],
+                _hex_map(manufacturer_data, int) if manufacturer_data else None,
+                _hex_map(service_data) if service_data else None,
+            )
+            stats.add_advert(record["ts"], record["address"], record.get("name"), record.get("rssi", 0),
+                             phone, card)
+        elif event == "connect":
+            stats.add_connect(record.get("address"), record.get("ok", False), record.get("kind"))
+        elif event == "send":
+            stats.add_send(record.get("address"), record.get("ok", False))
+        elif event == "dispatch":
+            stats.outcomes[f"dispatch_{record.get('outcome')}"] += 1
+
+
+def _analyze_text(path, stats):
+    for ad in iter_text_adverts(path):
+        phone, card = _decode(ad.uuids) if ad.uuids else ("", "")
+        stats.add_advert(ad.ts, ad.address, ad.name, ad.rssi, phone, card)
+    # Connect and send results are only in the log lines, without addresses of their own.
+    attempting = connected = None
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if "[CONNECT]" in line:
+                match = TEXT_CONNECT_START.match(line)
+                if match:
+                    attempting = match.group(1)
+                    continue
+                match = TEXT_CONNECT_OK.match(line)
+                if match:
+                    connected = match.group(1)
+                    stats.add_connect(connected, True)
+            elif "Connection failed" in line and TEXT_CONNECT_FAILED.match(line):
+                stats.add_connect(attempting, False)
+            elif "- Result:" in line:
+                match = TEXT_SEND_RESULT.match(line)
+                if match:
+                    stats.add_send(connected, match.group(1) != "FAILED")
+
+
+def analyze_file(path, gap=DEFAULT_GAP):
+    """SessionStats of one log file (runs in a worker process with --jobs)."""
+    stats = SessionStats(gap)
+    stats.files.append(path)
+    if path.endswith(".txt"):
+        _analyze_text(path, stats)
+    else:
+        _analyze_ndjson(path, stats)
+    return stats
+
+
+def analyze(paths, gap=DEFAULT_GAP, jobs=1):
+    """Merged SessionStats of all files; with jobs > 1 the files are read in a process pool."""
+    total = SessionStats(gap)
+    if jobs > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(paths))) as pool:
+            for stats in pool.map(analyze_file, paths, repeat(gap)):
+                total.merge(stats)
+    else:
+        for path in paths:
+            total.merge(analyze_file(path, gap))
+    return total
+
+
+def log_files(directory="logs"):
+    """Session logs and saved UI logs in `directory`, oldest first."""
+    return session_files(directory) + sorted(glob.glob(os.path.join(directory, "ble_*.txt")))
+
+
+# --- Export ---
+
+def write_csv(path, rows, columns):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def to_columns(rows, columns):
+    """Rows → {column: list of values}."""
+    return {column: [row[column] for row in rows] for column in columns}
+
+
+def to_numpy(rows, columns):
+    """Rows → {column: numpy array}; numeric columns use float64 with NaN for missing values."""
+    try:
+        import numpy as np
+    except ImportError:
+        raise RuntimeError("NumPy is not installed (pip install numpy)") from None
+    arrays = {}
+    for column, values in to_columns(rows, columns).items():
+        if all(value is None or isinstance(value, (int, float)) for value in values):
+            arrays[column] = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+        else:
+            arrays[column] = np.array(["" if value is None else str(value) for value in values])
+    return arrays
+
+
+def write_npz(path, rows, columns):
+    arrays = to_numpy(rows, columns)
+    import numpy as np
+    np.savez_compressed(path, **arrays)
+
+
+def write_parquet(path, rows, columns):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("PyArrow is not installed (pip install pyarrow)") from None
+    pq.write_table(pa.table(to_columns(rows, columns)), path)
+
+
+def _format_ts(ts):
+    return datetime.datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S") if ts is not None else "-"
+
+
+def _percent(value):
+    return f"{value:.1%}" if value is not None else "-"
+
+
+def print_report(summary, rows, top=20):
+    print(f"{summary['files']} files | {summary['adverts']:,} adverts | {summary['devices']:,} devices "
+          f"({summary['decoded_devices']:,} decoded) | {_format_ts(summary['first_seen'])} .. "
+          f"{_format_ts(summary['last_seen'])}")
+    rate = summary["adverts_per_s"]
+    print(f"active {summary['active_s'] / 3600:.1f} h | advert rate {rate:.2f}/s | " if rate is not None
+          else "advert rate - | ", end="")
+    print(f"decode hit rate {_percent(summary['decode_rate'])} | connect {_percent(summary['connect_rate'])} | "
+          f"send {_percent(summary['send_rate'])} | dispatch {_percent(summary['dispatch_rate'])}")
+    dwell = summary["dwell_s"]
+    if dwell["mean"] is not None:
+        print(f"{summary['visits']:,} visits | dwell mean {dwell['mean']:.0f} s, p50 {dwell['p50']:.0f} s, "
+              f"p90 {dwell['p90']:.0f} s, max {dwell['max']:.0f} s")
+    rssi = summary["rssi"]
+    if rssi["p50"] is not None:
+        bands = " ".join(f"[{band}] {n}" for band, n in rssi["histogram"].items())
+        print(f"RSSI p10 {rssi['p10']} p50 {rssi['p50']} p90 {rssi['p90']} dBm | {bands}")
+    if summary["outcomes"]:
+        print("outcomes " + ", ".join(f"{k} {v}" for k, v in sorted(summary["outcomes"].items())))
+    if not rows:
+        return
+    shown = rows[:top]
+    print(f"\n{'address':<18} {'name':<16} {'phone':<17} {'card':<6} {'adverts':>8} {'dec %':>6} "
+          f"{'visits':>6} {'dwell s':>8} {'RSSI p50':>8} {'conn':>5} {'sent':>5}")
+    for row in shown:
+        print(f"{row['address']:<18} {row['name'][:16]:<16} {row['phone'] or '-':<17} {row['card'] or '-':<6} "
+              f"{row['adverts']:>8} {row['decode_rate'] * 100:>6.1f} {row['visits']:>6} {row['dwell_s']:>8.0f} "
+              f"{row['rssi_p50'] if row['rssi_p50'] is not None else '-':>8} "
+              f"{row['connects']:>5} {row['sends']:>5}")
+    if len(rows) > len(shown):
+        print(f"... {len(rows) - len(shown)} more (--top, --csv)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate recorded scan logs (dwell, RSSI, decode and "
+                                                 "connect/send rates).")
+    parser.add_argument("paths", nargs="*", help="session_*.ndjson[.gz] or ble_*.txt files (default: all in --directory)")
+    parser.add_argument("--directory", default="logs")
+    parser.add_argument("--gap", type=float, default=DEFAULT_GAP,
+                        help="seconds without adverts that end a visit")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="worker processes reading files in parallel (1 = in this process)")
+    parser.add_argument("--filter", default="", help="device filter expression for the device table/exports")
+    parser.add_argument("--top", type=int, default=20, help="devices listed in the report")
+    parser.add_argument("--csv", metavar="FILE", help="write the per-device table as CSV")
+    parser.add_argument("--hourly-csv", metavar="FILE", help="write adverts/devices per hour as CSV")
+    parser.add_argument("--npz", metavar="FILE", help="write the per-device columns as NumPy arrays (.npz)")
+    parser.add_argument("--parquet", metavar="FILE", help="write the per-device table as Parquet (needs pyarrow)")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    paths = args.paths or log_files(args.directory)
+    if not paths:
+        parser.error(f"no log files given or found in {args.directory}")
+    try:
+        device_filter = DeviceFilter(args.filter)
+    except FilterError as ex:
+        parser.error(f"--filter: {ex}")
+    stats = analyze(paths, gap=args.gap, jobs=args.jobs)
+    rows = stats.device_rows(device_filter)
+    summary = stats.summary(device_filter)
+
+    try:
+        if args.csv:
+            write_csv(args.csv, rows, DEVICE_COLUMNS)
+        if args.hourly_csv:
+            write_csv(args.hourly_csv, stats.hour_rows(), HOUR_COLUMNS)
+        if args.npz:
+            write_npz(args.npz, rows, DEVICE_COLUMNS)
+        if args.parquet:
+            write_parquet(args.parquet, rows, DEVICE_COLUMNS)
+    except RuntimeError as ex:
+        parser.exit(1, f"{ex}\n")
+
+    if args.json:
+        json.dump(summary, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        print_report(summary, rows, args.top)
+
+
+if __name__ == "__main__":
+    main()
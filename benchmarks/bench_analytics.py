@@ -0,0 +1,73 @@
+"""Offline analytics throughput: records/s over gzip-compressed sessions, one process vs. a pool.
+
+Writes `--files` synthetic session_*.ndjson.gz files (benchmarks/synthetic.py
+population, one advert per device every `--interval` seconds, plus a few
+connect/send records) to a temporary directory and runs analytics.analyze()
+on them with --jobs 1 and with every job count in `--jobs`.
+
+Usage: python benchmarks/bench_analytics.py [--files 8] [--records 200000] [--devices 500] [--jobs 2 4]
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from analytics import analyze
+from synthetic import SyntheticPopulation
+
+
+def write_sessions(directory, files, records, devices, interval, seed):
+    population = SyntheticPopulation(devices, seed=seed)
+    paths = []
+    ts = 1_760_000_000.0
+    per_file = records // files
+    step = interval / devices
+    for i in range(files):
+        path = os.path.join(directory, f"session_20260101_{i:06d}.ndjson.gz")
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            for n, ad in enumerate(population.adverts(per_file)):
+                ts += step
+                f.write(json.dumps({"ts": ts, "event": "advert", "address": ad.address, "name": ad.name,
+                                    "rssi": ad.rssi, "uuids": ad.service_uuids}) + "\n")
+                if n % 5000 == 0:
+                    f.write(json.dumps({"ts": ts, "event": "connect", "address": ad.address, "ok": n % 3 != 0,
+                                        "kind": "discovered"}) + "\n")
+                    f.write(json.dumps({"ts": ts, "event": "send", "address": ad.address, "ok": True}) + "\n")
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--records", type=int, default=200_000, help="advert records over all files")
+    parser.add_argument("--devices", type=int, default=500)
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between adverts of one device")
+    parser.add_argument("--jobs", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_sessions(directory, args.files, args.records, args.devices, args.interval, args.seed)
+        size = sum(os.path.getsize(p) for p in paths)
+        print(f"{len(paths)} files, {args.records:,} adverts, {size / 1e6:.1f} MB gzip "
+              f"({os.cpu_count()} CPUs)")
+        baseline = None
+        for jobs in [1] + args.jobs:
+            started = time.perf_counter()
+            stats = analyze(paths, jobs=jobs)
+            elapsed = time.perf_counter() - started
+            baseline = baseline or elapsed
+            print(f"jobs={jobs:<3} {elapsed:>7.2f} s  {stats.adverts / elapsed:>10,.0f} adverts/s  "
+                  f"{baseline / elapsed:>5.2f}x  ({len(stats.devices)} devices, "
+                  f"{sum(len(d.visits) for d in stats.devices.values())} visits)")
+
+
+if __name__ == "__main__":
+    main()
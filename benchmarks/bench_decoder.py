@@ -0,0 +1,152 @@
+"""Golden check and throughput of the UUID decoder.
+
+First replays benchmarks/data/uuid_golden.json (UUID sets taken from logs/
+plus synthetic Rule A/Rule B cases) through both the original
+decode_uuid_data logic and UuidDecoder and exits non-zero on any mismatch.
+Then times both on a scan-shaped workload.
+
+Usage: python benchmarks/bench_decoder.py [--adverts 200000] [--distinct 200]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from decoder import UuidDecoder, PayloadDecoder, default_registry
+
+GOLDEN_PATH = os.path.join(ROOT, "benchmarks", "data", "uuid_golden.json")
+
+
+def legacy_decode_uuid_data(uuids):
+    """BLEScannerApp.decode_uuid_data as it was before UuidDecoder (reference only)."""
+    phone = ""
+    card = ""
+    for uuid in uuids:
+        parts = uuid.split("-")
+        if len(parts) == 5:
+            lit_phone = f"{parts[0]}{parts[1]}{parts[2]}"
+            lit_card = parts[3]
+            if lit_phone.startswith("010") or lit_phone.startswith("1234"):
+                phone = lit_phone
+                card = lit_card
+                break
+        clean_uuid = uuid.replace("-", "")
+        try:
+            decoded_str = bytes.fromhex(clean_uuid).decode('ascii', errors='ignore')
+            phone_match = re.search(r'010\d{8}', decoded_str)
+            if phone_match:
+                phone = phone_match.group()
+            card_match = re.search(r'\d{8,16}', decoded_str)
+            if card_match and card_match.group() != phone:
+                card = card_match.group()
+            if phone or card:
+                break
+        except:
+            continue
+    return phone, card
+
+
+def load_golden():
+    with open(GOLDEN_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def check_golden(decoder):
+    failures = 0
+    for case in load_golden():
+        expected = (case["phone"], case["card"])
+        for label, got in (
+            ("legacy", legacy_decode_uuid_data(case["uuids"])),
+            ("decoder", decoder.decode(case["uuids"])),
+        ):
+            if got != expected:
+                failures += 1
+                print(f"MISMATCH [{label}] {case['uuids']}: expected {expected}, got {got}")
+    return failures
+
+
+def make_workload(adverts, distinct):
+    golden = [case["uuids"] for case in load_golden()]
+    population = []
+    for i in range(distinct):
+        base = golden[i % len(golden)]
+        if i >= len(golden) and base:
+            # Vary the last segment so each tag has its own UUID tuple.
+            base = [base[0][:-4] + f"{i:04x}"] + base[1:]
+        population.append(base)
+    return [population[i % distinct] for i in range(adverts)]
+
+
+class DummyPrefixDecoder(PayloadDecoder):
+    """Stand-in for a future format that claims its own UUID prefix."""
+    priority = 50
+    uuid_segments = 5
+
+    def __init__(self, index):
+        self.name = f"dummy-{index}"
+        self.uuid_prefixes = (f"ff{index:04x}",)
+
+    def decode_uuid(self, uuid, parts):
+        return None
+
+
+def bench_registry_scaling(workload, extra_formats):
+    """Uncached registry cost with the default formats vs. many extra ones."""
+    results = []
+    for count in (0, extra_formats):
+        registry = default_registry()
+        for i in range(count):
+            registry.register(DummyPrefixDecoder(i))
+        started = time.perf_counter()
+        for uuids in workload:
+            registry.decode(uuids)
+        results.append((len(registry.decoders), time.perf_counter() - started))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--adverts", type=int, default=200_000)
+    parser.add_argument("--distinct", type=int, default=200, help="distinct UUID sets in the workload")
+    parser.add_argument("--cache-size", type=int, default=1024)
+    parser.add_argument("--extra-formats", type=int, default=50, help="dummy formats registered for the scaling run")
+    args = parser.parse_args()
+
+    failures = check_golden(UuidDecoder())
+    print(f"golden: {len(load_golden())} cases, {failures} mismatches")
+    if failures:
+        sys.exit(1)
+
+    workload = make_workload(args.adverts, args.distinct)
+
+    started = time.perf_counter()
+    for uuids in workload:
+        legacy_decode_uuid_data(uuids)
+    legacy = time.perf_counter() - started
+
+    decoder = UuidDecoder(cache_size=args.cache_size)
+    started = time.perf_counter()
+    for uuids in workload:
+        decoder.decode(uuids)
+    single = time.perf_counter() - started
+
+    decoder = UuidDecoder(cache_size=args.cache_size)
+    started = time.perf_counter()
+    decoder.decode_many(workload)
+    batch = time.perf_counter() - started
+
+    for label, elapsed in (("legacy", legacy), ("decode", single), ("decode_many", batch)):
+        print(f"{label:<12} {args.adverts / elapsed:>12,.0f} adverts/s | {elapsed / args.adverts * 1e6:.3f} us/advert")
+    print(f"cache: {decoder.stats()}")
+
+    for formats, elapsed in bench_registry_scaling(workload, args.extra_formats):
+        print(f"uncached, {formats:>3} formats {elapsed / args.adverts * 1e6:>8.3f} us/advert")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Controls sent per device table update: full rebuild vs. keyed DeviceTable.
+
+The rebuild approach (the old run_scan) creates a DataRow, five DataCells,
+four Texts and a button for every device on every update, so the whole table
+is re-sent. DeviceTable only touches the Text cells whose value changed.
+
+Before measuring, check_device_table() builds a real DeviceTable (selection
+enabled, as in the app) and fails loudly if the Flet API it relies on changed.
+
+Usage: python benchmarks/bench_device_table.py [--devices 200] [--updates 100]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import flet as ft
+
+from device_table import DeviceTable
+
+CONTROLS_PER_ROW = 11  # DataRow + 5 DataCell + 4 Text + FilledButton
+
+
+def make_population(n, rng):
+    return {
+        f"AA:BB:CC:{i >> 8 & 0xFF:02X}:{i & 0xFF:02X}:00": {
+            "name": f"mcandle-{i}",
+            "phone": "1234567812345678" if i % 2 else "",
+            "card": "0000" if i % 2 else "",
+            "rssi": rng.randint(-90, -40),
+        }
+        for i in range(n)
+    }
+
+
+def jitter(devices, rng, changed_ratio):
+    for info in devices.values():
+        if rng.random() < changed_ratio:
+            info["rssi"] += rng.randint(-3, 3)
+
+
+def bench_rebuild(devices, updates, rng, changed_ratio):
+    table = ft.DataTable(columns=[ft.DataColumn(ft.Text(c)) for c in "ABCDE"], rows=[])
+    controls = 0
+    started = time.perf_counter()
+    for _ in range(updates):
+        jitter(devices, rng, changed_ratio)
+        table.rows.clear()
+        for address, info in devices.items():
+            table.rows.append(ft.DataRow(cells=[
+                ft.DataCell(ft.Text(f"{info['name']} ({address})")),
+                ft.DataCell(ft.Text(info["phone"] or "-")),
+                ft.DataCell(ft.Text(info["card"] or "-")),
+                ft.DataCell(ft.Text(str(info["rssi"]))),
+                ft.DataCell(ft.FilledButton("Connect", on_click=lambda e, addr=address: None)),
+            ]))
+            controls += CONTROLS_PER_ROW
+    return controls, time.perf_counter() - started
+
+
+def bench_keyed(devices, updates, rng, changed_ratio):
+    table = ft.DataTable(columns=[ft.DataColumn(ft.Text(c)) for c in "ABCDE"], rows=[])
+    model = DeviceTable(table, on_connect=lambda addr: None)
+    started = time.perf_counter()
+    for _ in range(updates):
+        jitter(devices, rng, changed_ratio)
+        for address, info in devices.items():
+            model.upsert(address, info["name"], info["phone"], info["card"], info["rssi"])
+    elapsed = time.perf_counter() - started
+    controls = model.cells_patched + model.rows_added * CONTROLS_PER_ROW + model.rows_removed
+    return controls, elapsed
+
+
+def check_device_table():
+    """Builds a real DeviceTable with selection enabled, as the app does, and exercises every row operation."""
+    selected, connected = [], []
+    table = ft.DataTable(columns=[ft.DataColumn(ft.Text(c)) for c in "ABCDE"], rows=[])
+    model = DeviceTable(table, on_connect=connected.append, on_select=selected.append)
+    model.upsert("AA:00", "mcandle-0", "01012345678", "0042", -50)
+    model.upsert("AA:01", "mcandle-1", "", "", -70)
+    assert len(table.rows) == 2 and "AA:00" in model
+    assert model.upsert("AA:00", "mcandle-0", "01012345678", "0042", -55) and model.cells_patched == 1
+    table.rows[0].on_select_change(None)
+    table.rows[0].cells[4].content.on_click(None)
+    assert selected == ["AA:00"] and connected == ["AA:00"]
+    assert model.highlight("AA:00") and table.rows[0].color == model.highlight_color
+    assert model.remove("AA:00") and model.highlighted is None and len(table.rows) == 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--updates", type=int, default=100)
+    parser.add_argument("--changed-ratio", type=float, default=0.3, help="share of devices whose RSSI moves per update")
+    args = parser.parse_args()
+
+    check_device_table()
+    results = {}
+    for label, fn in (("rebuild", bench_rebuild), ("keyed", bench_keyed)):
+        rng = random.Random(42)
+        devices = make_population(args.devices, rng)
+        results[label] = fn(devices, args.updates, rng, args.changed_ratio)
+
+    print(f"devices={args.devices} updates={args.updates} changed_ratio={args.changed_ratio}")
+    for label, (controls, elapsed) in results.items():
+        print(f"{label:<8} {controls / args.updates:>10.1f} controls/update | "
+              f"{elapsed / args.updates * 1000:>8.3f} ms/update")
+
+
+if __name__ == "__main__":
+    main()
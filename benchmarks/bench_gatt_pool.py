@@ -0,0 +1,88 @@
+"""Connect cost for returning customers: new client per connect vs. ConnectionPool.
+
+Uses FakeGattClient, whose connect takes `--connect-ms` plus `--discovery-ms`
+per service to resolve (the fake phone has 4 services). A stream of
+connect requests is drawn from a small set of customers, so most of them are
+returning devices. The baseline connects and discovers every time, like the
+old connect_device did. "cache only" closes every link after use but keeps
+the handle cache; "pool+cache" also keeps links open.
+
+Usage: python benchmarks/bench_gatt_pool.py [--customers 12] [--requests 60] [--pool-size 4]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gatt_pool import CharacteristicCache, ConnectionPool, FakeGattClient, select_characteristics
+
+WRITE_UUID = "0000fff1-0000-1000-8000-00805f9b34fb"
+READ_UUID = "0000fff2-0000-1000-8000-00805f9b34fb"
+
+
+def request_stream(customers, requests, seed=7):
+    rng = random.Random(seed)
+    addresses = [f"AA:BB:CC:DD:00:{i:02X}" for i in range(customers)]
+    # A few regulars come back far more often than the rest.
+    weights = [1 / (i + 1) for i in range(customers)]
+    return rng.choices(addresses, weights, k=requests)
+
+
+async def bench_baseline(stream, factory):
+    started = time.perf_counter()
+    for address in stream:
+        client = factory(address)
+        await client.connect()
+        select_characteristics(client.services, WRITE_UUID, READ_UUID)
+        await client.disconnect()
+    return time.perf_counter() - started
+
+
+async def bench_pool(stream, factory, pool_size, idle_timeout, cache_path):
+    pool = ConnectionPool(WRITE_UUID, READ_UUID, client_factory=factory, max_size=pool_size,
+                          idle_timeout=idle_timeout, cache=CharacteristicCache(cache_path))
+    started = time.perf_counter()
+    for address in stream:
+        conn = await pool.acquire(address)
+        pool.release(conn)
+        if not pool_size:
+            await pool.disconnect(address)
+    elapsed = time.perf_counter() - started
+    await pool.close()
+    return elapsed, pool.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--customers", type=int, default=12)
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--connect-ms", type=float, default=30.0)
+    parser.add_argument("--discovery-ms", type=float, default=40.0)
+    args = parser.parse_args()
+
+    factory = FakeGattClient.factory(connect_delay=args.connect_ms / 1000, discovery_delay=args.discovery_ms / 1000)
+    stream = request_stream(args.customers, args.requests)
+
+    baseline = asyncio.run(bench_baseline(stream, factory))
+    print(f"baseline  {baseline / len(stream) * 1000:>7.1f} ms/connect")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, "gatt_cache.json")
+        for label, pool_size in (("cache only", 0), ("pool+cache", args.pool_size)):
+            if os.path.exists(cache_path):
+                os.remove(cache_path)
+            elapsed, stats = asyncio.run(bench_pool(stream, factory, pool_size, 120.0, cache_path))
+            print(f"{label:<10}{elapsed / len(stream) * 1000:>7.1f} ms/connect | hit rate {stats['hit_rate']:.0%} | "
+                  f"reused {stats['reused']} cached {stats['cached']} discovered {stats['discovered']} | "
+                  f"evictions {stats['evictions']}")
+            for kind, s in stats["connect_ms"].items():
+                print(f"          {kind:<11} {s['count']:>4} x {s['mean_ms']:>6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Cost per logged line: old per-line log_message vs. batched LogSink.
+
+The old log_message built an ft.Text, trimmed two lists with pop(0) and
+called page.update() for every line. LogSink buffers lines and flushes once
+per frame. `update` is a counting no-op here, so the timings are the Python
+side only; the number of updates shows how many page diffs would be sent.
+
+Usage: python benchmarks/bench_log_sink.py [--lines 100000] [--lines-per-frame 400]
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import flet as ft
+
+from log_sink import LogSink
+
+
+def scan_burst_lines(n):
+    """Same shape as a scan cycle: 4 lines per device, some repeating."""
+    for i in range(n):
+        kind = i % 4
+        if kind == 0:
+            yield f"[SCAN] Found: mcandle-{i // 4 % 200} (AA:BB:CC:00:00:{i // 4 % 200:02X}) | RSSI: -{40 + i % 50}", "amber"
+        elif kind == 1:
+            yield "  - UUIDs: ['12345678-1234-5678-0000-123400805f9b']", "grey400"
+        elif kind == 2:
+            yield "  - DECODED PHONE: 1234567812345678", "green"
+        else:
+            yield "  - DECODED CARD: 0000", "green"
+
+
+def bench_old(lines):
+    updates = 0
+    controls = []
+    all_logs = []
+    started = time.perf_counter()
+    for msg, color in scan_burst_lines(lines):
+        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
+        log_entry = f"[{timestamp}] {msg}"
+        all_logs.append(log_entry)
+        controls.append(ft.Text(log_entry, size=12, color=color, font_family="monospace"))
+        if len(controls) > 100:
+            controls.pop(0)
+        if len(all_logs) > 1000:
+            all_logs.pop(0)
+        updates += 1
+    return time.perf_counter() - started, updates, None
+
+
+def bench_sink(lines, lines_per_frame):
+    updates = [0]
+
+    def update():
+        updates[0] += 1
+
+    sink = LogSink(ft.ListView(), update=update)
+    started = time.perf_counter()
+    for i, (msg, color) in enumerate(scan_burst_lines(lines), 1):
+        sink.log(msg, color)
+        if i % lines_per_frame == 0:
+            sink.flush()
+    sink.flush()
+    return time.perf_counter() - started, updates[0], sink.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, default=100_000)
+    parser.add_argument("--lines-per-frame", type=int, default=400, help="lines logged between two 10 Hz flushes")
+    args = parser.parse_args()
+
+    for label, (elapsed, updates, stats) in (
+        ("old", bench_old(args.lines)),
+        ("sink", bench_sink(args.lines, args.lines_per_frame)),
+    ):
+        print(f"{label:<5} {elapsed / args.lines * 1e6:>8.2f} us/line | {updates:>7} page updates")
+        if stats:
+            print(f"      logged {stats['logged']} | coalesced {stats['coalesced']} | dropped {stats['dropped']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Nearest-device queries: RankingIndex vs. sorting the registry per query.
+
+Without an index, "who is nearest" means sorted(devices, key=rssi) on every
+render. RankingIndex keeps the order as RSSI updates arrive, so queries only
+slice. Both sides see the same random walk of smoothed RSSI values.
+
+Usage: python benchmarks/bench_ranking.py [--devices 1000 10000] [--updates 200000] [--queries 20000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ranking import RankingIndex
+
+
+def rssi_walk(devices, updates, seed=1):
+    rng = random.Random(seed)
+    rssi = [rng.uniform(-95, -35) for _ in range(devices)]
+    for _ in range(updates):
+        i = rng.randrange(devices)
+        rssi[i] = min(-30.0, max(-100.0, rssi[i] + rng.uniform(-3, 3)))
+        yield f"AA:BB:CC:{i >> 16 & 0xFF:02X}:{i >> 8 & 0xFF:02X}:{i & 0xFF:02X}", rssi[i]
+
+
+def bench_updates(devices, updates):
+    index = RankingIndex()
+    registry = {}
+    walk = list(rssi_walk(devices, updates))
+    started = time.perf_counter()
+    for address, rssi in walk:
+        index.update(address, rssi)
+    index_s = time.perf_counter() - started
+    started = time.perf_counter()
+    for address, rssi in walk:
+        registry[address] = rssi
+    dict_s = time.perf_counter() - started
+    return index, registry, index_s / updates, dict_s / updates
+
+
+def time_query(fn, queries):
+    started = time.perf_counter()
+    for _ in range(queries):
+        result = fn()
+    return (time.perf_counter() - started) / queries, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--devices", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--updates", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=20_000)
+    parser.add_argument("--threshold", type=float, default=-45.0)
+    args = parser.parse_args()
+
+    for devices in args.devices:
+        index, registry, index_update, dict_update = bench_updates(devices, args.updates)
+        print(f"{devices} devices: update {index_update * 1e6:.2f} us (index) vs {dict_update * 1e6:.2f} us (dict)")
+
+        naive_sorted = lambda: sorted(registry.items(), key=lambda item: -item[1])
+        naive_queries = max(1, args.queries * 100 // devices)  # the scan is slow; fewer rounds suffice
+        for label, fast, naive in (
+            ("top-1", lambda: index.nearest(),
+             lambda: max(registry.items(), key=lambda item: item[1])),
+            ("top-5", lambda: index.top(5), lambda: naive_sorted()[:5]),
+            (f">= {args.threshold:g}", lambda: index.above(args.threshold),
+             lambda: [item for item in naive_sorted() if item[1] >= args.threshold]),
+        ):
+            fast_s, fast_result = time_query(fast, args.queries)
+            naive_s, naive_result = time_query(naive, naive_queries)
+            if label == "top-1":
+                fast_result, naive_result = [fast_result], [naive_result]
+            # Equal RSSIs may come out in a different order; the values must match.
+            assert [r for _, r in fast_result] == [r for _, r in naive_result], label
+            print(f"  {label:<10} {fast_s * 1e6:>9.2f} us (index) vs {naive_s * 1e6:>10.2f} us (scan) "
+                  f"| {len(fast_result)} results")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Throughput and latency of ScanEngine fed by FakeAdvertisementSource (no radio needed).
+
+Usage: python benchmarks/bench_scan_engine.py [--devices 200] [--seconds 5]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scan_engine import ScanEngine, LatencyTracker, FakeAdvertisementSource
+
+
+async def run(devices, seconds, interval, render_interval, dedup_interval):
+    latency = LatencyTracker(maxlen=100_000)
+    pending = []
+    engine = ScanEngine(
+        lambda ad: pending.append(ad.detected_at),
+        dedup_interval=dedup_interval,
+        scanner_factory=FakeAdvertisementSource.factory(devices=devices, interval=interval, seed=1),
+    )
+    await engine.start()
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        await asyncio.sleep(render_interval)
+        batch, pending[:] = list(pending), []
+        for detected_at in batch:
+            latency.record(detected_at)
+    await engine.stop()
+    elapsed = time.perf_counter() - started
+
+    stats = latency.summary()
+    print(f"devices={devices} interval={interval}s dedup={dedup_interval}s render={render_interval}s")
+    print(f"received   {engine.received:>8} ({engine.received / elapsed:,.0f}/s)")
+    print(f"delivered  {engine.delivered:>8} ({engine.delivered / elapsed:,.0f}/s)")
+    print(f"duplicates {engine.duplicates:>8}")
+    print(f"latency    p50 {stats['p50_ms']:.1f} ms | p95 {stats['p95_ms']:.1f} ms | max {stats['max_ms']:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--interval", type=float, default=0.1, help="advertising interval per fake device")
+    parser.add_argument("--render-interval", type=float, default=0.25)
+    parser.add_argument("--dedup-interval", type=float, default=1.0)
+    args = parser.parse_args()
+    asyncio.run(run(args.devices, args.seconds, args.interval, args.render_interval, args.dedup_interval))
+
+
+if __name__ == "__main__":
+    main()
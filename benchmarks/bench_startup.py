@@ -0,0 +1,148 @@
+"""Startup cost: module import times, time-to-first-frame and time-to-first-advert.
+
+1. Imports `main` under `python -X importtime` and lists the slowest modules
+   (cumulative µs, nested imports included) plus the total.
+2. Starts `main.py --startup-probe --fake-scanner` N times (headless, and the
+   Flet UI when Flet is installed) and records the STARTUP milestones it
+   prints: first_frame / panels (UI only), scan_started and first_advert.
+   "wall" is measured from process spawn (interpreter startup included),
+   "in-process" from the first line of main.py. The process is stopped as
+   soon as the first advert arrives, or killed after `--timeout` seconds;
+   milestones it never reached are reported as missing.
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--top 15] [--no-ui] [--json]
+"""
+import argparse
+import importlib.util
+import json
+import os
+import queue
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, "main.py")
+MILESTONES = {
+    "headless": ("scan_started", "first_advert"),
+    "ui": ("first_frame", "panels", "scan_started", "first_advert"),
+}
+
+
+def import_times(module="main"):
+    """(total µs, [(cumulative µs, self µs, module)] slowest first) of `import module`."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    total = next(cumulative for cumulative, _, name in rows if name.strip() == module)
+    return total, sorted(rows, reverse=True)
+
+
+def _read_lines(stream, lines):
+    for line in stream:
+        lines.put(line)
+    lines.put(None)
+
+
+def probe(extra_args, timeout):
+    """One run of main.py; returns {event: (wall seconds, in-process seconds)}.
+
+    Stdout is read on a thread so the timeout holds even when the process
+    prints nothing (e.g. the UI without a display).
+    """
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, MAIN, "--startup-probe", "--fake-scanner", *extra_args],
+                               cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    lines = queue.Queue()
+    threading.Thread(target=_read_lines, args=(process.stdout, lines), daemon=True).start()
+    marks = {}
+    try:
+        deadline = started + timeout
+        while True:
+            try:
+                line = lines.get(timeout=max(0.0, deadline - time.perf_counter()))
+            except queue.Empty:
+                break
+            if line is None:
+                break
+            if line.startswith("STARTUP "):
+                _, event, elapsed = line.split()
+                marks[event] = (time.perf_counter() - started, float(elapsed))
+                if event == "first_advert":
+                    break
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return marks
+
+
+def summarize(runs, expected=()):
+    """Median times per milestone; `missing` counts the runs that never reached it."""
+    events = {event: ([], []) for event in expected}
+    for marks in runs:
+        for event, (wall, inside) in marks.items():
+            events.setdefault(event, ([], []))
+            events[event][0].append(wall)
+            events[event][1].append(inside)
+    return {
+        event: {"runs": len(walls), "missing": len(runs) - len(walls),
+                "wall_ms": statistics.median(walls) * 1000 if walls else None,
+                "in_process_ms": statistics.median(inside) * 1000 if inside else None}
+        for event, (walls, inside) in sorted(
+            events.items(), key=lambda item: statistics.median(item[1][0]) if item[1][0] else float("inf"))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for the first advert")
+    parser.add_argument("--no-ui", action="store_true", help="skip the Flet UI probe")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    total, rows = import_times("main")
+    modes = {"headless": ["--headless", "--filter", ""]}
+    if not args.no_ui and importlib.util.find_spec("flet") is not None:
+        modes["ui"] = []
+    results = {
+        "import_main_ms": total / 1000,
+        "slowest_imports": [{"module": name.strip(), "cumulative_ms": c / 1000, "self_ms": s / 1000}
+                            for c, s, name in rows[:args.top]],
+        "modes": {mode: summarize([probe(extra, args.timeout) for _ in range(args.runs)], MILESTONES[mode])
+                  for mode, extra in modes.items()},
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"import main: {total / 1000:.1f} ms (python -X importtime, cumulative)")
+    for c, s, name in rows[:args.top]:
+        print(f"  {c / 1000:>8.1f} ms  {s / 1000:>7.1f} ms self  {name}")
+    if "ui" not in modes and not args.no_ui:
+        print("Flet is not installed: UI probe skipped.")
+    for mode, events in results["modes"].items():
+        print(f"\n{mode} (median of {args.runs} runs)     wall    in-process")
+        for event, stats in events.items():
+            if not stats["runs"]:
+                print(f"  {event:<16} missing in all runs (timeout {args.timeout:g} s)")
+                continue
+            missing = f"  missing in {stats['missing']} run(s)" if stats["missing"] else ""
+            print(f"  {event:<16} {stats['wall_ms']:>8.1f} ms {stats['in_process_ms']:>8.1f} ms{missing}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Throughput of large writes: one acknowledged write per frame vs. streamed frames.
+
+Uses FakeGattClient: an acknowledged write costs `--ack-ms` (about two
+connection intervals), a write without response `--packet-ms`. Every run
+reassembles what the fake peripheral received with FrameAssembler and checks
+it against the payload.
+
+Usage: python benchmarks/bench_transfer.py [--sizes 1024 4096 16384] [--mtu 23 185 247] [--window 8]
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gatt_pool import FakeGattClient
+from transfer import ChunkedWriter, FrameAssembler
+
+WRITE_UUID = "0000fff1-0000-1000-8000-00805f9b34fb"
+
+
+async def run(size, mtu, stream, window, ack_ms, packet_ms):
+    client = FakeGattClient("AA:BB:CC:DD:EE:FF", connect_delay=0, discovery_delay=0, mtu_size=mtu,
+                            write_delay=ack_ms / 1000, packet_delay=packet_ms / 1000)
+    await client.connect()
+    char = client.services.get_characteristic(WRITE_UUID)
+    payload = os.urandom(size)
+    report = await ChunkedWriter(client, char, stream=stream, window=window).send(payload)
+    assembler = FrameAssembler()
+    received = [assembler.feed(data) for _, data, _ in client.written]
+    assert received[-1] == payload, "payload did not survive the round trip"
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1024, 4096, 16384])
+    parser.add_argument("--mtu", type=int, nargs="+", default=[23, 185, 247])
+    parser.add_argument("--window", type=int, default=8)
+    parser.add_argument("--ack-ms", type=float, default=15.0)
+    parser.add_argument("--packet-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    print(f"{'bytes':>6} {'mtu':>4} {'frames':>6} {'acked KiB/s':>12} {'streamed KiB/s':>15} {'speedup':>8}")
+    for size in args.sizes:
+        for mtu in args.mtu:
+            acked = asyncio.run(run(size, mtu, False, args.window, args.ack_ms, args.packet_ms))
+            streamed = asyncio.run(run(size, mtu, True, args.window, args.ack_ms, args.packet_ms))
+            print(f"{size:>6} {mtu:>4} {streamed.frames:>6} {acked.bytes_per_s / 1024:>12.1f} "
+                  f"{streamed.bytes_per_s / 1024:>15.1f} {streamed.bytes_per_s / acked.bytes_per_s:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
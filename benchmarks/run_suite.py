@@ -0,0 +1,372 @@
+"""Reproducible scan → decode → render benchmark suite (no radio needed).
+
+Runs every benchmark on the same synthetic population (benchmarks/synthetic.py),
+takes the best of `--repeat` runs, prints a table and writes a JSON result
+file (benchmarks/results/<timestamp>_<commit>.json by default).
+
+Regressions fail the run (exit code 1):
+- against the absolute limits in benchmarks/thresholds.json (always), and
+- with `--compare OLD.json`, against an earlier result: a metric that got
+  worse by more than its tolerance (thresholds.json, default 25%).
+
+A benchmark that raises is recorded under "failed" in the result file and the
+remaining benchmarks still run; any failure fails the run. Benchmarks that
+need Flet (device table, log sink) are recorded under "skipped" when it is not
+installed, which also fails the run unless `--allow-skip` is given.
+
+Usage: python benchmarks/run_suite.py [--devices 1000] [--adverts 100000] [--compare benchmarks/results/old.json]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from bench_decoder import legacy_decode_uuid_data
+from decoder import UuidDecoder
+from device_filter import DeviceFilter
+from pipeline import ScanPipeline
+from scan_engine import ScanEngine
+from session_log import SessionLogWriter
+from synthetic import SyntheticPopulation, parse_mix, DEFAULT_MIX
+
+THRESHOLDS_PATH = os.path.join(ROOT, "benchmarks", "thresholds.json")
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+LOWER, HIGHER = "lower", "higher"
+
+
+class Skip(Exception):
+    pass
+
+
+def _no_log(msg, color="white"):
+    pass
+
+
+def best_of(repeat, fn):
+    """Runs fn() `repeat` times and keeps the fastest (seconds, extra) result."""
+    return min((fn() for _ in range(repeat)), key=lambda result: result[0])
+
+
+def bench_decode(population, args):
+    workload = [uuids for _, uuids, _, _ in population.devices] * max(1, args.adverts // len(population))
+    mismatches = sum(UuidDecoder(cache_size=0).decode(u) != legacy_decode_uuid_data(u) for u in workload[:len(population)])
+    if mismatches:
+        raise AssertionError(f"{mismatches} synthetic UUID sets decode differently from the original rules")
+
+    def run(decoder):
+        def once():
+            started = time.perf_counter()
+            for uuids in workload:
+                decoder.decode(uuids)
+            return time.perf_counter() - started, None
+        return best_of(args.repeat, once)[0] / len(workload)
+
+    cold = run(UuidDecoder(cache_size=0))
+    warm = run(UuidDecoder(cache_size=len(population) * 2))
+    return {
+        "decode_uncached_us": (cold * 1e6, LOWER),
+        "decode_cached_us": (warm * 1e6, LOWER),
+        "decode_per_s": (1 / warm, HIGHER),
+    }
+
+
+def bench_filter(population, args):
+    pipeline = ScanPipeline(UuidDecoder(), _no_log, name_filter=args.filter, track_changes=False)
+    for ad in population.adverts(len(population)):
+        pipeline.handle(ad)
+    entries = list(pipeline.devices.items()) * max(1, args.adverts // len(population))
+
+    def run(make_filter):
+        def once():
+            device_filter = make_filter()
+            started = time.perf_counter()
+            for address, info in entries:
+                device_filter.matches(address, info)
+            return time.perf_counter() - started, None
+        return best_of(args.repeat, once)[0] / len(entries)
+
+    cached = DeviceFilter(args.filter)
+    for address, info in pipeline.devices.items():
+        cached.matches(address, info)
+    uncached = run(lambda: _Uncached(args.filter))
+
+    def apply():
+        pipeline.set_filter("")
+        started = time.perf_counter()
+        pipeline.set_filter(args.filter)
+        return time.perf_counter() - started, None
+
+    return {
+        "filter_us": (run(lambda: cached) * 1e6, LOWER),
+        "filter_uncached_us": (uncached * 1e6, LOWER),
+        "filter_apply_ms": (best_of(args.repeat, apply)[0] * 1000, LOWER),
+    }
+
+
+class _Uncached(DeviceFilter):
+    def matches(self, address, info):
+        return self.test(info["name"], address, info["phone"], info["card"], info["rssi"])
+
+
+def bench_pipeline(population, args):
+    adverts = list(population.adverts(args.adverts))
+
+    def once():
+        pipeline = ScanPipeline(UuidDecoder(), _no_log, name_filter=args.filter)
+        handle = pipeline.handle
+        started = time.perf_counter()
+        for ad in adverts:
+            handle(ad)
+        return time.perf_counter() - started, pipeline
+
+    elapsed, pipeline = best_of(args.repeat, once)
+    return {
+        "pipeline_us": (elapsed / len(adverts) * 1e6, LOWER),
+        "pipeline_decoded_ratio": (pipeline.decoded / pipeline.processed, HIGHER),
+    }
+
+
+def bench_engine(population, args):
+    raw = list(population.raw_adverts(args.adverts))
+
+    def once():
+        pipeline = ScanPipeline(UuidDecoder(), _no_log, name_filter=args.filter)
+        engine = ScanEngine(pipeline.handle, dedup_interval=1.0, scanner_factory=lambda cb, mode: None)
+        detect = engine._on_detection
+        started = time.perf_counter()
+        for device, adv in raw:
+            detect(device, adv)
+        return time.perf_counter() - started, engine
+
+    elapsed, engine = best_of(args.repeat, once)
+    return {
+        "engine_pipeline_adverts_per_s": (len(raw) / elapsed, HIGHER),
+        "engine_duplicate_ratio": (engine.duplicates / engine.received, HIGHER),
+    }
+
+
+def bench_session_log(population, args):
+    adverts = list(population.adverts(min(args.adverts, 50_000)))
+
+    def once():
+        with tempfile.TemporaryDirectory() as directory:
+            writer = SessionLogWriter(directory).start()
+            started = time.perf_counter()
+            for ad in adverts:
+                writer.write("advert", address=ad.address, name=ad.name, rssi=ad.rssi, uuids=ad.service_uuids)
+            enqueued = time.perf_counter() - started
+            writer.close()
+            return enqueued, time.perf_counter() - started
+
+    enqueued, total = best_of(args.repeat, once)
+    return {
+        "session_log_write_us": (enqueued / len(adverts) * 1e6, LOWER),
+        "session_log_records_per_s": (len(adverts) / total, HIGHER),
+    }
+
+
+def _flet():
+    try:
+        import flet
+    except ImportError:
+        raise Skip("flet is not installed")
+    return flet
+
+
+def bench_device_table(population, args):
+    ft = _flet()
+    from device_table import DeviceTable
+    from pipeline import render_to_table
+
+    adverts = list(population.adverts(args.adverts))
+    frame = max(1, len(population) // 4)  # adverts between two renders
+
+    def once():
+        pipeline = ScanPipeline(UuidDecoder(), _no_log, name_filter=args.filter)
+        table = DeviceTable(ft.DataTable(columns=[ft.DataColumn(ft.Text(c)) for c in "ABCDE"], rows=[]),
+                            on_connect=lambda address: None, on_select=lambda address: None)
+        renders = 0
+        render_time = 0.0
+        for i in range(0, len(adverts), frame):
+            for ad in adverts[i:i + frame]:
+                pipeline.handle(ad)
+            started = time.perf_counter()
+            render_to_table(pipeline, table)
+            render_time += time.perf_counter() - started
+            renders += 1
+        if len(table) != len(pipeline.visible):
+            raise AssertionError(f"{len(table)} table rows for {len(pipeline.visible)} visible devices")
+        return render_time / renders, table
+
+    per_render, table = best_of(args.repeat, once)
+    return {
+        "table_render_ms": (per_render * 1000, LOWER),
+        "table_cells_patched_per_render": (table.cells_patched / max(1, len(adverts) // frame), LOWER),
+    }
+
+
+def bench_log_sink(population, args):
+    ft = _flet()
+    from log_sink import LogSink
+
+    lines = [(f"[SCAN] Found: {ad.name} ({ad.address}) | RSSI: {ad.rssi}", "amber")
+             for ad in population.adverts(min(args.adverts, 100_000))]
+
+    def once():
+        updates = []
+        sink = LogSink(ft.ListView(), update=lambda: updates.append(1))
+        started = time.perf_counter()
+        for i, (msg, color) in enumerate(lines, 1):
+            sink.log(msg, color)
+            if i % 400 == 0:
+                sink.flush()
+        sink.flush()
+        return time.perf_counter() - started, len(updates)
+
+    elapsed, updates = best_of(args.repeat, once)
+    return {
+        "log_lines_per_s": (len(lines) / elapsed, HIGHER),
+        "log_page_updates": (updates, LOWER),
+    }
+
+
+BENCHMARKS = {
+    "decode": bench_decode,
+    "filter": bench_filter,
+    "pipeline": bench_pipeline,
+    "engine": bench_engine,
+    "session_log": bench_session_log,
+    "device_table": bench_device_table,
+    "log_sink": bench_log_sink,
+}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def load_thresholds(path):
+    if not path or not os.path.exists(path):
+        return {"default_tolerance": 0.25, "limits": {}, "tolerance": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def check(results, thresholds, baseline=None):
+    """Returns a list of human-readable regression messages."""
+    failures = []
+    limits = thresholds.get("limits", {})
+    for name, result in results.items():
+        value, better = result["value"], result["better"]
+        limit = limits.get(name)
+        if limit is not None:
+            if better == LOWER and value > limit:
+                failures.append(f"{name} = {value:.4g} is above the limit {limit:.4g}")
+            if better == HIGHER and value < limit:
+                failures.append(f"{name} = {value:.4g} is below the limit {limit:.4g}")
+        if baseline is None or name not in baseline:
+            continue
+        old = baseline[name]["value"]
+        tolerance = thresholds.get("tolerance", {}).get(name, thresholds.get("default_tolerance", 0.25))
+        if old and better == LOWER and value > old * (1 + tolerance):
+            failures.append(f"{name} regressed: {old:.4g} -> {value:.4g} (+{value / old - 1:.0%}, "
+                            f"tolerance {tolerance:.0%})")
+        if old and better == HIGHER and value < old * (1 - tolerance):
+            failures.append(f"{name} regressed: {old:.4g} -> {value:.4g} ({value / old - 1:.0%}, "
+                            f"tolerance {tolerance:.0%})")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scan pipeline benchmark suite.")
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--adverts", type=int, default=100_000)
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="payload mix, e.g. a=0.4,b=0.3,other=0.3")
+    parser.add_argument("--rssi-noise", type=float, default=4.0, help="RSSI noise (dB, standard deviation)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--filter", default="mcan has:any", help="device filter expression used throughout")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark; the best one counts")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="run only these benchmarks")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/<timestamp>_<commit>.json)")
+    parser.add_argument("--no-save", action="store_true", help="do not write a result file")
+    parser.add_argument("--compare", metavar="RESULT.json", help="fail on regressions against an earlier result")
+    parser.add_argument("--thresholds", default=THRESHOLDS_PATH)
+    parser.add_argument("--allow-skip", action="store_true",
+                        help="do not fail when a benchmark is skipped (e.g. Flet is not installed)")
+    args = parser.parse_args(argv)
+
+    population = SyntheticPopulation(args.devices, seed=args.seed, mix=args.mix, rssi_noise=args.rssi_noise)
+    results, skipped, failed = {}, {}, {}
+    for name in args.only or BENCHMARKS:
+        try:
+            metrics = BENCHMARKS[name](population, args)
+        except Skip as ex:
+            skipped[name] = str(ex)
+            print(f"{name:<14} SKIPPED: {ex} (not measured)")
+            continue
+        except Exception as ex:
+            failed[name] = f"{type(ex).__name__}: {ex}"
+            traceback.print_exc()
+            print(f"{name:<14} FAILED: {failed[name]}")
+            continue
+        for metric, (value, better) in metrics.items():
+            results[metric] = {"value": value, "better": better}
+            print(f"{name:<14} {metric:<34} {value:>14,.3f}  ({better} is better)")
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "commit": commit,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": {"devices": args.devices, "adverts": args.adverts, "mix": args.mix,
+                       "rssi_noise": args.rssi_noise, "seed": args.seed, "repeat": args.repeat,
+                       "filter": args.filter},
+        },
+        "results": results,
+        "skipped": skipped,
+        "failed": failed,
+    }
+    if not args.no_save:
+        path = args.output or os.path.join(
+            RESULTS_DIR, f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{commit or 'nogit'}.json")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {path}")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            old = json.load(f)
+        if old["meta"]["params"] != report["meta"]["params"]:
+            print(f"warning: {args.compare} was run with different parameters: {old['meta']['params']}")
+        baseline = old["results"]
+    failures = check(results, load_thresholds(args.thresholds), baseline)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    if skipped:
+        print(f"{len(skipped)} benchmark(s) skipped, not measured: {', '.join(skipped)}"
+              + ("" if args.allow_skip else " (use --allow-skip to accept)"))
+    if failed:
+        print(f"{len(failed)} benchmark(s) failed: {', '.join(failed)}")
+    return 1 if failures or failed or (skipped and not args.allow_skip) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""Synthetic advertiser populations for benchmarks.
+
+SyntheticPopulation builds N devices with a configurable mix of payloads:
+
+- "a":     Rule A literal-hex UUIDs (010... phone in segments 1-3, card in 4)
+- "b":     Rule B ASCII-encoded UUIDs (an 11-digit 010 phone number, some with a card)
+- "other": Bluetooth SIG 16-bit service UUIDs and random 128-bit UUIDs (no number)
+
+plus a base RSSI per device and Gaussian RSSI noise per advert. Everything
+is derived from `seed`, so two runs produce identical workloads.
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scan_engine import Advertisement, FakeAdvertisementData, FakeDevice
+
+SIG_SHORT_UUIDS = ("fd69", "fef3", "fe9f", "180f", "180a", "fff0", "feaa")
+DEFAULT_MIX = {"a": 0.4, "b": 0.3, "other": 0.3}
+
+
+def _format_uuid(hex32):
+    return f"{hex32[:8]}-{hex32[8:12]}-{hex32[12:16]}-{hex32[16:20]}-{hex32[20:32]}"
+
+
+def rule_a_uuid(rng):
+    phone = "010" + "".join(rng.choice("0123456789") for _ in range(13))
+    card = f"{rng.randrange(10000):04d}"
+    return _format_uuid(phone + card + "".join(rng.choice("0123456789abcdef") for _ in range(12)))
+
+
+def rule_b_uuid(rng):
+    text = "010" + "".join(rng.choice("0123456789") for _ in range(8))
+    if rng.random() < 0.3:
+        text += "".join(rng.choice("0123456789") for _ in range(5))
+    return _format_uuid(text.encode("ascii").hex().ljust(32, "0"))
+
+
+def other_uuid(rng):
+    if rng.random() < 0.7:
+        return f"0000{rng.choice(SIG_SHORT_UUIDS)}-0000-1000-8000-00805f9b34fb"
+    return _format_uuid(f"{rng.getrandbits(128):032x}")
+
+
+def parse_mix(text):
+    """"a=0.4,b=0.3,other=0.3" → dict; weights need not sum to 1."""
+    mix = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        if kind.strip() not in DEFAULT_MIX:
+            raise ValueError(f"Unknown payload kind: {kind!r}")
+        mix[kind.strip()] = float(weight)
+    return mix
+
+
+class SyntheticPopulation:
+    """N synthetic advertisers; `names` alternate between filter hits ("mcandle-") and misses."""
+
+    def __init__(self, devices=200, seed=1, mix=None, rssi_noise=4.0, match_ratio=0.7):
+        self.rng = random.Random(seed)
+        self.rssi_noise = rssi_noise
+        mix = mix or DEFAULT_MIX
+        kinds, weights = zip(*mix.items())
+        makers = {"a": rule_a_uuid, "b": rule_b_uuid, "other": other_uuid}
+        self.devices = []
+        for i in range(devices):
+            kind = self.rng.choices(kinds, weights)[0]
+            uuids = [makers[kind](self.rng)]
+            if self.rng.random() < 0.3:
+                uuids.append(other_uuid(self.rng))
+            name = f"mcandle-{i}" if self.rng.random() < match_ratio else f"Phone-{i}"
+            address = f"5E:00:{i >> 16 & 0xFF:02X}:{i >> 8 & 0xFF:02X}:{i & 0xFF:02X}:00"
+            self.devices.append((FakeDevice(address, name), uuids, self.rng.uniform(-95, -40), kind))
+
+    def __len__(self):
+        return len(self.devices)
+
+    @property
+    def uuid_sets(self):
+        return [uuids for _, uuids, _, _ in self.devices]
+
+    def _rssi(self, base):
+        return int(round(base + self.rng.gauss(0, self.rssi_noise)))
+
+    def raw_adverts(self, count):
+        """(device, advertisement data) pairs as a scanner backend would deliver them, round-robin."""
+        devices = self.devices
+        for i in range(count):
+            device, uuids, base, _ = devices[i % len(devices)]
+            yield device, FakeAdvertisementData(device.name, self._rssi(base), uuids)
+
+    def adverts(self, count, detected_at=0.0):
+        """Ready-made Advertisements for feeding ScanPipeline directly."""
+        for device, adv in self.raw_adverts(count):
+            yield Advertisement(device.address, device.name, adv.rssi, adv.service_uuids, {}, {},
+                                detected_at, device)
@@ -0,0 +1,287 @@
+"""Phone/card extraction from advertisement payloads.
+
+Each advertiser format is a PayloadDecoder that declares a cheap prefilter
+(UUID prefix, number of UUID segments, manufacturer company ID or service-data
+UUID). DecoderRegistry indexes decoders by those keys, so only the formats
+whose prefilter matches run their full parse and adding formats does not make
+every UUID more expensive.
+
+UuidDecoder wraps a registry with an LRU cache keyed on the payload: a tag
+keeps broadcasting the same UUIDs for minutes, so almost every lookup is a hit.
+"""
+import functools
+import re
+
+PHONE_PATTERN = re.compile(r'010\d{8}')
+CARD_PATTERN = re.compile(r'\d{8,16}')
+
+# 16-bit/32-bit UUIDs expanded onto the Bluetooth SIG base UUID. Only the first
+# four bytes vary, so their ASCII form can never hold an 8-digit run.
+SIG_BASE_SUFFIX = "-0000-1000-8000-00805f9b34fb"
+
+CANDIDATE_CACHE_SIZE = 4096  # distinct UUID heads whose candidate lists are kept
+
+
+class PayloadDecoder:
+    """Base class for one advertiser payload format.
+
+    Prefilters (all optional, checked before the full parse):
+    - uuid_prefixes: only UUIDs whose hex digits (dashes removed) start with one of these
+    - uuid_segments: only UUIDs with this many dash-separated segments
+    - company_ids: manufacturer-data company IDs handled by decode_manufacturer_data
+    - service_data_uuids: service-data UUIDs handled by decode_service_data
+
+    A decoder with neither uuid_prefixes nor company_ids/service_data_uuids is
+    a UUID fallback and is offered every UUID that passes accepts_uuid().
+    Decode methods return (phone, card) or None; lower priority runs first.
+    """
+    name = "base"
+    priority = 100
+    uuid_prefixes = ()
+    uuid_segments = None
+    company_ids = ()
+    service_data_uuids = ()
+
+    @property
+    def handles_uuids(self):
+        return type(self).decode_uuid is not PayloadDecoder.decode_uuid
+
+    def accepts_uuid(self, uuid, parts):
+        return True
+
+    def decode_uuid(self, uuid, parts):
+        return None
+
+    def decode_manufacturer_data(self, company_id, data):
+        return None
+
+    def decode_service_data(self, uuid, data):
+        return None
+
+
+class LiteralHexDecoder(PayloadDecoder):
+    """Rule A: Literal Hex Segments.
+
+    If standard 8-4-4-4-12 UUID format:
+    Phone = Segments 1, 2, 3 concatenated (8+4+4 = 16 hex chars)
+    Card = Segment 4 (4 hex chars)
+    """
+    name = "literal-hex"
+    priority = 10
+    uuid_prefixes = ("010", "1234")  # 1234 for user's example
+    uuid_segments = 5
+
+    def accepts_uuid(self, uuid, parts):
+        # The prefix index looks at the dash-less UUID; the rule itself only
+        # looks at the first three segments.
+        return f"{parts[0]}{parts[1]}{parts[2]}".startswith(self.uuid_prefixes)
+
+    def decode_uuid(self, uuid, parts):
+        return f"{parts[0]}{parts[1]}{parts[2]}", parts[3]
+
+
+class AsciiDecoder(PayloadDecoder):
+    """Rule B: ASCII Conversion (Fallback)."""
+    name = "ascii"
+    priority = 20
+
+    def accepts_uuid(self, uuid, parts):
+        return not (len(uuid) == 36 and uuid.endswith(SIG_BASE_SUFFIX))
+
+    def decode_uuid(self, uuid, parts):
+        try:
+            decoded_str = bytes.fromhex("".join(parts)).decode('ascii', errors='ignore')
+        except ValueError:
+            return None
+        phone = ""
+        card = ""
+        phone_match = PHONE_PATTERN.search(decoded_str)
+        if phone_match:
+            phone = phone_match.group()
+        card_match = CARD_PATTERN.search(decoded_str)
+        if card_match and card_match.group() != phone:
+            card = card_match.group()
+        if phone or card:
+            return phone, card
+        return None
+
+
+class DecoderRegistry:
+    """Indexes PayloadDecoders by their prefilters."""
+
+    def __init__(self, decoders=()):
+        self.decoders = []
+        self._by_prefix = {}  # prefix length: {prefix: [decoder]}
+        self._uuid_fallbacks = []
+        self._by_company = {}  # company id: [decoder]
+        self._by_service_uuid = {}  # service-data uuid: [decoder]
+        self._max_prefix_len = 0
+        self._candidates_by_head = {}  # first _max_prefix_len hex digits: [decoder]
+        for decoder in decoders:
+            self.register(decoder)
+
+    def register(self, decoder):
+        if any(d.name == decoder.name for d in self.decoders):
+            raise ValueError(f"Decoder already registered: {decoder.name}")
+        self.decoders.append(decoder)
+        if decoder.uuid_prefixes:
+            for prefix in decoder.uuid_prefixes:
+                self._max_prefix_len = max(self._max_prefix_len, len(prefix))
+                self._by_prefix.setdefault(len(prefix), {}).setdefault(prefix.lower(), []).append(decoder)
+        elif decoder.handles_uuids:
+            self._uuid_fallbacks.append(decoder)
+        for company_id in decoder.company_ids:
+            self._by_company.setdefault(company_id, []).append(decoder)
+        for uuid in decoder.service_data_uuids:
+            self._by_service_uuid.setdefault(uuid.lower(), []).append(decoder)
+        self._sort()
+        return decoder
+
+    def _sort(self):
+        key = lambda d: d.priority
+        for bucket in self._by_prefix.values():
+            for decoders in bucket.values():
+                decoders.sort(key=key)
+        self._candidates_by_head.clear()
+        self._uuid_fallbacks.sort(key=key)
+        for decoders in self._by_company.values():
+            decoders.sort(key=key)
+        for decoders in self._by_service_uuid.values():
+            decoders.sort(key=key)
+
+    def uuid_candidates(self, uuid):
+        """Decoders whose prefix filter matches `uuid`, in priority order."""
+        head = uuid[:self._max_prefix_len]
+        if "-" in head:
+            head = uuid.replace("-", "")[:self._max_prefix_len]
+        head = head.lower()
+        candidates = self._candidates_by_head.get(head)
+        if candidates is None:
+            if len(self._candidates_by_head) >= CANDIDATE_CACHE_SIZE:
+                self._candidates_by_head.clear()
+            candidates = list(self._uuid_fallbacks)
+            for length, bucket in self._by_prefix.items():
+                candidates.extend(bucket.get(head[:length], ()))
+            candidates.sort(key=lambda d: d.priority)
+            self._candidates_by_head[head] = candidates
+        return candidates
+
+    def decode_uuid(self, uuid):
+        parts = uuid.split("-")
+        for decoder in self.uuid_candidates(uuid):
+            if decoder.uuid_segments is not None and len(parts) != decoder.uuid_segments:
+                continue
+            if not decoder.accepts_uuid(uuid, parts):
+                continue
+            result = decoder.decode_uuid(uuid, parts)
+            if result is not None:
+                return result
+        return None
+
+    def decode(self, uuids, manufacturer_data=None, service_data=None):
+        """Returns (phone, card) from the first payload any decoder understands.
+
+        Service UUIDs are tried first (in advertised order), then manufacturer
+        data, then service data.
+        """
+        for uuid in uuids:
+            result = self.decode_uuid(uuid)
+            if result is not None:
+                return result
+        if manufacturer_data:
+            for company_id, data in manufacturer_data.items():
+                for decoder in self._by_company.get(company_id, ()):
+                    result = decoder.decode_manufacturer_data(company_id, data)
+                    if result is not None:
+                        return result
+        if service_data:
+            for uuid, data in service_data.items():
+                for decoder in self._by_service_uuid.get(uuid.lower(), ()):
+                    result = decoder.decode_service_data(uuid, data)
+                    if result is not None:
+                        return result
+        return "", ""
+
+
+def default_registry():
+    return DecoderRegistry([LiteralHexDecoder(), AsciiDecoder()])
+
+
+_default_registry = default_registry()
+
+
+def decode_uuids(uuids):
+    """Returns (phone, card) from the first UUID that yields any data."""
+    return _default_registry.decode(uuids)
+
+
+class UuidDecoder:
+    """Memoized DecoderRegistry.decode() with hit/miss counters.
+
+    cache_size is the number of distinct payloads remembered (None = unbounded).
+    """
+
+    def __init__(self, cache_size=1024, registry=None):
+        self.cache_size = cache_size
+        self.registry = registry or default_registry()
+        self._decode = functools.lru_cache(maxsize=cache_size)(self._decode_key)
+
+    def _decode_key(self, key):
+        uuids, manufacturer_data, service_data = key
+        return self.registry.decode(uuids, dict(manufacturer_data), dict(service_data))
+
+    @staticmethod
+    def _key(uuids, manufacturer_data=None, service_data=None):
+        return (
+            tuple(uuids),
+            tuple(sorted(manufacturer_data.items())) if manufacturer_data else (),
+            tuple(sorted(service_data.items())) if service_data else (),
+        )
+
+    def register(self, decoder):
+        """Adds a payload format; cached results are discarded."""
+        self.registry.register(decoder)
+        self.clear()
+        return decoder
+
+    def decode(self, uuids, manufacturer_data=None, service_data=None):
+        if manufacturer_data or service_data:
+            return self._decode(self._key(uuids, manufacturer_data, service_data))
+        return self._decode((tuple(uuids), (), ()))
+
+    def decode_many(self, payloads):
+        """Decodes a whole scan at once; returns a list of (phone, card) in input order.
+
+        Each item is either a list of UUIDs or a (uuids, manufacturer_data,
+        service_data) tuple.
+        """
+        decode, key = self._decode, self._key
+        results = []
+        for payload in payloads:
+            if isinstance(payload, tuple) and len(payload) == 3:
+                results.append(decode(key(*payload)))
+            else:
+                results.append(decode((tuple(payload), (), ())))
+        return results
+
+    @property
+    def hits(self):
+        return self._decode.cache_info().hits
+
+    @property
+    def misses(self):
+        return self._decode.cache_info().misses
+
+    def stats(self):
+        info = self._decode.cache_info()
+        total = info.hits + info.misses
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "max_size": info.maxsize,
+            "hit_rate": info.hits / total if total else 0.0,
+        }
+
+    def clear(self):
+        self._decode.cache_clear()
@@ -0,0 +1,185 @@
+"""Device filter expressions, compiled once and matched per device.
+
+A filter is a whitespace-separated list of terms; a device must match all of
+them. Terms:
+
+    mcan            name contains "mcan" (case-insensitive)
+    "two words"     name contains the quoted text
+    /^mc.*-\\d+$/    name matches the regular expression (case-insensitive)
+    mac:5E:00       address starts with 5E:00
+    rssi>-70        smoothed RSSI above -70 dBm (also >=, <, <=)
+    phone:1234      decoded phone number contains 1234 (non-digits are ignored)
+    card:0042       decoded card number contains 0042
+    has:phone       a phone number was decoded (also has:card, has:any)
+    -term, !term    the term must not match
+    a|b             either alternative (name, mac:, phone: and card: terms)
+
+An empty filter matches every device. Everything except the RSSI terms
+depends only on the advertisement payload, so DeviceFilter caches that part
+of the result per address until the device's payload changes.
+"""
+import operator
+import re
+
+_TOKEN = re.compile(r'[-!]?(?:"[^"]*"?|/(?:\\.|[^/\\])*/?|\S+)')
+_RSSI = re.compile(r"rssi(>=|<=|>|<)(-?\d+)$", re.IGNORECASE)
+_RSSI_OPS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+_FIELDS = ("mac", "phone", "card")
+_NARROWING_FIELDS = ("name", "mac", "phone", "card")
+
+
+class FilterError(ValueError):
+    pass
+
+
+def _digits(value):
+    return "".join(c for c in value if c.isdigit())
+
+
+class Term:
+    """One compiled term: `test(name, address, phone, card, rssi)` → bool, before negation."""
+
+    __slots__ = ("field", "values", "negate", "dynamic", "test")
+
+    def __init__(self, field, values, negate, test, dynamic=False):
+        self.field = field
+        self.values = values
+        self.negate = negate
+        self.test = test
+        self.dynamic = dynamic  # depends on RSSI, so never cached
+
+    def narrows(self, other):
+        """True if every device matching self also matches `other` (conservative)."""
+        if (self.field, self.values, self.negate) == (other.field, other.values, other.negate):
+            return True
+        if (self.negate or other.negate or self.field != other.field or self.field not in _NARROWING_FIELDS
+                or len(self.values) != 1 or len(other.values) != 1):
+            return False
+        if self.field == "mac":
+            return self.values[0].startswith(other.values[0])
+        return other.values[0] in self.values[0]
+
+
+def _substring_term(field, raw, negate):
+    values = tuple(v for v in raw.split("|") if v)
+    if not values:
+        return None
+    if field == "name":
+        values = tuple(v.lower() for v in values)
+        return Term(field, values, negate, lambda name, address, phone, card, rssi:
+                    any(v in name.lower() for v in values))
+    if field == "mac":
+        values = tuple(v.upper().replace("-", ":") for v in values)
+        return Term(field, values, negate, lambda name, address, phone, card, rssi:
+                    address.upper().startswith(values))
+    values = tuple(_digits(v) for v in values)
+    if not all(values):
+        raise FilterError(f"{field}: needs digits")
+    if field == "phone":
+        return Term(field, values, negate, lambda name, address, phone, card, rssi:
+                    bool(phone) and any(v in _digits(phone) for v in values))
+    return Term(field, values, negate, lambda name, address, phone, card, rssi:
+                bool(card) and any(v in _digits(card) for v in values))
+
+
+def _compile_term(token):
+    negate = token[0] in "-!" and len(token) > 1
+    if negate:
+        token = token[1:]
+    elif token in ("-", "!"):
+        return None  # a negation still being typed
+    if token.startswith('"'):
+        if len(token) < 2 or not token.endswith('"'):
+            raise FilterError("Unterminated quote")
+        return _substring_term("name", token[1:-1], negate) if token[1:-1] else None
+    if token.startswith("/"):
+        if len(token) < 2 or not token.endswith("/"):
+            raise FilterError("Unterminated regular expression")
+        try:
+            pattern = re.compile(token[1:-1], re.IGNORECASE)
+        except re.error as ex:
+            raise FilterError(f"Invalid regular expression: {ex}") from None
+        search = pattern.search
+        return Term("regex", (pattern.pattern,), negate, lambda name, address, phone, card, rssi:
+                    search(name) is not None)
+    lowered = token.lower()
+    if lowered.startswith(("rssi<", "rssi>")):
+        match = _RSSI.match(token)
+        if match is None:
+            raise FilterError(f"Expected rssi>N, rssi>=N, rssi<N or rssi<=N, got {token!r}")
+        op, threshold = _RSSI_OPS[match.group(1)], int(match.group(2))
+        return Term("rssi", (match.group(1), threshold), negate, lambda name, address, phone, card, rssi:
+                    rssi is not None and op(rssi, threshold), dynamic=True)
+    field, sep, value = token.partition(":")
+    field = field.lower()
+    if sep and field == "has":
+        wanted = value.lower()
+        if wanted not in ("phone", "card", "any"):
+            raise FilterError(f"Expected has:phone, has:card or has:any, got {token!r}")
+        return Term("has", (wanted,), negate, lambda name, address, phone, card, rssi:
+                    bool(phone if wanted == "phone" else card if wanted == "card" else phone or card))
+    if sep and field in _FIELDS:
+        return _substring_term(field, value, negate)
+    return _substring_term("name", token, negate)
+
+
+class DeviceFilter:
+    """A compiled filter expression with a per-device cache of the payload-dependent result."""
+
+    def __init__(self, text=""):
+        self.text = (text or "").strip()
+        terms = [_compile_term(token) for token in _TOKEN.findall(self.text)]
+        self.terms = [term for term in terms if term is not None]
+        self._static = [term for term in self.terms if not term.dynamic]
+        self._dynamic = [term for term in self.terms if term.dynamic]
+        self._cache = {}  # address: (payload, static result)
+        self.hits = 0
+        self.misses = 0
+
+    def __bool__(self):
+        return bool(self.terms)
+
+    def narrows(self, other):
+        """True if this filter can only hide devices `other` shows, so only those need re-checking."""
+        return all(any(term.narrows(old) for term in self.terms) for old in other.terms)
+
+    def test(self, name, address="", phone="", card="", rssi=None):
+        """Uncached match of one device."""
+        for term in self.terms:
+            if term.test(name, address, phone, card, rssi) == term.negate:
+                return False
+        return True
+
+    def matches(self, address, info):
+        """Cached match of a ScanPipeline.devices entry."""
+        if not self.terms:
+            return True
+        payload = info["payload"]
+        cached = self._cache.get(address)
+        if cached is not None and cached[0] == payload:
+            self.hits += 1
+            result = cached[1]
+        else:
+            self.misses += 1
+            name, phone, card = info["name"], info["phone"], info["card"]
+            result = True
+            for term in self._static:
+                if term.test(name, address, phone, card, None) == term.negate:
+                    result = False
+                    break
+            self._cache[address] = (payload, result)
+        if not result:
+            return False
+        rssi = info["rssi"]
+        for term in self._dynamic:
+            if term.test(None, address, None, None, rssi) == term.negate:
+                return False
+        return True
+
+    def forget(self, address):
+        self._cache.pop(address, None)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0,
+                "cached": len(self._cache)}
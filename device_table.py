@@ -0,0 +1,120 @@
+"""Keyed, incrementally updated device table.
+
+DeviceTable owns the rows of an ft.DataTable and keeps one DataRow per MAC
+address. Updates patch only the Text cells whose value changed; rows are
+created or removed only when a device appears, expires or stops matching the
+filter.
+"""
+import flet as ft
+
+
+class DeviceRow:
+    __slots__ = ("row", "name_text", "phone_text", "card_text", "rssi_text")
+
+    def __init__(self, row, name_text, phone_text, card_text, rssi_text):
+        self.row = row
+        self.name_text = name_text
+        self.phone_text = phone_text
+        self.card_text = card_text
+        self.rssi_text = rssi_text
+
+
+class DeviceTable:
+    """One DataRow per address, patched in place.
+
+    `on_connect(address)` is called when the row's Connect button is clicked.
+    The counters (rows_added, rows_removed, cells_patched) describe how much
+    the table changed and are used by benchmarks/bench_device_table.py.
+    """
+
+    def __init__(self, data_table: ft.DataTable, on_connect, on_select=None, highlight_color="green900"):
+        self.data_table = data_table
+        self.on_connect = on_connect
+        self.on_select = on_select
+        self.highlight_color = highlight_color
+        self.highlighted = None
+        self._rows = {}  # address: DeviceRow
+        self.rows_added = 0
+        self.rows_removed = 0
+        self.cells_patched = 0
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, address):
+        return address in self._rows
+
+    def addresses(self):
+        return self._rows.keys()
+
+    def upsert(self, address, name, phone, card, rssi):
+        """Adds a row for a new address or patches the cells that changed.
+
+        Returns True if anything visible changed.
+        """
+        entry = self._rows.get(address)
+        if entry is None:
+            self._add(address, name, phone, card, rssi)
+            return True
+
+        changed = False
+        for text, value in (
+            (entry.name_text, f"{name} ({address})"),
+            (entry.phone_text, phone or "-"),
+            (entry.card_text, card or "-"),
+            (entry.rssi_text, str(rssi)),
+        ):
+            if text.value != value:
+                text.value = value
+                self.cells_patched += 1
+                changed = True
+        return changed
+
+    def remove(self, address):
+        """Removes the row for `address`; returns True if there was one."""
+        entry = self._rows.pop(address, None)
+        if entry is None:
+            return False
+        self.data_table.rows.remove(entry.row)
+        self.rows_removed += 1
+        if self.highlighted == address:
+            self.highlighted = None
+        return True
+
+    def highlight(self, address):
+        """Colors the row of `address` (None clears); returns True if it changed."""
+        if address not in self._rows:
+            address = None
+        if address == self.highlighted:
+            return False
+        previous = self._rows.get(self.highlighted)
+        if previous is not None:
+            previous.row.color = None
+        if address is not None:
+            self._rows[address].row.color = self.highlight_color
+        self.highlighted = address
+        return True
+
+    def clear(self):
+        self.highlighted = None
+        self._rows.clear()
+        self.data_table.rows.clear()
+
+    def _add(self, address, name, phone, card, rssi):
+        name_text = ft.Text(f"{name} ({address})")
+        phone_text = ft.Text(phone or "-")
+        card_text = ft.Text(card or "-")
+        rssi_text = ft.Text(str(rssi))
+        row = ft.DataRow(
+            cells=[
+                ft.DataCell(name_text),
+                ft.DataCell(phone_text),
+                ft.DataCell(card_text),
+                ft.DataCell(rssi_text),
+                ft.DataCell(ft.FilledButton("Connect", on_click=lambda e, addr=address: self.on_connect(addr))),
+            ],
+            on_select_change=(lambda e, addr=address: self.on_select(addr)) if self.on_select else None,
+        )
+        self._rows[address] = DeviceRow(row, name_text, phone_text, card_text, rssi_text)
+        self.data_table.rows.append(row)
+        self.rows_added += 1
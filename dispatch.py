@@ -0,0 +1,290 @@
+"""Concurrent order dispatch to several devices.
+
+DispatchQueue accepts (address, payload) jobs and runs
+connect → write characteristic → write → optional read-back for up to
+`concurrency` devices at once, through the shared ConnectionPool. Jobs for
+the same address run one after another. A failed attempt drops the pooled
+link and is retried with exponential backoff. Payloads larger than one write
+go out as chunked transfers (transfer.py). Every finished job leaves a
+DispatchReport (outcome, attempts, connect kind, latency), also written to the
+session log as a "dispatch" record.
+
+Nothing here touches the scanner, so scanning keeps running during a batch.
+
+    python dispatch.py --fake-gatt AA:BB:CC:DD:EE:01="Order 17 ready" AA:BB:CC:DD:EE:02="Order 18 ready"
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from transfer import send_payload
+
+OK = "ok"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class DispatchReport:
+    __slots__ = ("job_id", "address", "bytes", "outcome", "attempts", "kind", "error", "read_back",
+                 "queued_ms", "total_ms", "bytes_per_s")
+
+    def __init__(self, job_id, address, size):
+        self.job_id = job_id
+        self.address = address
+        self.bytes = size
+        self.outcome = None
+        self.attempts = 0
+        self.kind = None  # how the last connection was served (see gatt_pool)
+        self.error = None
+        self.read_back = None
+        self.queued_ms = 0.0  # waiting for a free slot
+        self.total_ms = 0.0   # submit → done
+        self.bytes_per_s = None  # set for chunked transfers (payload larger than one write)
+
+    def to_json(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class DispatchJob:
+    __slots__ = ("report", "payload", "response", "submitted_at", "future")
+
+    def __init__(self, report, payload, response, future):
+        self.report = report
+        self.payload = payload
+        self.response = response
+        self.submitted_at = time.perf_counter()
+        self.future = future
+
+
+class DispatchQueue:
+    """Bounded-parallelism sender on top of a ConnectionPool.
+
+    submit() returns a future resolving to the job's DispatchReport. `retries`
+    is the number of extra attempts after the first; the wait before attempt
+    n+1 is backoff * 2**(n-1), capped at max_backoff. With read_back the
+    read characteristic is read after the write and stored in the report.
+    `on_report(report)` is called for every finished job.
+    """
+
+    def __init__(self, pool, concurrency=3, retries=2, backoff=0.5, max_backoff=5.0, read_back=False,
+                 response=True, log_message=None, session_log=None, on_report=None):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.pool = pool
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.read_back = read_back
+        self.response = response
+        self.log_message = log_message or (lambda msg, color="white": None)
+        self.session_log = session_log
+        self.on_report = on_report
+        self.reports = []
+        self.submitted = 0
+        self.active = 0
+        self._queue = asyncio.Queue()
+        self._busy = set()  # addresses with a job in progress
+        self._waiting = {}  # address: jobs held back until the running one finishes
+        self._workers = []
+        self._next_id = 1
+
+    @property
+    def pending(self):
+        return self._queue.qsize() + sum(len(jobs) for jobs in self._waiting.values())
+
+    def start(self):
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        return self
+
+    async def stop(self):
+        """Cancels the workers; queued jobs are reported as cancelled."""
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        held = [job for jobs in self._waiting.values() for job in jobs]
+        self._waiting.clear()
+        while not self._queue.empty():
+            held.append(self._queue.get_nowait())
+        for job in held:
+            self._finish(job, CANCELLED, "dispatcher stopped")
+
+    def submit(self, address, payload, response=None):
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        report = DispatchReport(self._next_id, address, len(payload))
+        self._next_id += 1
+        self.submitted += 1
+        job = DispatchJob(report, payload, self.response if response is None else response,
+                          asyncio.get_running_loop().create_future())
+        self._queue.put_nowait(job)
+        self.start()
+        return job.future
+
+    async def dispatch(self, jobs):
+        """Submits [(address, payload)] and waits for all reports (in submission order)."""
+        return await asyncio.gather(*(self.submit(address, payload) for address, payload in jobs))
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            address = job.report.address
+            if address in self._busy:
+                self._waiting.setdefault(address, []).append(job)
+                continue
+            self._busy.add(address)
+            try:
+                while job is not None:
+                    await self._run(job)
+                    waiting = self._waiting.get(address)
+                    job = waiting.pop(0) if waiting else None
+                    if waiting is not None and not waiting:
+                        del self._waiting[address]
+            finally:
+                self._busy.discard(address)
+
+    async def _run(self, job):
+        report = job.report
+        report.queued_ms = (time.perf_counter() - job.submitted_at) * 1000
+        self.active += 1
+        try:
+            delay = self.backoff
+            while True:
+                report.attempts += 1
+                try:
+                    await self._attempt(job)
+                except Exception as ex:
+                    report.error = str(ex) or type(ex).__name__
+                    await self.pool.disconnect(report.address)
+                    if report.attempts > self.retries:
+                        self._finish(job, FAILED, report.error)
+                        return
+                    self.log_message(f"[DISPATCH] {report.address} attempt {report.attempts} failed "
+                                     f"({report.error}), retrying in {delay:.1f}s", color="grey400")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.max_backoff)
+                    continue
+                self._finish(job, OK)
+                return
+        except asyncio.CancelledError:
+            self._finish(job, CANCELLED, "dispatcher stopped")
+            raise
+        finally:
+            self.active -= 1
+
+    async def _attempt(self, job):
+        report = job.report
+        conn = await self.pool.acquire(report.address)
+        try:
+            report.kind = conn.kind
+            if conn.write_char is None:
+                raise LookupError("no writable characteristic")
+            transfer = await send_payload(conn.client, conn.write_char, job.payload, response=job.response)
+            if transfer is not None:
+                report.bytes_per_s = round(transfer.bytes_per_s, 1)
+            if self.read_back and conn.read_char is not None:
+                data = await conn.client.read_gatt_char(conn.read_char)
+                report.read_back = bytes(data).decode("utf-8", errors="ignore")
+        finally:
+            self.pool.release(conn)
+
+    def _finish(self, job, outcome, error=None):
+        report = job.report
+        report.outcome = outcome
+        report.error = error
+        report.total_ms = (time.perf_counter() - job.submitted_at) * 1000
+        self.reports.append(report)
+        if outcome == OK:
+            self.log_message(f"[DISPATCH] {report.address}: sent {report.bytes} bytes in {report.total_ms:.0f} ms "
+                             f"({report.attempts} attempt(s), {report.kind})", color="green")
+        else:
+            self.log_message(f"[DISPATCH] {report.address}: {outcome} after {report.attempts} attempt(s): {error}",
+                             color="red")
+        if self.session_log is not None:
+            self.session_log.write("dispatch", **report.to_json())
+        if self.on_report is not None:
+            self.on_report(report)
+        if not job.future.done():
+            job.future.set_result(report)
+
+    def summary(self):
+        done = self.reports
+        ok = [r for r in done if r.outcome == OK]
+        totals = sorted(r.total_ms for r in ok)
+        return {
+            "submitted": self.submitted,
+            "done": len(done),
+            "ok": len(ok),
+            "failed": sum(r.outcome == FAILED for r in done),
+            "cancelled": sum(r.outcome == CANCELLED for r in done),
+            "pending": self.pending,
+            "active": self.active,
+            "retries": sum(r.attempts - 1 for r in done if r.attempts),
+            "p50_ms": totals[len(totals) // 2] if totals else 0.0,
+            "max_ms": totals[-1] if totals else 0.0,
+        }
+
+
+def parse_job(text):
+    address, sep, payload = text.partition("=")
+    if not sep or not address:
+        raise argparse.ArgumentTypeError(f"expected ADDRESS=PAYLOAD, got {text!r}")
+    return address, payload
+
+
+async def run_batch(jobs, args):
+    from gatt_pool import CharacteristicCache, ConnectionPool, FakeGattClient
+
+    def log(msg, color="white"):
+        if args.verbose:
+            print(msg, file=sys.stderr)
+
+    factory = FakeGattClient.factory() if args.fake_gatt else None
+    pool = ConnectionPool(args.write_uuid, args.read_uuid, client_factory=factory, max_size=args.concurrency,
+                          cache=CharacteristicCache(args.cache), log_message=log)
+    queue = DispatchQueue(pool, concurrency=args.concurrency, retries=args.retries, backoff=args.backoff,
+                          read_back=args.read_back, response=not args.no_response, log_message=log)
+    started = time.perf_counter()
+    reports = await queue.dispatch(jobs)
+    elapsed = time.perf_counter() - started
+    await queue.stop()
+    await pool.close()
+    return reports, queue.summary(), elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Send payloads to several BLE devices concurrently.")
+    parser.add_argument("jobs", nargs="+", type=parse_job, metavar="ADDRESS=PAYLOAD")
+    parser.add_argument("--concurrency", type=int, default=3)
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--backoff", type=float, default=0.5, help="first retry delay (s), doubled per retry")
+    parser.add_argument("--read-back", action="store_true", help="read the read characteristic after writing")
+    parser.add_argument("--no-response", action="store_true", help="write without response")
+    parser.add_argument("--write-uuid", default="0000fff1-0000-1000-8000-00805f9b34fb")
+    parser.add_argument("--read-uuid", default="0000fff2-0000-1000-8000-00805f9b34fb")
+    parser.add_argument("--cache", default="logs/gatt_cache.json", help="characteristic handle cache file")
+    parser.add_argument("--fake-gatt", action="store_true", help="use simulated devices")
+    parser.add_argument("--json", action="store_true", help="print the reports as JSON")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print activity log lines to stderr")
+    args = parser.parse_args(argv)
+
+    reports, summary, elapsed = asyncio.run(run_batch(args.jobs, args))
+    if args.json:
+        json.dump({"elapsed_s": elapsed, "summary": summary, "jobs": [r.to_json() for r in reports]},
+                  sys.stdout, indent=2)
+        sys.stdout.write("\n")
+        return
+    print(f"{'job':>4} {'address':<20} {'outcome':<9} {'tries':>5} {'kind':<10} {'wait ms':>8} {'total ms':>9}  error")
+    for r in reports:
+        print(f"{r.job_id:>4} {r.address:<20} {r.outcome:<9} {r.attempts:>5} {r.kind or '-':<10} "
+              f"{r.queued_ms:>8.0f} {r.total_ms:>9.0f}  {r.error or ''}")
+    print(f"{summary['ok']}/{summary['submitted']} sent in {elapsed:.2f} s | retries {summary['retries']} | "
+          f"p50 {summary['p50_ms']:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,529 @@
+"""Pooled GATT connections with cached characteristic resolution.
+
+ConnectionPool keeps up to `max_size` connected clients alive, one per
+address, evicting the least recently used one when full and closing links
+that stayed idle for `idle_timeout` seconds. A returning device is served
+from the pool without reconnecting at all.
+
+When a device has to be connected again, CharacteristicCache (a small JSON
+file) remembers which write/read characteristics were selected for it last
+time, together with a signature of the service that holds them. The client
+is then created with only that service to resolve, and the characteristics
+are picked by handle instead of walking and logging every service. If the
+signature no longer matches (firmware update, different phone) the entry is
+dropped and the full discovery runs again.
+
+FakeGattClient stands in for BleakClient (`client_factory`) when no radio or
+phone is available.
+"""
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import time
+from collections import OrderedDict
+
+from pipeline import StageTimer
+
+SYSTEM_CHAR_SHORT_UUIDS = ("2b29", "2b2a", "2a00", "2a01", "2a05")
+
+REUSED = "reused"        # link was still open in the pool
+CACHED = "cached"        # reconnected, characteristics taken from the handle cache
+DISCOVERED = "discovered"  # reconnected with full service discovery
+
+
+def short_uuid(uuid):
+    return uuid.lower().split("-")[0][-4:]
+
+
+def select_characteristics(services, write_uuid, read_uuid, log=None):
+    """Picks the write and read characteristics of a connected device.
+
+    The characteristics with exactly `write_uuid` / `read_uuid` win; otherwise
+    the first writable / readable non-system characteristic is used.
+    `log(msg, color)` receives one line per service and characteristic.
+    """
+    write_char = read_char = None
+    fallback_write = fallback_read = None
+    for service in services:
+        if log: log(f"  [Service] {service.uuid} ({service.description})", "blue")
+        for char in service.characteristics:
+            char_uuid = char.uuid.lower()
+            short = short_uuid(char_uuid)
+            if log: log(f"    [Char] {char.uuid} (Short: {short}) | Props: {char.properties}", "grey400")
+            if char_uuid == write_uuid and write_char is None:
+                write_char = char
+                if log: log("      -> [MATCH] TARGET WRITE Characteristic found!", "green")
+            if char_uuid == read_uuid and read_char is None:
+                read_char = char
+                if log: log("      -> [MATCH] TARGET READ Characteristic found!", "green")
+            if short in SYSTEM_CHAR_SHORT_UUIDS:
+                continue
+            if fallback_write is None and ("write" in char.properties or "write-without-response" in char.properties):
+                fallback_write = char
+            if fallback_read is None and "read" in char.properties:
+                fallback_read = char
+    if write_char is None and fallback_write is not None:
+        write_char = fallback_write
+        if log: log(f"      -> Selected {short_uuid(write_char.uuid)} as fallback WRITE target", "blue")
+    if read_char is None and fallback_read is not None:
+        read_char = fallback_read
+        if log: log(f"      -> Selected {short_uuid(read_char.uuid)} as fallback READ target", "blue")
+    return write_char, read_char
+
+
+def service_signature(services, service_uuids):
+    """Hash of the layout (characteristic UUIDs, handles, properties) of the given services."""
+    digest = hashlib.sha1()
+    for service in sorted(services, key=lambda s: s.uuid):
+        if service.uuid not in service_uuids:
+            continue
+        digest.update(service.uuid.encode())
+        for char in sorted(service.characteristics, key=lambda c: c.handle):
+            digest.update(f"|{char.uuid}:{char.handle}:{','.join(sorted(char.properties))}".encode())
+    return digest.hexdigest()[:16]
+
+
+class CharacteristicCache:
+    """address → {signature, services, write, read} handles, persisted as JSON.
+
+    Only the `max_entries` most recently stored devices are kept.
+    """
+
+    def __init__(self, path="logs/gatt_cache.json", max_entries=512):
+        self.path = path
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self._entries = OrderedDict(json.load(f))
+        except (OSError, ValueError):
+            self._entries = OrderedDict()
+
+    def save(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, indent=1)
+        os.replace(tmp, self.path)
+
+    def get(self, address):
+        return self._entries.get(address)
+
+    def store(self, address, services, write_char, read_char):
+        chars = [c for c in (write_char, read_char) if c is not None]
+        service_uuids = sorted({c.service_uuid for c in chars})
+        self._entries[address] = {
+            "signature": service_signature(services, service_uuids),
+            "services": service_uuids,
+            "write": write_char.handle if write_char is not None else None,
+            "read": read_char.handle if read_char is not None else None,
+        }
+        self._entries.move_to_end(address)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self.save()
+
+    def invalidate(self, address):
+        if self._entries.pop(address, None) is not None:
+            self.save()
+
+    def resolve(self, address, services):
+        """(write_char, read_char) from the cached handles, or None if the entry is missing or stale."""
+        entry = self._entries.get(address)
+        if entry is None:
+            return None
+        if service_signature(services, entry["services"]) != entry["signature"]:
+            return None
+        try:
+            write_char = services.get_characteristic(entry["write"]) if entry["write"] is not None else None
+            read_char = services.get_characteristic(entry["read"]) if entry["read"] is not None else None
+        except Exception:
+            return None
+        if (entry["write"] is not None and write_char is None) or (entry["read"] is not None and read_char is None):
+            return None
+        return write_char, read_char
+
+
+class PooledConnection:
+    __slots__ = ("address", "client", "write_char", "read_char", "kind", "connected_at", "last_used", "users",
+                 "stale")
+
+    def __init__(self, address, client, write_char, read_char, kind):
+        self.address = address
+        self.client = client
+        self.write_char = write_char
+        self.read_char = read_char
+        self.kind = kind
+        self.connected_at = self.last_used = time.monotonic()
+        self.users = 0
+        self.stale = False  # disconnect() was asked while in use: close on the last release
+
+    @property
+    def is_connected(self):
+        return bool(getattr(self.client, "is_connected", False))
+
+
+def bleak_client_factory(address, services=None):
+    """Default client: a BleakClient, optionally restricted to resolving `services`."""
+    from bleak import BleakClient
+    if services:
+        return BleakClient(address, services=services)
+    return BleakClient(address)
+
+
+class ConnectionPool:
+    """Bounded LRU pool of connected GATT clients.
+
+    acquire(address) returns a connected PooledConnection with its write/read
+    characteristics resolved; release() hands it back. Connections in use are
+    never evicted, and disconnect() on one only marks it to close when its last
+    user releases it. Run `run()` as a task (or call sweep()) to close idle links.
+    """
+
+    def __init__(self, write_uuid, read_uuid, client_factory=None, max_size=4, idle_timeout=120.0,
+                 cache=None, log_message=None):
+        self.write_uuid = write_uuid.lower()
+        self.read_uuid = read_uuid.lower()
+        self.client_factory = client_factory or bleak_client_factory
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.cache = cache if cache is not None else CharacteristicCache(None)
+        self.log_message = log_message or (lambda msg, color="white": None)
+        self.timer = StageTimer(maxlen=1000)
+        self.counts = {REUSED: 0, CACHED: 0, DISCOVERED: 0}
+        self.failures = 0
+        self.evictions = 0
+        self.idle_closed = 0
+        self._connections = OrderedDict()  # address: PooledConnection, least recently used first
+        self._locks = {}
+        self._closing = set()  # close tasks started by release()
+        self._closed = False
+
+    def __len__(self):
+        return len(self._connections)
+
+    def __contains__(self, address):
+        return address in self._connections
+
+    def get(self, address):
+        return self._connections.get(address)
+
+    async def acquire(self, address):
+        lock = self._locks.setdefault(address, asyncio.Lock())
+        async with lock:
+            started = time.perf_counter()
+            conn = self._connections.get(address)
+            if conn is not None and (not conn.is_connected or (conn.stale and not conn.users)):
+                await self._close(conn)
+                conn = None
+            if conn is None:
+                try:
+                    conn = await self._connect(address)
+                except Exception:
+                    self.failures += 1
+                    raise
+                self._connections[address] = conn
+            else:
+                conn.kind = REUSED
+                self._connections.move_to_end(address)
+            conn.users += 1
+            conn.last_used = time.monotonic()
+            await self._evict()
+            self.counts[conn.kind] += 1
+            self.timer.record(conn.kind, time.perf_counter() - started)
+            return conn
+
+    def release(self, conn):
+        conn.users = max(0, conn.users - 1)
+        conn.last_used = time.monotonic()
+        if conn.stale and not conn.users:
+            task = asyncio.get_running_loop().create_task(self._close(conn))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+
+    async def _connect(self, address):
+        entry = self.cache.get(address)
+        if entry is not None:
+            client = self.client_factory(address, services=entry["services"])
+            await client.connect()
+            resolved = self.cache.resolve(address, client.services)
+            if resolved is not None:
+                return PooledConnection(address, client, *resolved, CACHED)
+            # Layout changed since it was cached: start over with full discovery.
+            self.log_message(f"[GATT] Cached handles for {address} are stale, rediscovering...", "grey400")
+            self.cache.invalidate(address)
+            await self._disconnect(client)
+
+        client = self.client_factory(address)
+        await client.connect()
+        self.log_message(f"[GATT] Discovering services for {address}...", "blue")
+        write_char, read_char = select_characteristics(
+            client.services, self.write_uuid, self.read_uuid, log=self.log_message
+        )
+        if write_char is not None or read_char is not None:
+            self.cache.store(address, client.services, write_char, read_char)
+        return PooledConnection(address, client, write_char, read_char, DISCOVERED)
+
+    async def _evict(self):
+        for address in list(self._connections):
+            if len(self._connections) <= self.max_size:
+                break
+            conn = self._connections[address]
+            if conn.users:
+                continue
+            self.evictions += 1
+            await self._close(conn)
+
+    async def _close(self, conn):
+        if self._connections.get(conn.address) is conn:
+            del self._connections[conn.address]
+        lock = self._locks.get(conn.address)
+        if lock is not None and not lock.locked():
+            del self._locks[conn.address]
+        await self._disconnect(conn.client)
+
+    async def _disconnect(self, client):
+        try:
+            await client.disconnect()
+        except Exception as ex:
+            self.log_message(f"[WARN] Disconnect error: {ex}", "grey400")
+
+    async def disconnect(self, address):
+        """Closes the pooled link to `address`, if any; one still in use is closed on its last release."""
+        conn = self._connections.get(address)
+        if conn is None:
+            return
+        if conn.users:
+            conn.stale = True
+        else:
+            await self._close(conn)
+
+    async def sweep(self, now=None):
+        """Closes connections idle for longer than idle_timeout; returns how many."""
+        if now is None:
+            now = time.monotonic()
+        closed = 0
+        for conn in list(self._connections.values()):
+            if conn.users == 0 and (now - conn.last_used >= self.idle_timeout or not conn.is_connected
+                                    or conn.stale):
+                await self._close(conn)
+                closed += 1
+        self.idle_closed += closed
+        return closed
+
+    async def run(self, interval=5.0):
+        """Idle sweep loop; start it with page.run_task(pool.run)."""
+        while not self._closed:
+            await asyncio.sleep(interval)
+            await self.sweep()
+
+    async def close(self):
+        self._closed = True
+        if self._closing:
+            await asyncio.gather(*self._closing)
+        for conn in list(self._connections.values()):
+            await self._close(conn)
+
+    def stats(self):
+        total = sum(self.counts.values())
+        connect_ms = {
+            kind: {"count": s["count"], "mean_ms": s["mean_us"] / 1000, "p95_ms": s["p95_us"] / 1000}
+            for kind, s in self.timer.summary().items()
+        }
+        return {
+            "open": len(self._connections),
+            "acquired": total,
+            **self.counts,
+            "failures": self.failures,
+            "evictions": self.evictions,
+            "idle_closed": self.idle_closed,
+            # Share of acquisitions that avoided a full service discovery.
+            "hit_rate": (self.counts[REUSED] + self.counts[CACHED]) / total if total else 0.0,
+            "cached_devices": len(self.cache),
+            "connect_ms": connect_ms,
+        }
+
+
+# --- Fake client (no radio required) ---
+
+class FakeCharacteristic:
+    __slots__ = ("uuid", "handle", "properties", "description", "service_uuid", "service_handle")
+
+    def __init__(self, uuid, handle, properties, service_uuid, service_handle, description=""):
+        self.uuid = uuid
+        self.handle = handle
+        self.properties = properties
+        self.description = description
+        self.service_uuid = service_uuid
+        self.service_handle = service_handle
+
+
+class FakeService:
+    __slots__ = ("uuid", "handle", "description", "characteristics")
+
+    def __init__(self, uuid, handle, description, characteristics):
+        self.uuid = uuid
+        self.handle = handle
+        self.description = description
+        self.characteristics = characteristics
+
+
+class FakeServiceCollection:
+    """The parts of BleakGATTServiceCollection used by the app."""
+
+    def __init__(self, services):
+        self.services = {s.handle: s for s in services}
+        self.characteristics = {c.handle: c for s in services for c in s.characteristics}
+
+    def __iter__(self):
+        return iter(self.services.values())
+
+    def get_characteristic(self, specifier):
+        if isinstance(specifier, int):
+            return self.characteristics.get(specifier)
+        specifier = str(specifier).lower()
+        return next((c for c in self.characteristics.values() if c.uuid == specifier), None)
+
+
+def fake_gatt_layout(write_uuid="0000fff1-0000-1000-8000-00805f9b34fb",
+                     read_uuid="0000fff2-0000-1000-8000-00805f9b34fb",
+                     service_uuid="0000fff0-0000-1000-8000-00805f9b34fb"):
+    """A phone-like layout: GAP/GATT/device-info services plus the order service."""
+    layout = [
+        ("00001800-0000-1000-8000-00805f9b34fb", "Generic Access Profile",
+         [("00002a00-0000-1000-8000-00805f9b34fb", ["read"]), ("00002a01-0000-1000-8000-00805f9b34fb", ["read"])]),
+        ("00001801-0000-1000-8000-00805f9b34fb", "Generic Attribute Profile",
+         [("00002a05-0000-1000-8000-00805f9b34fb", ["indicate"]),
+          ("00002b29-0000-1000-8000-00805f9b34fb", ["read", "write"]),
+          ("00002b2a-0000-1000-8000-00805f9b34fb", ["read"])]),
+        ("0000180a-0000-1000-8000-00805f9b34fb", "Device Information",
+         [("00002a29-0000-1000-8000-00805f9b34fb", ["read"]), ("00002a24-0000-1000-8000-00805f9b34fb", ["read"])]),
+        (service_uuid, "Vendor specific",
+         [(write_uuid, ["write", "write-without-response"]), (read_uuid, ["read", "notify"])]),
+    ]
+    services = []
+    handle = 1
+    for uuid, description, chars in layout:
+        service_handle = handle
+        handle += 1
+        characteristics = []
+        for char_uuid, properties in chars:
+            characteristics.append(FakeCharacteristic(char_uuid, handle, properties, uuid, service_handle))
+            handle += 2
+        services.append(FakeService(uuid, service_handle, description, characteristics))
+    return services
+
+
+class FakeGattClient:
+    """Drop-in replacement for BleakClient with simulated link and discovery delays.
+
+    Connecting costs `connect_delay` plus `discovery_delay` per service that
+    has to be resolved, so restricting `services` is measurably cheaper.
+    An acknowledged write takes `write_delay` (about two connection
+    intervals), a write without response `packet_delay`; writes longer than
+    mtu_size - 3 fail. Writes are kept in `written`; reads return `read_value`.
+    With `notify_interval`, a subscribed characteristic receives an order
+    status update that often; notify() pushes one by hand.
+    """
+
+    def __init__(self, address, services=None, layout=None, connect_delay=0.3, discovery_delay=0.4,
+                 read_value=b"ORDER-0001", fail=False, mtu_size=247, write_delay=0.015, packet_delay=0.001,
+                 notify_interval=None):
+        self.address = address
+        self.mtu_size = mtu_size
+        self.write_delay = write_delay
+        self.packet_delay = packet_delay
+        self.notify_interval = notify_interval
+        self._subscriptions = {}  # handle: (callback, task)
+        self._layout = layout or fake_gatt_layout()
+        self._wanted = {s.lower() for s in services} if services else None
+        self.connect_delay = connect_delay
+        self.discovery_delay = discovery_delay
+        self.read_value = read_value
+        self.fail = fail
+        self.is_connected = False
+        self.services = None
+        self.written = []
+
+    @classmethod
+    def factory(cls, **kwargs):
+        return lambda address, services=None: cls(address, services=services, **kwargs)
+
+    async def connect(self):
+        await asyncio.sleep(self.connect_delay)
+        if self.fail:
+            raise ConnectionError(f"Device {self.address} not reachable")
+        resolved = [s for s in self._layout if self._wanted is None or s.uuid in self._wanted]
+        await asyncio.sleep(self.discovery_delay * len(resolved))
+        self.services = FakeServiceCollection(resolved)
+        self.is_connected = True
+        return True
+
+    async def disconnect(self):
+        self.is_connected = False
+        for handle in list(self._subscriptions):
+            await self._unsubscribe(handle)
+        return True
+
+    def _char(self, specifier):
+        if not self.is_connected:
+            raise ConnectionError("Not connected")
+        if not isinstance(specifier, (int, str)):
+            specifier = specifier.handle
+        char = self.services.get_characteristic(specifier)
+        if char is None:
+            raise ValueError(f"Characteristic {specifier} was not found!")
+        return char
+
+    async def write_gatt_char(self, char_specifier, data, response=None):
+        char = self._char(char_specifier)
+        if len(data) > self.mtu_size - 3:
+            raise ValueError(f"Write of {len(data)} bytes exceeds the ATT MTU ({self.mtu_size})")
+        await asyncio.sleep(self.write_delay if response else self.packet_delay)
+        self.written.append((char.uuid, bytes(data), response))
+
+    async def read_gatt_char(self, char_specifier):
+        self._char(char_specifier)
+        return self.read_value
+
+    async def start_notify(self, char_specifier, callback):
+        char = self._char(char_specifier)
+        if "notify" not in char.properties and "indicate" not in char.properties:
+            raise ValueError(f"Characteristic {char.uuid} does not support notifications")
+        task = asyncio.create_task(self._updates(char)) if self.notify_interval else None
+        self._subscriptions[char.handle] = (callback, task)
+
+    async def stop_notify(self, char_specifier):
+        await self._unsubscribe(self._char(char_specifier).handle)
+
+    async def _unsubscribe(self, handle):
+        _, task = self._subscriptions.pop(handle, (None, None))
+        if task is not None:
+            task.cancel()
+
+    def notify(self, char_specifier, data):
+        """Delivers one notification to the subscriber of `char_specifier`."""
+        char = self._char(char_specifier)
+        callback, _ = self._subscriptions[char.handle]
+        callback(char, bytearray(data))
+
+    async def _updates(self, char):
+        statuses = ("ACCEPTED", "PREPARING", "READY", "PICKED UP")
+        for i in itertools.count():
+            await asyncio.sleep(self.notify_interval)
+            order = self.read_value.decode("utf-8", errors="ignore")
+            self.notify(char, f"{order} {statuses[i % len(statuses)]}".encode())
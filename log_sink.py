@@ -0,0 +1,90 @@
+"""Batched, rate-limited activity log.
+
+LogSink accepts log lines at any rate, keeps them in bounded ring buffers and
+pushes them to the Flet ListView at a fixed frame rate, so a burst of scan
+results costs one page update per frame instead of one per line.
+"""
+import asyncio
+import datetime
+from collections import deque
+
+import flet as ft
+
+
+class LogSink:
+    """Collects log lines and flushes them to `list_view` every `interval` seconds.
+
+    - `history` keeps the last `history_size` raw lines (used for saving logs).
+    - Up to `max_pending` lines wait for the next flush; when more arrive the
+      oldest pending ones are dropped (counted in `dropped`).
+    - A line identical to the previous pending one is folded into it and shown
+      with a repeat count (counted in `coalesced`).
+    """
+
+    def __init__(self, list_view: ft.ListView, update=None, interval=0.1,
+                 max_visible=100, max_pending=100, history_size=1000):
+        self.list_view = list_view
+        self.update = update or list_view.update
+        self.interval = interval
+        self.max_visible = max_visible
+        self.history = deque(maxlen=history_size)
+        self._pending = deque(maxlen=max_pending)  # [text, color, repeat]
+        self._closed = False
+        self.logged = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.flushes = 0
+
+    def log(self, msg, color="white"):
+        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
+        log_entry = f"[{timestamp}] {msg}"
+        self.history.append(log_entry)
+        self.logged += 1
+
+        if self._pending:
+            last = self._pending[-1]
+            if last[0] == log_entry and last[1] == color:
+                last[2] += 1
+                self.coalesced += 1
+                return
+        if len(self._pending) == self._pending.maxlen:
+            self.dropped += 1
+        self._pending.append([log_entry, color, 1])
+
+    def flush(self):
+        """Moves pending lines into the ListView and sends one update."""
+        if not self._pending:
+            return False
+        controls = self.list_view.controls
+        while self._pending:
+            text, color, repeat = self._pending.popleft()
+            if repeat > 1:
+                text = f"{text} (x{repeat})"
+            controls.append(ft.Text(text, size=12, color=color, font_family="monospace"))
+        excess = len(controls) - self.max_visible
+        if excess > 0:
+            del controls[:excess]
+        self.flushes += 1
+        try:
+            self.update()
+        except Exception:
+            pass
+        return True
+
+    def stats(self):
+        return {
+            "logged": self.logged,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+        }
+
+    async def run(self):
+        """Flush loop; start it with page.run_task(sink.run)."""
+        while not self._closed:
+            await asyncio.sleep(self.interval)
+            self.flush()
+
+    def close(self):
+        self._closed = True
+        self.flush()
@@ -1,51 +1,241 @@
+from __future__ import annotations
+
+import time
+
+STARTED_AT = time.perf_counter()  # startup milestones are measured from here
+
+import argparse
 import asyncio
-import re
+import atexit
 import datetime
-import flet as ft
-from bleak import BleakScanner, BleakClient
+import os
+from scan_engine import ScanEngine, LatencyTracker, FakeAdvertisementSource
+from decoder import UuidDecoder
+from session_log import SessionLogWriter
+from pipeline import ScanPipeline, render_to_table
+from device_filter import DeviceFilter, FilterError
+from presence import PresenceTracker
+from ranking import attach_ranking
+from metrics import Metrics, add_scan_gauges, start_profile
+
+# Flet, the Bleak backend, replay/remote sources and the GATT stack (pool,
+# transfer, notifications) are imported on first use: the headless entry (--headless) never loads Flet, and the
+# window comes up before anything Bluetooth-related is initialized.
+ft = None
 
 # --- Constants & Config ---
 TARGET_SERVICE_UUID = "0000fff0-0000-1000-8000-00805f9b34fb"
 TARGET_WRITE_UUID   = "0000fff1-0000-1000-8000-00805f9b34fb"
 TARGET_READ_UUID    = "0000fff2-0000-1000-8000-00805f9b34fb"
 
+SCAN_MODE = "active"        # "active" or "passive"
+DECODER_CACHE_SIZE = 1024   # distinct UUID sets remembered by the decoder
+DEDUP_INTERVAL = 1.0        # seconds; identical adverts from one device inside this window are dropped
+RENDER_INTERVAL = 0.25      # seconds between device table refreshes while scanning
+PRESENCE_TTL = 30.0         # seconds without adverts before a device is removed
+PRESENCE_ALPHA = 0.3        # RSSI smoothing (EWMA weight of the newest sample)
+PRESENCE_ENTER_RSSI = None  # e.g. -75: smoothed RSSI needed to show a device
+PRESENCE_EXIT_RSSI = None   # e.g. -85: smoothed RSSI below which a shown device is removed
+LOG_FLUSH_INTERVAL = 0.1    # seconds between activity log flushes (10 Hz)
+SESSION_LOG_DIR = "logs"    # NDJSON session logs (session_*.ndjson)
+SESSION_LOG_MAX_BYTES = 10 * 1024 * 1024
+SESSION_LOG_MAX_AGE = 3600  # seconds before a new session file is started
+SESSION_LOG_COMPRESS = False  # gzip rotated session files
+GATT_POOL_SIZE = 4          # devices kept connected at the same time (least recently used is dropped)
+GATT_IDLE_TIMEOUT = 120.0   # seconds before an unused connection is closed
+GATT_CACHE_PATH = "logs/gatt_cache.json"  # resolved write/read characteristic handles per device
+DISPATCH_CONCURRENCY = 3    # devices written to at the same time by "Send to Nearby"
+DISPATCH_RETRIES = 2        # extra attempts per device after a failure
+DISPATCH_BACKOFF = 0.5      # seconds before the first retry (doubled per retry)
+DISPATCH_MAX_TARGETS = 10   # nearest decoded devices included in one "Send to Nearby" batch
+NOTIFY_QUEUE_SIZE = 64      # order updates buffered from notifications before the oldest are dropped
+METRICS_FILE = "logs/metrics.prom"  # Prometheus text (use a .json name for JSON); None disables
+METRICS_INTERVAL = 5.0      # seconds between metrics file writes
+STATS_PANEL_INTERVAL = 1.0  # seconds between stats panel refreshes
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Windows BLE Scanner & Decoder")
+    parser.add_argument("--fake-scanner", action="store_true",
+                        help="use synthetic advertisements instead of the Bluetooth radio")
+    parser.add_argument("--replay", nargs="+", metavar="FILE",
+                        help="play back recorded sessions (session_*.ndjson or ble_*.txt) instead of scanning")
+    parser.add_argument("--replay-speed", type=float, default=1.0,
+                        help="replay speed factor (1 = real time, 0 = as fast as possible)")
+    parser.add_argument("--connect", metavar="URL",
+                        help="show devices from a running scanner_service.py (e.g. ws://127.0.0.1:8765/events)")
+    parser.add_argument("--fake-gatt", action="store_true",
+                        help="connect to simulated GATT devices instead of real ones")
+    parser.add_argument("--profile", nargs="?", metavar="FILE",
+                        const=f"logs/profile_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.prof",
+                        help="run under cProfile and write the stats (plus a .txt summary) on exit")
+    parser.add_argument("--headless", action="store_true",
+                        help="scan without the UI (Flet is not loaded); scan lines go to stdout")
+    parser.add_argument("--filter", default="mcan", help="device filter expression for --headless")
+    parser.add_argument("--duration", type=float, help="--headless: stop after this many seconds")
+    parser.add_argument("--autostart", action="store_true", help="start scanning as soon as the window is up")
+    parser.add_argument("--startup-probe", action="store_true",
+                        help="print startup milestones (STARTUP <event> <seconds>) to stdout; implies --autostart")
+    args, _ = parser.parse_known_args(argv)
+    try:
+        args.device_filter = DeviceFilter(args.filter)
+    except FilterError as ex:
+        parser.error(f"--filter: {ex}")
+    return args
+
+
+def load_ui():
+    """Imports Flet for the UI entry (the slowest import of the app)."""
+    global ft
+    if ft is None:
+        import flet
+        ft = flet
+    return ft
+
+
+def scanner_factory(options):
+    """ScanEngine backend for the command line options (None: a real BleakScanner)."""
+    if options.connect:
+        from scanner_service import RemoteScannerSource
+        return RemoteScannerSource.factory(options.connect)
+    if options.replay:
+        from replay import ReplaySource
+        return ReplaySource.factory(options.replay, speed=options.replay_speed)
+    if options.fake_scanner:
+        return FakeAdvertisementSource.factory(devices=20, interval=0.5)
+    return None
+
+
+class StartupTimer:
+    """Startup milestones in seconds since main.py started, exported as metrics gauges.
+
+    With `echo`, each milestone is also printed as "STARTUP <event> <seconds>"
+    (read by benchmarks/bench_startup.py).
+    """
+
+    def __init__(self, metrics, echo=False):
+        self.metrics = metrics
+        self.echo = echo
+        self.marks = {}
+
+    def mark(self, event):
+        if event in self.marks:
+            return
+        elapsed = self.marks[event] = time.perf_counter() - STARTED_AT
+        self.metrics.gauge(f"startup_{event}_seconds", lambda: round(elapsed, 4))
+        if self.echo:
+            print(f"STARTUP {event} {elapsed:.4f}", flush=True)
+
+    def on_device(self, kind, address, info, ad):
+        """Pipeline listener marking the first advertisement that reaches the registry."""
+        if ad is not None and "first_advert" not in self.marks:
+            self.mark("first_advert")
+
+
 class BLEScannerApp:
-    def __init__(self, page: ft.Page):
+    def __init__(self, page: ft.Page, options=None):
+        from log_sink import LogSink
+
         self.page = page
-        self.devices = {}  # address: {name, phone, card, rssi, uuids}
+        self.options = options or parse_args([])
+        self.decoder = UuidDecoder(cache_size=DECODER_CACHE_SIZE)
         self.connected_client = None
+        self.connected_conn = None
+        self.notify_stream = None
         self.target_write_char = None
         self.is_scanning = False
         self.scanning_task = None
+        self.scan_engine = None
+        self.latency = LatencyTracker()
         self.log_display = ft.ListView(expand=True, spacing=2, auto_scroll=True)
-        self.all_logs = [] # Store raw logs for saving
+        self.log_sink = LogSink(self.log_display, update=self.page.update, interval=LOG_FLUSH_INTERVAL)
+        self.all_logs = self.log_sink.history # Store raw logs for saving
+        self.session_log = SessionLogWriter(
+            SESSION_LOG_DIR,
+            max_bytes=SESSION_LOG_MAX_BYTES,
+            max_age=SESSION_LOG_MAX_AGE,
+            compress=SESSION_LOG_COMPRESS,
+        ).start()
+        atexit.register(self.session_log.close)
+        self.presence = PresenceTracker(
+            ttl=PRESENCE_TTL,
+            alpha=PRESENCE_ALPHA,
+            enter_rssi=PRESENCE_ENTER_RSSI,
+            exit_rssi=PRESENCE_EXIT_RSSI,
+        )
+        self.metrics = Metrics()
+        self.startup = StartupTimer(self.metrics, echo=self.options.startup_probe)
+        self._stats_shown_at = self._metrics_written_at = 0.0
+        self.pipeline = ScanPipeline(self.decoder, self.log_message, self.session_log, presence=self.presence,
+                                     timer=self.metrics)
+        self.devices = self.pipeline.devices  # address: {name, phone, card, rssi, raw_rssi, uuids, payload, presence}
+        self.ranking = attach_ranking(self.pipeline)  # decoded devices by smoothed RSSI
+        self.pipeline.add_listener(self.startup.on_device)
+        self.pinned = None  # address selected by the operator instead of the nearest device
+        add_scan_gauges(self.metrics, self.pipeline, lambda: self.scan_engine)
+        self.metrics.gauge("log_lines", lambda: self.log_sink.logged, "counter")
+        self.metrics.gauge("log_lines_dropped", lambda: self.log_sink.dropped, "counter")
+        self.metrics.gauge("log_flushes", lambda: self.log_sink.flushes, "counter")
+        self._gatt_pool = None  # created on the first connect or dispatch
+        self._dispatcher = None
+        self.panels_ready = False  # set once show_secondary_panels() has added the other panels
         self.left_col_width = 500  # Initial width of left panel
         # self.file_picker = ft.FilePicker() # Removed due to UI issues
         # self.file_picker.on_result = self.on_save_file_result # Removed
         
         self.write_response_switch = ft.Switch(label="Write Channel Response", value=True)
         self.setup_ui()
+        self.startup.mark("first_frame")
+        self.pipeline.set_filter(self.filter_input.value)
+        self.page.run_task(self.log_sink.run)
+        self.page.run_task(self.show_secondary_panels)
+        if self.options.autostart or self.options.startup_probe:
+            self.page.run_task(self.toggle_scan, None)
+
+    @property
+    def gatt_pool(self):
+        """The GATT connection pool, created (and its handle cache loaded) on first use."""
+        if self._gatt_pool is None:
+            from gatt_pool import ConnectionPool, CharacteristicCache, FakeGattClient
+
+            self._gatt_pool = ConnectionPool(
+                TARGET_WRITE_UUID,
+                TARGET_READ_UUID,
+                client_factory=FakeGattClient.factory(notify_interval=5.0) if self.options.fake_gatt else None,
+                max_size=GATT_POOL_SIZE,
+                idle_timeout=GATT_IDLE_TIMEOUT,
+                cache=CharacteristicCache(GATT_CACHE_PATH),
+                log_message=self.log_message,
+            )
+            self.page.run_task(self._gatt_pool.run)
+            self.metrics.gauge("gatt_pool_hit_ratio", lambda: round(self._gatt_pool.stats()["hit_rate"], 4))
+        return self._gatt_pool
+
+    @property
+    def dispatcher(self):
+        if self._dispatcher is None:
+            from dispatch import DispatchQueue
+
+            self._dispatcher = DispatchQueue(
+                self.gatt_pool,
+                concurrency=DISPATCH_CONCURRENCY,
+                retries=DISPATCH_RETRIES,
+                backoff=DISPATCH_BACKOFF,
+                log_message=self.log_message,
+                session_log=self.session_log,
+                on_report=self.on_dispatch_report,
+            )
+        return self._dispatcher
 
     def log_message(self, msg, color="white"):
-        """Appends a message to the UI log display."""
-        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-        log_entry = f"[{timestamp}] {msg}"
-        self.all_logs.append(log_entry)
-        self.log_display.controls.append(
-            ft.Text(log_entry, size=12, color=color, font_family="monospace")
-        )
-        if len(self.log_display.controls) > 100:
-            self.log_display.controls.pop(0)
-        
-        # Keep internal log buffer manageable, but maybe a bit larger than UI
-        if len(self.all_logs) > 1000:
-            self.all_logs.pop(0)
-        try:
-            self.page.update()
-        except:
-            pass
+        """Queues a message for the UI log display (flushed by LogSink at a fixed rate)."""
+        self.log_sink.log(msg, color)
+        self.session_log.write("log", msg=msg, color=color)
 
     def setup_ui(self):
+        """Builds the header and the device table and shows them; the other panels follow in
+        show_secondary_panels() once the first frame is on screen."""
+        from device_table import DeviceTable
+
         self.page.clean()
         # self.page.overlay.clear() # No longer needed
         # self.page.overlay.append(self.file_picker) # Removed
@@ -55,17 +245,6 @@ class BLEScannerApp:
         self.page.padding = 20
         self.page.window_maximized = True
 
-        # Drag event for resizable layout
-        def on_pan_update(e: ft.DragUpdateEvent):
-            if e.primary_delta is not None:
-                self.left_col_width += e.primary_delta
-                if self.left_col_width < 300: self.left_col_width = 300
-                elif self.left_col_width > 1200: self.left_col_width = 1200
-                # Enable fixed width when dragging starts
-                content_row.controls[0].expand = None
-                content_row.controls[0].width = self.left_col_width
-                self.page.update()
-
         # Flet 0.80+ Colors and Icons are case-sensitive or moved.
         # Using string literals for colors and icons is more robust across versions.
         
@@ -75,7 +254,8 @@ class BLEScannerApp:
         )
         
         self.filter_input = ft.TextField(
-            label="Filter by Device Name (e.g. Mcam)",
+            label="Filter (e.g. mcan rssi>-70 has:phone)",
+            tooltip="Name text, /regex/, mac:PREFIX, rssi>N, phone:DIGITS, card:DIGITS, has:phone; -term excludes",
             width=300,
             value="mcan",
             on_change=self.apply_filter
@@ -91,15 +271,37 @@ class BLEScannerApp:
             ],
             rows=[],
         )
+        self.device_table = DeviceTable(
+            self.device_list,
+            on_connect=lambda addr: self.page.run_task(self.connect_device, addr),
+            on_select=self.toggle_pin,
+        )
+        self.nearest_text = ft.Text("Nearest: -", size=14, color="green300")
 
         self.order_info_text = ft.Text("Order Information: None", size=16, weight="bold", color="amber300")
         self.read_char_text = ft.Text("Read Channel: -", size=14, color="grey400")
         self.write_char_text = ft.Text("Write Channel: -", size=14, color="grey400")
         self.message_input = ft.TextField(label="Message to Send", width=400)
         self.send_btn = ft.FilledButton("Send", on_click=self.send_data, disabled=True)
+        self.dispatch_btn = ft.OutlinedButton("Send to Nearby", on_click=self.dispatch_nearby)
         self.status_text = ft.Text("Status: Idle", color="grey400")
+        self.stats_text = ft.Text("", size=11, color="grey600", font_family="monospace")
 
         # Layout
+        self.left_column = ft.Column([
+            ft.Row([
+                ft.Text("Detected Devices", size=20, weight="bold"),
+                self.nearest_text,
+            ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
+            ft.Container(
+                content=ft.Column([self.device_list], scroll=ft.ScrollMode.ALWAYS), 
+                height=260, 
+                border=ft.Border.all(width=1, color="grey800"), 
+                border_radius=10
+            ),
+        ], expand=True)
+        # Main Content: Two Columns with Resizable Split (the right one is added later)
+        self.content_row = ft.Row([self.left_column], expand=True, spacing=0)
         self.page.add(
             # Header Section
             ft.Row([
@@ -107,73 +309,85 @@ class BLEScannerApp:
                 ft.Row([self.filter_input, self.scan_btn], spacing=10)
             ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
             ft.Divider(),
-            # Main Content: Two Columns with Resizable Split
-            content_row := ft.Row([
-                # Left Column: Devices and Connection Info
-                ft.Column([
-                    ft.Text("Detected Devices", size=20, weight="bold"),
-                    ft.Container(
-                        content=ft.Column([self.device_list], scroll=ft.ScrollMode.ALWAYS), 
-                        height=260, 
-                        border=ft.Border.all(width=1, color="grey800"), 
-                        border_radius=10
-                    ),
-                    ft.Divider(),
-                    ft.Row([
-                        ft.Text("Connection Information", size=20, weight="bold"),
-                        self.write_response_switch
-                    ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
-                    ft.Container(
-                        content=ft.Column([
-                            self.order_info_text,
-                            ft.Row([self.read_char_text, self.write_char_text], spacing=20),
-                            ft.Row([self.message_input, self.send_btn], spacing=10),
-                        ], spacing=15),
-                        padding=10,
-                        border=ft.Border.all(width=1, color="grey900"),
-                        border_radius=10,
-                        expand=True
-                    ),
-                ], expand=True),
-                # Draggable Divider
-                ft.GestureDetector(
-                    content=ft.Container(
-                        content=ft.VerticalDivider(width=2, color="grey800"),
-                        width=10,
-                        bgcolor="transparent",
-                    ),
-                    on_pan_update=on_pan_update,
-                    on_hover=lambda _: setattr(self.page, "cursor", "col-resize") or self.page.update(),
-                    mouse_cursor=ft.MouseCursor.RESIZE_LEFT_RIGHT,
-                ),
-                # Right Column: Activity Logs
-                ft.Column([
-                    ft.Row([
-                        ft.Text("Activity Logs", size=20, weight="bold"),
-                        ft.IconButton(
-                            icon=ft.icons.Icons.SAVE,
-                            tooltip="Auto-Save Logs (to ./logs)", 
-                            on_click=self.save_logs_direct
-                        )
-                    ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
-                    ft.Container(
-                        content=self.log_display,
-                        expand=True,
-                        padding=10,
-                        bgcolor="black",
-                        border=ft.Border.all(width=1, color="grey800"),
-                        border_radius=10
-                    ),
-                ], expand=True),
-            ], expand=True, spacing=0),
-            # Footer: Status Text
-            self.status_text 
+            self.content_row,
+            # Footer: Status Text (the stats panel is added later)
+            self.status_text,
         )
         self.page.update()
 
+    async def show_secondary_panels(self):
+        """Adds the connection panel, the activity log and the stats panel after the first frame."""
+        await asyncio.sleep(0)
+
+        # Drag event for resizable layout
+        def on_pan_update(e: ft.DragUpdateEvent):
+            if e.primary_delta is not None:
+                self.left_col_width += e.primary_delta
+                if self.left_col_width < 300: self.left_col_width = 300
+                elif self.left_col_width > 1200: self.left_col_width = 1200
+                # Enable fixed width when dragging starts
+                self.left_column.expand = None
+                self.left_column.width = self.left_col_width
+                self.page.update()
+
+        # Left Column: Connection Info below the devices
+        self.left_column.controls += [
+            ft.Divider(),
+            ft.Row([
+                ft.Text("Connection Information", size=20, weight="bold"),
+                self.write_response_switch
+            ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
+            ft.Container(
+                content=ft.Column([
+                    self.order_info_text,
+                    ft.Row([self.read_char_text, self.write_char_text], spacing=20),
+                    ft.Row([self.message_input, self.send_btn, self.dispatch_btn], spacing=10),
+                ], spacing=15),
+                padding=10,
+                border=ft.Border.all(width=1, color="grey900"),
+                border_radius=10,
+                expand=True
+            ),
+        ]
+        self.content_row.controls += [
+            # Draggable Divider
+            ft.GestureDetector(
+                content=ft.Container(
+                    content=ft.VerticalDivider(width=2, color="grey800"),
+                    width=10,
+                    bgcolor="transparent",
+                ),
+                on_pan_update=on_pan_update,
+                on_hover=lambda _: setattr(self.page, "cursor", "col-resize") or self.page.update(),
+                mouse_cursor=ft.MouseCursor.RESIZE_LEFT_RIGHT,
+            ),
+            # Right Column: Activity Logs
+            ft.Column([
+                ft.Row([
+                    ft.Text("Activity Logs", size=20, weight="bold"),
+                    ft.IconButton(
+                        icon=ft.icons.Icons.SAVE,
+                        tooltip="Auto-Save Logs (to ./logs)", 
+                        on_click=self.save_logs_direct
+                    )
+                ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
+                ft.Container(
+                    content=self.log_display,
+                    expand=True,
+                    padding=10,
+                    bgcolor="black",
+                    border=ft.Border.all(width=1, color="grey800"),
+                    border_radius=10
+                ),
+            ], expand=True),
+        ]
+        self.page.controls.append(self.stats_text)
+        self.page.update()
+        self.panels_ready = True
+        self.startup.mark("panels")
+
     def save_logs_direct(self, e):
         """Saves logs directly to a 'logs' folder without FilePicker."""
-        import os
         if not self.all_logs:
             self.status_text.value = "Status: No logs to save."
             self.page.update()
@@ -194,54 +408,70 @@ class BLEScannerApp:
     # def on_save_file_result(self, e): ... Removed
 
     def apply_filter(self, e):
-        """Manually trigger a UI update to reflect the filter immediately if needed, 
-        but the run_scan loop will handle it naturally."""
+        """Re-applies the filter to the already known devices immediately."""
+        try:
+            self.pipeline.set_filter(self.filter_input.value)
+        except FilterError as ex:
+            self.filter_input.error = str(ex)  # keep the previous filter until the expression is valid
+        else:
+            self.filter_input.error = None
+        self.render_devices()
+        self.update_nearest()
         self.page.update()
 
     def decode_uuid_data(self, uuids):
         """
         Extracts phone and card numbers from Service UUID strings.
-        Handle both literal hex segments and ASCII conversion.
+        Handle both literal hex segments and ASCII conversion (see decoder.py).
         """
-        phone = ""
-        card = ""
-        
-        for uuid in uuids:
-            parts = uuid.split("-")
-            
-            # --- Rule A: Literal Hex Segments (User's specific Request) ---
-            # If standard 8-4-4-4-12 UUID format
-            if len(parts) == 5:
-                # Phone = Segments 1, 2, 3 concatenated (8+4+4 = 16 hex chars)
-                # Card = Segment 4 (4 hex chars)
-                lit_phone = f"{parts[0]}{parts[1]}{parts[2]}"
-                lit_card = parts[3]
-                
-                # Check if these literal parts contain data (e.g., starting with 010 for phone)
-                # If they look like literal data, we use them.
-                if lit_phone.startswith("010") or lit_phone.startswith("1234"):  # Added 1234 for user's example
-                    phone = lit_phone
-                    card = lit_card
-                    break
+        return self.decoder.decode(uuids)
 
-            # --- Rule B: ASCII Conversion (Fallback) ---
-            clean_uuid = uuid.replace("-", "")
-            try:
-                decoded_str = bytes.fromhex(clean_uuid).decode('ascii', errors='ignore')
-                phone_match = re.search(r'010\d{8}', decoded_str)
-                if phone_match:
-                    phone = phone_match.group()
-                
-                card_match = re.search(r'\d{8,16}', decoded_str)
-                if card_match and card_match.group() != phone:
-                    card = card_match.group()
-                
-                if phone or card:
-                    break
-            except:
-                continue
-                
-        return phone, card
+    def handle_advertisement(self, ad):
+        """ScanEngine callback: records one advertisement as soon as it arrives."""
+        self.pipeline.handle(ad)
+
+    def render_devices(self):
+        """Patches the device table rows of devices that changed since the last render.
+
+        Returns True if the table needs to be sent to the client.
+        """
+        return render_to_table(self.pipeline, self.device_table)
+
+    def toggle_pin(self, address):
+        """Row selection pins a device as the one at the counter; selecting it again unpins."""
+        self.pinned = None if self.pinned == address else address
+        self.update_nearest()
+        self.page.update()
+
+    def update_nearest(self):
+        """Highlights the pinned device, or else the strongest decoded device shown in the table.
+
+        Returns True if the highlighted row changed.
+        """
+        if self.pinned is not None and self.pinned not in self.device_table:
+            self.pinned = None
+        address = self.pinned
+        if address is None:
+            address = next((addr for addr, _ in self.ranking if addr in self.device_table), None)
+        changed = self.device_table.highlight(address)
+        info = self.devices.get(address) if address is not None else None
+        if info is None:
+            self.nearest_text.value = "Nearest: -"
+        else:
+            label = "Pinned" if address == self.pinned else "Nearest"
+            self.nearest_text.value = (
+                f"{label}: {info['name']} | {info['phone'] or '-'} | {info['card'] or '-'} | "
+                f"RSSI {info['rssi']}"
+            )
+        return changed
+
+    def create_scan_engine(self):
+        return ScanEngine(
+            self.handle_advertisement,
+            scanning_mode=SCAN_MODE,
+            dedup_interval=DEDUP_INTERVAL,
+            scanner_factory=scanner_factory(self.options),
+        )
 
     async def run_scan(self):
         self.is_scanning = True
@@ -251,77 +481,104 @@ class BLEScannerApp:
         except Exception:
             return
 
-        self.log_message("Starting BLE Scan...", color="amber")
+        self.log_message(f"Starting BLE Scan ({SCAN_MODE} mode)...", color="amber")
+        self.session_log.write("scan_start", mode=SCAN_MODE)
 
-        while self.is_scanning:
-            if not self.page.session:
-                break
-            try:
-                # return_adv=True returns a dict: {address: (device, advertisement_data)}
-                devices_dict = await BleakScanner.discover(timeout=5.0, return_adv=True)
-                self.device_list.rows.clear()
-                
-                for address, (d, adv) in devices_dict.items():
-                    name = d.name or "Unknown"
-                    filter_val = self.filter_input.value.lower()
-                    
-                    # Filtering Logic (Like search)
-                    if filter_val and filter_val not in name.lower():
-                        continue
-
-                    # adv.service_uuids is a list of UUID strings
-                    uuids = adv.service_uuids or []
-                    phone, card = self.decode_uuid_data(uuids)
-                    rssi = adv.rssi  # Get RSSI from AdvertisementData
-                    
-                    # Log to UI
-                    self.log_message(f"[SCAN] Found: {name} ({address}) | RSSI: {rssi}", color="amber")
-                    if uuids: self.log_message(f"  - UUIDs: {uuids}", color="grey400")
-                    if phone: self.log_message(f"  - DECODED PHONE: {phone}", color="green")
-                    if card: self.log_message(f"  - DECODED CARD: {card}", color="green")
-
-                    self.devices[d.address] = {
-                        "device": d,
-                        "phone": phone,
-                        "card": card,
-                        "rssi": rssi
-                    }
-
-                    self.device_list.rows.append(
-                        ft.DataRow(
-                            cells=[
-                                ft.DataCell(ft.Text(f"{d.name or 'Unknown'} ({d.address})")),
-                                ft.DataCell(ft.Text(phone or "-")),
-                                ft.DataCell(ft.Text(card or "-")),
-                                ft.DataCell(ft.Text(str(rssi))),
-                                ft.DataCell(ft.FilledButton("Connect", on_click=lambda e, addr=d.address: self.page.run_task(self.connect_device, addr))),
-                            ]
-                        )
-                    )
-                self.page.update()
-            except RuntimeError as re:
-                if "destroyed session" in str(re):
-                    self.is_scanning = False
+        self.scan_engine = self.create_scan_engine()
+        try:
+            await self.scan_engine.start()
+            self.startup.mark("scan_started")
+        except Exception as ex:
+            self.scan_engine = None
+            self.set_scan_state(False)
+            self.status_text.value = f"Status: Scan error ({str(ex)})"
+            self.log_message(f"[ERROR] Could not start scanner: {ex}", color="red")
+            self.page.update()
+            return
+
+        try:
+            while self.is_scanning:
+                if not self.page.session:
                     break
-            except Exception as ex:
+                await asyncio.sleep(RENDER_INTERVAL)
+                with self.metrics.time("sweep"):
+                    self.pipeline.sweep()
+                self.publish_metrics()
+                if not self.pipeline.has_changes:
+                    continue
                 try:
-                    self.status_text.value = f"Status: Scan error ({str(ex)})"
-                    self.page.update()
-                except:
-                    break
-            
-            await asyncio.sleep(1)
+                    pending = self.pipeline.take_pending()
+                    with self.metrics.time("render"):
+                        changed = self.render_devices()
+                        changed |= self.update_nearest()
+                    with self.metrics.time("ui_update"):
+                        if changed:
+                            self.device_list.update()
+                        self.nearest_text.update()
+                    self.metrics.inc("ui_updates")
+                    now = time.perf_counter()
+                    for detected_at in pending:
+                        self.latency.record(detected_at, now)
+                        self.metrics.record("detect_to_render", now - detected_at)
+                    stats = self.latency.summary()
+                    self.status_text.value = (
+                        f"Status: Scanning... {len(self.pipeline.visible)}/{len(self.devices)} devices | "
+                        f"latency p50 {stats['p50_ms']:.0f} ms, p95 {stats['p95_ms']:.0f} ms"
+                    )
+                    self.status_text.update()
+                except RuntimeError as re:
+                    if "destroyed session" in str(re):
+                        self.is_scanning = False
+                        break
+                except Exception as ex:
+                    try:
+                        self.status_text.value = f"Status: Scan error ({str(ex)})"
+                        self.page.update()
+                    except:
+                        break
+        finally:
+            self.session_log.write("scan_stop", devices=len(self.devices))
+            try:
+                self.publish_metrics(force=True)
+            except Exception:
+                pass
+            engine, self.scan_engine = self.scan_engine, None
+            if engine is not None:
+                try:
+                    await engine.stop()
+                except Exception as ex:
+                    self.log_message(f"[WARN] Scanner stop error: {ex}", color="grey400")
 
-    async def disconnect_current_device(self):
-        if self.connected_client:
+    def publish_metrics(self, force=False):
+        """Refreshes the stats panel and the metrics file when their intervals have passed."""
+        now = time.monotonic()
+        if force or now - self._stats_shown_at >= STATS_PANEL_INTERVAL:
+            self._stats_shown_at = now
+            self.stats_text.value = self.metrics.format_panel(
+                stages=("decode", "filter", "registry", "log", "render", "ui_update", "detect_to_render"),
+                counters=("adverts_received", "adverts_decoded", "devices", "ui_updates", "log_flushes",
+                          "log_lines_dropped", "decoder_cache_hit_ratio"),
+            )
+            if self.panels_ready:
+                self.stats_text.update()
+        if METRICS_FILE and (force or now - self._metrics_written_at >= METRICS_INTERVAL):
+            self._metrics_written_at = now
             try:
-                self.log_message(f"[INFO] Disconnecting from previous device...", color="grey400")
-                await self.connected_client.disconnect()
-            except Exception as e:
-                self.log_message(f"[WARN] Disconnect error: {e}", color="grey400")
-            finally:
-                self.connected_client = None
-                self.status_text.value = "Status: Disconnected"
+                self.metrics.write(METRICS_FILE)
+            except OSError as ex:
+                self.log_message(f"[WARN] Could not write {METRICS_FILE}: {ex}", color="grey400")
+
+    async def disconnect_current_device(self):
+        """Detaches the current device; its link stays in the pool until idle or evicted."""
+        conn, self.connected_conn = self.connected_conn, None
+        await self.stop_notifications()
+        if conn is not None:
+            self.log_message(f"[INFO] Releasing {conn.address} (kept in connection pool)", color="grey400")
+            self.gatt_pool.release(conn)
+            self.connected_client = None
+            self.target_write_char = None
+            self.send_btn.disabled = True
+            self.status_text.value = "Status: Disconnected"
 
     def set_scan_state(self, is_scanning):
         self.is_scanning = is_scanning
@@ -347,6 +604,8 @@ class BLEScannerApp:
             self.scanning_task = asyncio.create_task(self.run_scan())
 
     async def connect_device(self, address):
+        from gatt_pool import short_uuid
+
         # Auto-stop scan when connecting
         if self.is_scanning:
             self.set_scan_state(False)
@@ -358,84 +617,102 @@ class BLEScannerApp:
         self.page.update()
         
         try:
-            client = BleakClient(address)
-            await client.connect()
-            self.connected_client = client
-            self.log_message(f"[CONNECT] Successfully connected to {address}", color="blue")
-            self.status_text.value = f"Status: Connected to {address}"
+            started = time.perf_counter()
+            conn = await self.gatt_pool.acquire(address)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.connected_conn = conn
+            self.connected_client = conn.client
+            self.target_write_char = conn.write_char
+            stats = self.gatt_pool.stats()
+            self.log_message(f"[CONNECT] Successfully connected to {address} "
+                             f"({conn.kind}, {elapsed_ms:.0f} ms)", color="blue")
+            self.session_log.write("connect", address=address, ok=True, kind=conn.kind,
+                                   ms=round(elapsed_ms, 1))
+            self.status_text.value = (
+                f"Status: Connected to {address} in {elapsed_ms:.0f} ms ({conn.kind}) | "
+                f"pool hit rate {stats['hit_rate']:.0%}"
+            )
             self.send_btn.disabled = False
-            
-            # Explore Services and Characteristics
-            self.log_message(f"[GATT] Discovering services for {address}...", color="blue")
-            services = client.services 
+
+            if conn.write_char is not None:
+                fixed = " (Fixed)" if conn.write_char.uuid.lower() == TARGET_WRITE_UUID else ""
+                self.write_char_text.value = f"Write Channel: {short_uuid(conn.write_char.uuid)}{fixed}"
+            else:
+                self.log_message("[WARN] No suitable writable application characteristic found.", color="red")
+                self.write_char_text.value = "Write Channel: Not found"
+
             found_info = False
-            self.target_write_char = None
-            found_read_char = None
-            
-            for service in services:
-                self.log_message(f"  [Service] {service.uuid} ({service.description})", color="blue")
-                for char in service.characteristics:
-                    char_uuid = char.uuid.lower()
-                    short_uuid = char_uuid.split("-")[0][-4:]
-                    self.log_message(f"    [Char] {char.uuid} (Short: {short_uuid}) | Props: {char.properties}", color="grey400")
-                    
-                    is_system_char = short_uuid in ["2b29", "2b2a", "2a00", "2a01", "2a05"]
-                    
-                    # --- Priority 1: Strict Match with ble-advertiser spec ---
-                    if char_uuid == TARGET_WRITE_UUID:
-                        self.target_write_char = char
-                        self.write_char_text.value = f"Write Channel: {short_uuid} (Fixed)"
-                        self.log_message(f"      -> [MATCH] TARGET WRITE Characteristic found!", color="green")
-                    
-                    if char_uuid == TARGET_READ_UUID:
-                        found_read_char = char
-                        self.read_char_text.value = f"Read Channel: {short_uuid} (Fixed)"
-                        self.log_message(f"      -> [MATCH] TARGET READ Characteristic found!", color="green")
-
-                    # --- Priority 2: Fallback Logic (if not found yet) ---
-                    if not self.target_write_char and not is_system_char:
-                        if "write" in char.properties or "write-without-response" in char.properties:
-                            self.target_write_char = char
-                            self.write_char_text.value = f"Write Channel: {short_uuid}"
-                            self.log_message(f"      -> Selected as fallback WRITE target", color="blue")
-
-                    if not found_read_char and "read" in char.properties and not is_system_char:
-                        found_read_char = char
-                        self.read_char_text.value = f"Read Channel: {short_uuid}"
-                        self.log_message(f"      -> Selected as fallback READ target", color="blue")
-                            
-                        try:
-                            # Only try to read if it is explicitly the target READ char or has read property
-                            if char == found_read_char:
-                                data = await client.read_gatt_char(char.uuid)
-                                decoded = data.decode('utf-8', errors='ignore')
-                                if decoded.strip():
-                                    self.log_message(f"      -> Initial Read Data: {decoded}", color="blue")
-                                    self.order_info_text.value = f"Order Information: {decoded}"
-                                    found_info = True
-                        except Exception as e:
-                            self.log_message(f"      -> Read failed: {e}", color="red")
-                            continue
-            
+            read_char = conn.read_char
+            if read_char is not None:
+                fixed = " (Fixed)" if read_char.uuid.lower() == TARGET_READ_UUID else ""
+                self.read_char_text.value = f"Read Channel: {short_uuid(read_char.uuid)}{fixed}"
+                try:
+                    data = await conn.client.read_gatt_char(read_char)
+                    decoded = data.decode('utf-8', errors='ignore')
+                    if decoded.strip():
+                        self.log_message(f"      -> Initial Read Data: {decoded}", color="blue")
+                        self.session_log.write("read", address=address, char=read_char.uuid, data=decoded)
+                        self.order_info_text.value = f"Order Information: {decoded}"
+                        found_info = True
+                except Exception as e:
+                    self.log_message(f"      -> Read failed: {e}", color="red")
+            else:
+                self.read_char_text.value = "Read Channel: -"
+
             if not found_info:
                 self.order_info_text.value = "Order Information: No readable data found."
-            
-            if not self.target_write_char:
-                self.log_message("[WARN] No suitable writable application characteristic found.", color="red")
-                self.write_char_text.value = "Write Channel: Not found"
-                
+
+            await self.start_notifications(conn)
+
         except Exception as ex:
             self.log_message(f"[ERROR] Connection failed: {ex}", color="red")
+            self.session_log.write("connect", address=address, ok=False, error=str(ex))
             self.status_text.value = f"Status: Connection failed ({str(ex)})"
         
         self.page.update()
 
+    async def start_notifications(self, conn):
+        """Subscribes to the read characteristic so order updates arrive without polling."""
+        from gatt_pool import short_uuid
+        from notify import NotificationStream, can_notify
+
+        char = conn.read_char
+        if not can_notify(char):
+            return
+        try:
+            stream = await NotificationStream(conn.client, char, maxsize=NOTIFY_QUEUE_SIZE).start()
+        except Exception as ex:
+            self.log_message(f"[NOTIFY] Subscribe failed: {ex}", color="red")
+            return
+        self.notify_stream = stream
+        self.log_message(f"[NOTIFY] Subscribed to {short_uuid(char.uuid)} on {conn.address}", color="blue")
+        self.page.run_task(self.consume_notifications, stream)
+
+    async def stop_notifications(self):
+        stream, self.notify_stream = self.notify_stream, None
+        if stream is not None:
+            await stream.stop()
+
+    async def consume_notifications(self, stream):
+        async for message in stream:
+            text = message.text
+            self.log_message(f"[NOTIFY] {message.address}: {text}", color="blue")
+            self.session_log.write("notify", address=message.address, char=message.char, data=text,
+                                   notifications=message.notifications)
+            if stream is self.notify_stream:
+                self.order_info_text.value = f"Order Information: {text}"
+                self.order_info_text.update()
+        stats = stream.stats()
+        if stats["dropped"] or stats["frame_errors"]:
+            self.log_message(f"[NOTIFY] Stream closed: {stats}", color="grey400")
+
     async def send_data(self, e):
         if not self.connected_client or not self.message_input.value or not self.target_write_char:
             self.status_text.value = "Status: No device connected or message empty."
             self.page.update()
             return
-        
+        from transfer import send_payload
+
         try:
             payload = self.message_input.value
             msg = payload.encode('utf-8')
@@ -451,16 +728,27 @@ class BLEScannerApp:
             method_str = "With Response" if use_response else "Without Response"
             
             self.log_message(f"  - Method (Override): {method_str}", color="grey400")
-            await self.connected_client.write_gatt_char(char.uuid, msg, response=use_response)
-            self.status_text.value = f"Status: Data sent to {short_id} ({method_str})"
-            
-            self.log_message(f"  - Result: Sent successfully", color="green")
+            transfer = await send_payload(self.connected_client, char, msg, response=use_response)
+            if transfer is None:
+                self.status_text.value = f"Status: Data sent to {short_id} ({method_str})"
+                self.log_message(f"  - Result: Sent successfully", color="green")
+            else:
+                # Larger than one write: sent as a framed, chunked transfer.
+                self.status_text.value = (
+                    f"Status: {len(msg)} bytes sent to {short_id} at {transfer.bytes_per_s / 1024:.1f} KiB/s"
+                )
+                self.log_message(f"  - Result: Sent successfully, {transfer}", color="green")
+            self.session_log.write("send", address=self.connected_client.address, char=char.uuid,
+                                   bytes=len(msg), response=use_response, ok=True,
+                                   transfer=transfer.to_json() if transfer is not None else None)
                 
         except Exception as ex:
             err_msg = str(ex)
             short_id = self.target_write_char.uuid.split("-")[0][-4:]
             self.log_message(f"  - Result: FAILED", color="red")
             self.log_message(f"  - Error: {err_msg}", color="red")
+            self.session_log.write("send", address=self.connected_client.address, char=self.target_write_char.uuid,
+                                   ok=False, error=err_msg)
             
             if "Access Denied" in err_msg:
                 self.status_text.value = f"Status: Failed (Access Denied for {short_id}). Pairing may be required."
@@ -469,8 +757,88 @@ class BLEScannerApp:
             
         self.page.update()
 
+    async def dispatch_nearby(self, e):
+        """Queues the message for the nearest decoded devices in the table; scanning keeps running."""
+        payload = self.message_input.value
+        targets = [addr for addr, _ in self.ranking if addr in self.device_table][:DISPATCH_MAX_TARGETS]
+        if not payload or not targets:
+            self.status_text.value = "Status: No decoded devices in range or message empty."
+            self.page.update()
+            return
+        response = self.write_response_switch.value
+        self.log_message(f"[DISPATCH] Queued {len(targets)} device(s): {', '.join(targets)}", color="green")
+        for address in targets:
+            self.dispatcher.submit(address, payload, response=response)
+        self.on_dispatch_report(None)
+
+    def on_dispatch_report(self, report):
+        stats = self.dispatcher.summary()
+        self.status_text.value = (
+            f"Status: Dispatch {stats['ok']} sent, {stats['failed']} failed, "
+            f"{stats['active']} active, {stats['pending']} queued | p50 {stats['p50_ms']:.0f} ms"
+        )
+        self.page.update()
+
+async def run_headless(options):
+    """Scans without the UI: scan lines go to stdout, adverts to the session log."""
+    from scanner_core import ScannerCore
+
+    def log_message(msg, color="white"):
+        print(msg, flush=True)
+        session_log.write("log", msg=msg, color=color)
+
+    session_log = SessionLogWriter(
+        SESSION_LOG_DIR,
+        max_bytes=SESSION_LOG_MAX_BYTES,
+        max_age=SESSION_LOG_MAX_AGE,
+        compress=SESSION_LOG_COMPRESS,
+    ).start()
+    core = ScannerCore(
+        scanner_factory=scanner_factory(options),
+        scanning_mode=SCAN_MODE,
+        dedup_interval=DEDUP_INTERVAL,
+        session_log=session_log,
+        log_message=log_message,
+        name_filter=options.device_filter,
+        decoder=UuidDecoder(cache_size=DECODER_CACHE_SIZE),
+        presence=PresenceTracker(
+            ttl=PRESENCE_TTL,
+            alpha=PRESENCE_ALPHA,
+            enter_rssi=PRESENCE_ENTER_RSSI,
+            exit_rssi=PRESENCE_EXIT_RSSI,
+        ),
+    )
+    startup = StartupTimer(core.metrics, echo=options.startup_probe)
+    core.pipeline.add_listener(startup.on_device)
+    try:
+        await core.start()
+        startup.mark("scan_started")
+        if options.duration is None:
+            await asyncio.Event().wait()  # until Ctrl+C
+        else:
+            await asyncio.sleep(options.duration)
+    finally:
+        await core.stop()
+        if METRICS_FILE:
+            core.metrics.write(METRICS_FILE)
+        session_log.close()
+        print(f"{len(core.pipeline.visible)}/{len(core.devices)} devices, "
+              f"{core.engine.received} adverts received", flush=True)
+
+
+options = None
+
 async def main(page: ft.Page):
-    app = BLEScannerApp(page)
+    app = BLEScannerApp(page, options)
 
 if __name__ == "__main__":
-    ft.run(main)
+    options = parse_args()
+    if options.profile:
+        start_profile(options.profile)
+    if options.headless:
+        try:
+            asyncio.run(run_headless(options))
+        except KeyboardInterrupt:
+            pass
+    else:
+        load_ui().run(main)
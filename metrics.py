@@ -0,0 +1,208 @@
+"""Scan-stage timers, histograms and counters.
+
+Metrics is a drop-in `timer` for ScanPipeline (record(stage, seconds) and
+summary() like StageTimer) that keeps a fixed-bucket histogram per stage
+instead of raw samples, so it can run for a whole kiosk day. Counters are
+incremented by the app; gauges are callables read at export time (device
+count, hit rates, ...), and so are counters owned by other objects (engine
+and pipeline advert counts) so nothing has to be counted twice.
+
+Exports: snapshot() (dict), to_json(), to_prometheus() (text exposition
+format) and write(path), which picks the format from the file extension.
+start_profile() runs cProfile for the rest of the process and dumps the
+stats on exit.
+"""
+import atexit
+import json
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Upper bounds in seconds: 1 µs .. 1 s, plus +Inf.
+DEFAULT_BUCKETS = (
+    1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+    1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0,
+)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum", "max")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (max for the +Inf bucket)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+        return self.max
+
+
+class Metrics:
+    """Per-stage histograms plus counters and gauges under one name prefix."""
+
+    def __init__(self, prefix="ble_scanner", buckets=DEFAULT_BUCKETS):
+        self.prefix = prefix
+        self.buckets = buckets
+        self.started = time.time()
+        self.histograms = {}  # stage: Histogram
+        self.counters = {}
+        self.gauges = {}  # name: (callable returning a number, "gauge" | "counter")
+
+    def record(self, stage, seconds):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = Histogram(self.buckets)
+        histogram.observe(seconds)
+
+    @contextmanager
+    def time(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def inc(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, read, kind="gauge"):
+        """Registers a value read at export time; kind="counter" for monotonically increasing ones."""
+        self.gauges[name] = (read, kind)
+
+    def summary(self):
+        """Per-stage count/mean/p50/p95/max in µs (p50/p95 are bucket upper bounds)."""
+        return {
+            stage: {
+                "count": h.count,
+                "mean_us": h.sum / h.count * 1e6,
+                "p50_us": h.quantile(0.5) * 1e6,
+                "p95_us": h.quantile(0.95) * 1e6,
+                "max_us": h.max * 1e6,
+            }
+            for stage, h in self.histograms.items() if h.count
+        }
+
+    def read_gauges(self):
+        values = {}
+        for name, (read, _) in self.gauges.items():
+            try:
+                values[name] = read()
+            except Exception:
+                continue
+        return values
+
+    def snapshot(self):
+        return {
+            "uptime_s": round(time.time() - self.started, 3),
+            "counters": dict(self.counters),
+            "gauges": self.read_gauges(),
+            "stages": self.summary(),
+        }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        p = self.prefix
+        lines = [f"# TYPE {p}_uptime_seconds gauge", f"{p}_uptime_seconds {time.time() - self.started:.3f}"]
+        for name, value in sorted(self.counters.items()):
+            lines += [f"# TYPE {p}_{name}_total counter", f"{p}_{name}_total {value}"]
+        for name, value in sorted(self.read_gauges().items()):
+            if self.gauges[name][1] == "counter":
+                lines += [f"# TYPE {p}_{name}_total counter", f"{p}_{name}_total {value}"]
+            else:
+                lines += [f"# TYPE {p}_{name} gauge", f"{p}_{name} {value}"]
+        if self.histograms:
+            lines.append(f"# TYPE {p}_stage_seconds histogram")
+        for stage, h in sorted(self.histograms.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, h.counts):
+                cumulative += n
+                lines.append(f'{p}_stage_seconds_bucket{{stage="{stage}",le="{bound:g}"}} {cumulative}')
+            lines.append(f'{p}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+            lines.append(f'{p}_stage_seconds_sum{{stage="{stage}"}} {h.sum:.9f}')
+            lines.append(f'{p}_stage_seconds_count{{stage="{stage}"}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Writes JSON for *.json, Prometheus text otherwise (atomically replaced)."""
+        text = self.to_json() if path.endswith(".json") else self.to_prometheus()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    def format_panel(self, stages=None, counters=None):
+        """A few lines for the in-app stats panel."""
+        summary = self.summary()
+        parts = []
+        for stage in stages or summary:
+            s = summary.get(stage)
+            if s:
+                parts.append(f"{stage} {_format_us(s['mean_us'])}/{_format_us(s['p95_us'])}")
+        values = {**self.counters, **self.read_gauges()}
+        totals = [f"{name} {values[name]:g}" if isinstance(values[name], float) else f"{name} {values[name]}"
+                  for name in (counters or values) if name in values]
+        return "stage mean/p95: " + " | ".join(parts) + "\n" + " | ".join(totals)
+
+
+def _format_us(us):
+    return f"{us / 1000:.0f} ms" if us >= 10_000 else f"{us:.1f} µs" if us < 100 else f"{us:.0f} µs"
+
+
+def add_scan_gauges(metrics, pipeline, engine=None):
+    """Exports the pipeline's counters; `engine()` returns the current ScanEngine (or None)."""
+    metrics.gauge("devices", lambda: len(pipeline.devices))
+    metrics.gauge("tracked_devices", lambda: len(pipeline.presence))
+    metrics.gauge("adverts_processed", lambda: pipeline.processed, "counter")
+    metrics.gauge("adverts_decoded", lambda: pipeline.decoded, "counter")
+    metrics.gauge("decoder_cache_hit_ratio", lambda: round(pipeline.decoder.stats()["hit_rate"], 4))
+    if engine is not None:
+        metrics.gauge("adverts_received", lambda: engine().received, "counter")
+        metrics.gauge("adverts_duplicate", lambda: engine().duplicates, "counter")
+
+
+def start_profile(path):
+    """Profiles the rest of the process with cProfile; writes `path` (pstats) and a text summary on exit."""
+    import cProfile
+    import io
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+    def dump():
+        profiler.disable()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        profiler.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(40)
+        with open(os.path.splitext(path)[0] + ".txt", "w", encoding="utf-8") as f:
+            f.write(out.getvalue())
+
+    atexit.register(dump)
+    return profiler
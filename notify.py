@@ -0,0 +1,115 @@
+"""Notification subscription on the read characteristic.
+
+NotificationStream calls start_notify on a characteristic and turns the
+incoming notifications into messages:
+
+- a notification whose first byte is 0x00-0x03 is a frame of the
+  transfer.py format and is reassembled with FrameAssembler
+  (long order updates arrive in several notifications);
+- anything else (plain text such as "ORDER-0001 READY") is one message.
+
+Messages are queued in a bounded asyncio.Queue and read with
+`async for message in stream`. The peripheral cannot be slowed down, so when
+the consumer falls behind the oldest messages are dropped and counted.
+"""
+import asyncio
+import time
+
+from transfer import FLAG_FIRST, FLAG_LAST, FrameAssembler, FrameError
+
+_FRAME_FLAGS = FLAG_FIRST | FLAG_LAST
+_CLOSED = object()
+
+
+def can_notify(char):
+    return char is not None and ("notify" in char.properties or "indicate" in char.properties)
+
+
+class NotificationMessage:
+    __slots__ = ("address", "char", "data", "received_at", "notifications")
+
+    def __init__(self, address, char, data, received_at, notifications):
+        self.address = address
+        self.char = char
+        self.data = data
+        self.received_at = received_at  # time.perf_counter() of the last notification
+        self.notifications = notifications
+
+    @property
+    def text(self):
+        return self.data.decode("utf-8", errors="ignore")
+
+
+class NotificationStream:
+    """Subscribes to `char` on a connected client and yields NotificationMessages."""
+
+    def __init__(self, client, char, maxsize=64):
+        self.client = client
+        self.char = char
+        self.address = getattr(client, "address", None)
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.assembler = FrameAssembler()
+        self.notifications = 0
+        self.messages = 0
+        self.frame_errors = 0
+        self.dropped = 0
+        self.active = False
+        self._frames = 0
+
+    async def start(self):
+        if not self.active:
+            await self.client.start_notify(self.char, self._on_notify)
+            self.active = True
+        return self
+
+    async def stop(self):
+        if self.active:
+            self.active = False
+            try:
+                await self.client.stop_notify(self.char)
+            except Exception:
+                pass  # the link may already be gone
+            self._put(_CLOSED)
+
+    def _on_notify(self, sender, data):
+        self.notifications += 1
+        data = bytes(data)
+        if data and data[0] <= _FRAME_FLAGS:
+            self._frames += 1
+            try:
+                message = self.assembler.feed(data)
+            except FrameError:
+                self.frame_errors += 1
+                self._frames = 0
+                return
+            if message is None:
+                return
+            count, self._frames = self._frames, 0
+        else:
+            message, count = data, 1
+        self.messages += 1
+        self._put(NotificationMessage(self.address, self.char.uuid, message, time.perf_counter(), count))
+
+    def _put(self, item):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(item)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        item = await self.queue.get()
+        if item is _CLOSED:
+            raise StopAsyncIteration
+        return item
+
+    def stats(self):
+        return {
+            "notifications": self.notifications,
+            "messages": self.messages,
+            "frame_errors": self.frame_errors,
+            "dropped": self.dropped,
+            "queued": self.queue.qsize(),
+        }
@@ -0,0 +1,233 @@
+"""Advertisement processing shared by the UI, replay and benchmarks.
+
+ScanPipeline takes the Advertisements delivered by ScanEngine and runs them
+through decoding, session logging, the device registry, the filter and the
+activity log. Every present device stays in the registry; the filter only
+decides which of them are visible, so a new filter applies to the known
+devices at once. Rendering stays with the caller: it asks for the addresses
+that changed (take_dirty) and patches its own view.
+"""
+import time
+from collections import deque
+
+from device_filter import DeviceFilter
+from presence import PresenceTracker, LEAVE
+
+
+class StageTimer:
+    """Keeps recent per-stage durations (seconds) and summarizes them."""
+
+    def __init__(self, maxlen=100_000):
+        self.maxlen = maxlen
+        self.samples = {}  # stage: deque of seconds
+
+    def record(self, stage, seconds):
+        samples = self.samples.get(stage)
+        if samples is None:
+            samples = self.samples[stage] = deque(maxlen=self.maxlen)
+        samples.append(seconds)
+
+    def summary(self):
+        result = {}
+        for stage, samples in self.samples.items():
+            ordered = sorted(samples)
+            n = len(ordered)
+            if not n:
+                continue
+            result[stage] = {
+                "count": n,
+                "mean_us": sum(ordered) / n * 1e6,
+                "p50_us": ordered[n // 2] * 1e6,
+                "p95_us": ordered[min(n - 1, int(n * 0.95))] * 1e6,
+                "max_us": ordered[-1] * 1e6,
+            }
+        return result
+
+
+class ScanPipeline:
+    """decode → session log → presence → device registry → filter → activity log.
+
+    `devices` holds the devices currently present, keyed by address:
+    {device, name, phone, card, rssi (smoothed), raw_rssi, uuids, payload, presence},
+    and `visible` the addresses among them that match the filter (a
+    device_filter expression, or an already compiled DeviceFilter). Only visible devices are logged and marked
+    for re-rendering.
+    `log_message(msg, color)` receives the human-readable scan lines and
+    `session_log` (a SessionLogWriter, optional) one "advert" record per advert
+    and one "leave" record per departure. Listeners added with add_listener()
+    are called as listener(kind, address, info, ad) for appear/update/leave
+    (ad is None when a device expires). With a StageTimer, each stage's
+    duration is recorded. Listeners see every device; check `visible` to
+    follow only the filtered ones. Set track_changes to False when nobody
+    calls take_dirty()/take_pending().
+    """
+
+    def __init__(self, decoder, log_message, session_log=None, name_filter="", timer=None,
+                 track_changes=True, presence=None):
+        self.decoder = decoder
+        self.log_message = log_message
+        self.session_log = session_log
+        self.device_filter = name_filter if isinstance(name_filter, DeviceFilter) else DeviceFilter(name_filter)
+        self.timer = timer
+        self.track_changes = track_changes
+        self.presence = presence or PresenceTracker()
+        self.devices = {}
+        self.visible = set()
+        self.processed = 0
+        self.decoded = 0  # adverts that yielded a phone or card number
+        self._dirty = set()  # addresses whose view needs patching
+        self._pending = []  # detected_at of adverts not yet rendered
+        self._listeners = []
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+        return listener
+
+    def _notify(self, kind, address, info, ad):
+        for listener in self._listeners:
+            listener(kind, address, info, ad)
+
+    def set_filter(self, value):
+        """Compiles and applies a new filter to the known devices; returns how many changed visibility.
+
+        Raises FilterError (a ValueError) for an invalid expression and keeps
+        the current filter. A filter that only narrows the current one (one
+        more character or one more term) re-checks just the visible devices.
+        """
+        new = DeviceFilter(value)
+        old = self.device_filter
+        if new.text == old.text:
+            return 0
+        self.device_filter = new
+        devices = self.devices
+        candidates = self.visible if new.narrows(old) else devices
+        visible = {address for address in candidates if new.matches(address, devices[address])}
+        changed = visible ^ self.visible
+        self.visible = visible
+        if self.track_changes:
+            self._dirty |= changed
+        return len(changed)
+
+    def matches(self, address, info):
+        return self.device_filter.matches(address, info)
+
+    def handle(self, ad):
+        """Processes one Advertisement; returns True if the device is present and visible."""
+        clock = time.perf_counter
+        timer = self.timer
+        self.processed += 1
+
+        t0 = clock()
+        phone, card = self.decoder.decode(ad.service_uuids, ad.manufacturer_data, ad.service_data)
+        t1 = clock()
+        if phone or card:
+            self.decoded += 1
+        if self.session_log is not None:
+            self.session_log.write(
+                "advert", address=ad.address, name=ad.name, rssi=ad.rssi, uuids=ad.service_uuids,
+                phone=phone, card=card, manufacturer_data=ad.manufacturer_data, service_data=ad.service_data,
+            )
+        t2 = clock()
+        if timer is not None:
+            timer.record("decode", t1 - t0)
+            timer.record("session_log", t2 - t1)
+
+        state, kind = self.presence.observe(ad.address, ad.rssi, ad.detected_at)
+        if kind is None:
+            return False
+        if kind == LEAVE:
+            self._drop(ad.address, state)
+            return False
+
+        payload = ad.payload_key()
+        prev = self.devices.get(ad.address)
+        info = self.devices[ad.address] = {
+            "device": ad.device,
+            "name": ad.name,
+            "phone": phone,
+            "card": card,
+            "rssi": round(state.rssi),
+            "raw_rssi": ad.rssi,
+            "uuids": ad.service_uuids,
+            "payload": payload,
+            "presence": state,
+        }
+        t3 = clock()
+        visible = self.device_filter.matches(ad.address, info)
+        t4 = clock()
+        if visible:
+            self.visible.add(ad.address)
+            if self.track_changes:
+                self._pending.append(ad.detected_at)
+                self._dirty.add(ad.address)
+        elif ad.address in self.visible:
+            self.visible.discard(ad.address)
+            if self.track_changes:
+                self._dirty.add(ad.address)
+
+        if visible and (prev is None or prev["payload"] != payload):
+            # Log to UI
+            self.log_message(f"[SCAN] Found: {ad.name} ({ad.address}) | RSSI: {ad.rssi}", color="amber")
+            if ad.service_uuids: self.log_message(f"  - UUIDs: {ad.service_uuids}", color="grey400")
+            if phone: self.log_message(f"  - DECODED PHONE: {phone}", color="green")
+            if card: self.log_message(f"  - DECODED CARD: {card}", color="green")
+        t5 = clock()
+        if timer is not None:
+            timer.record("registry", t3 - t2)
+            timer.record("filter", t4 - t3)
+            timer.record("log", t5 - t4)
+        if self._listeners:
+            self._notify(kind, ad.address, info, ad)
+        return visible
+
+    def sweep(self, now=None):
+        """Removes devices that stopped advertising (presence TTL); returns how many left."""
+        left = self.presence.sweep(now)
+        for state in left:
+            self._drop(state.address, state)
+        return len(left)
+
+    def _drop(self, address, state):
+        info = self.devices.pop(address, None)
+        if info is None:
+            return
+        self.device_filter.forget(address)
+        visible = address in self.visible
+        if visible and self.track_changes:
+            self._dirty.add(address)
+        if self.session_log is not None:
+            self.session_log.write("leave", address=address, name=info["name"],
+                                   dwell=round(state.dwell, 3), adverts=state.adverts)
+        if visible:
+            self.log_message(f"[SCAN] Left: {info['name']} ({address}) | seen {state.dwell:.0f}s, "
+                             f"{state.adverts} adverts", color="grey400")
+        if self._listeners:
+            self._notify(LEAVE, address, info, None)  # still in `visible` for the listeners
+        self.visible.discard(address)
+
+    @property
+    def has_changes(self):
+        return bool(self._dirty or self._pending)
+
+    def take_dirty(self):
+        """Returns and resets the set of addresses to re-render."""
+        dirty, self._dirty = self._dirty, set()
+        return dirty
+
+    def take_pending(self):
+        """Returns and resets detection timestamps of adverts not yet rendered."""
+        pending, self._pending = self._pending, []
+        return pending
+
+
+def render_to_table(pipeline, table):
+    """Patches a DeviceTable with the devices that changed; True if anything changed."""
+    changed = False
+    devices = pipeline.devices
+    for address in pipeline.take_dirty():
+        info = devices.get(address)
+        if info is None or address not in pipeline.visible:
+            changed |= table.remove(address)
+            continue
+        changed |= table.upsert(address, info["name"], info["phone"], info["card"], info["rssi"])
+    return changed
@@ -0,0 +1,111 @@
+"""Device presence tracking with RSSI smoothing, TTL expiry and hysteresis.
+
+PresenceTracker keeps one small DeviceState per address (EWMA-smoothed RSSI,
+first/last seen, advert count) and decides when a device appears, stays or
+leaves:
+
+- appear: the first advert, or the smoothed RSSI rising to `enter_rssi`
+- leave:  no advert for `ttl` seconds, or the smoothed RSSI falling below
+          `exit_rssi` (kept lower than enter_rssi so a device hovering at the
+          edge does not flap in and out)
+
+Expired devices are dropped entirely, so memory stays bounded on a 24/7 kiosk.
+"""
+import time
+from collections import OrderedDict
+
+APPEAR = "appear"
+UPDATE = "update"
+LEAVE = "leave"
+
+
+class DeviceState:
+    __slots__ = ("address", "rssi", "raw_rssi", "first_seen", "last_seen", "adverts", "present")
+
+    def __init__(self, address, rssi, now):
+        self.address = address
+        self.rssi = float(rssi)
+        self.raw_rssi = rssi
+        self.first_seen = now
+        self.last_seen = now
+        self.adverts = 1
+        self.present = False
+
+    @property
+    def dwell(self):
+        return self.last_seen - self.first_seen
+
+
+class PresenceTracker:
+    """Tracks presence per address.
+
+    alpha is the EWMA weight of a new RSSI sample (1.0 = no smoothing).
+    enter_rssi/exit_rssi of None disable the corresponding threshold.
+    """
+
+    def __init__(self, ttl=30.0, alpha=0.3, enter_rssi=None, exit_rssi=None):
+        if enter_rssi is not None and exit_rssi is not None and exit_rssi > enter_rssi:
+            raise ValueError("exit_rssi must not be above enter_rssi")
+        self.ttl = ttl
+        self.alpha = alpha
+        self.enter_rssi = enter_rssi
+        self.exit_rssi = exit_rssi
+        self._states = OrderedDict()  # address: DeviceState, least recently seen first
+
+    def __len__(self):
+        return len(self._states)
+
+    def __contains__(self, address):
+        return address in self._states
+
+    def get(self, address):
+        return self._states.get(address)
+
+    def present(self):
+        return [s for s in self._states.values() if s.present]
+
+    def observe(self, address, rssi, now=None):
+        """Feeds one advert; returns (state, APPEAR | UPDATE | LEAVE | None).
+
+        None means the device is tracked but not (yet) considered present.
+        """
+        if now is None:
+            now = time.perf_counter()
+        state = self._states.get(address)
+        if state is None:
+            state = self._states[address] = DeviceState(address, rssi, now)
+        else:
+            self._states.move_to_end(address)
+            state.rssi += self.alpha * (rssi - state.rssi)
+            state.raw_rssi = rssi
+            state.last_seen = now
+            state.adverts += 1
+
+        if state.present:
+            if self.exit_rssi is not None and state.rssi < self.exit_rssi:
+                state.present = False
+                return state, LEAVE
+            return state, UPDATE
+        if self.enter_rssi is None or state.rssi >= self.enter_rssi:
+            state.present = True
+            return state, APPEAR
+        return state, None
+
+    def sweep(self, now=None):
+        """Drops devices not seen for `ttl` seconds; returns the states that were present."""
+        if now is None:
+            now = time.perf_counter()
+        left = []
+        states = self._states
+        while states:
+            address, state = next(iter(states.items()))
+            if now - state.last_seen < self.ttl:
+                break
+            del states[address]
+            if state.present:
+                state.present = False
+                left.append(state)
+        return left
+
+    def forget(self, address):
+        return self._states.pop(address, None)
@@ -0,0 +1,99 @@
+"""Nearest-device ranking by smoothed RSSI.
+
+RankingIndex keeps addresses in a list sorted strongest-first, maintained with
+bisect as adverts arrive. Lookups of the nearest device and of the top K are
+O(K); "everything above -60 dBm" is a binary search plus the slice. An update
+is a binary search plus a list shift, which stays in the microseconds for tens
+of thousands of devices.
+"""
+from bisect import bisect_left, bisect_right, insort
+
+
+def _neg_rssi(key):
+    return key[0]
+
+
+class RankingIndex:
+    """Addresses ordered by RSSI (strongest first)."""
+
+    def __init__(self):
+        self._keys = []  # sorted (-rssi, address)
+        self._rssi = {}  # address: rssi
+
+    def __len__(self):
+        return len(self._rssi)
+
+    def __contains__(self, address):
+        return address in self._rssi
+
+    def __iter__(self):
+        """(address, rssi) pairs, strongest first."""
+        for neg_rssi, address in self._keys:
+            yield address, -neg_rssi
+
+    def update(self, address, rssi):
+        old = self._rssi.get(address)
+        if old == rssi:
+            return
+        if old is not None:
+            self._remove_key(old, address)
+        self._rssi[address] = rssi
+        insort(self._keys, (-rssi, address))
+
+    def remove(self, address):
+        old = self._rssi.pop(address, None)
+        if old is not None:
+            self._remove_key(old, address)
+
+    def _remove_key(self, rssi, address):
+        keys = self._keys
+        i = bisect_left(keys, (-rssi, address))
+        if i < len(keys) and keys[i] == (-rssi, address):
+            del keys[i]
+
+    def clear(self):
+        self._keys.clear()
+        self._rssi.clear()
+
+    def nearest(self):
+        """(address, rssi) of the strongest device, or None."""
+        if not self._keys:
+            return None
+        neg_rssi, address = self._keys[0]
+        return address, -neg_rssi
+
+    def top(self, k=1):
+        """The k strongest devices as [(address, rssi)]."""
+        return [(address, -neg_rssi) for neg_rssi, address in self._keys[:k]]
+
+    def above(self, threshold):
+        """Devices with rssi >= threshold, strongest first, as [(address, rssi)]."""
+        end = bisect_right(self._keys, -threshold, key=_neg_rssi)
+        return [(address, -neg_rssi) for neg_rssi, address in self._keys[:end]]
+
+    def rank(self, address):
+        """0-based position of `address` (0 = nearest), or None if unknown."""
+        rssi = self._rssi.get(address)
+        if rssi is None:
+            return None
+        return bisect_left(self._keys, (-rssi, address))
+
+    def rssi(self, address):
+        return self._rssi.get(address)
+
+
+def attach_ranking(pipeline, decoded_only=True):
+    """Creates a RankingIndex kept in sync with a ScanPipeline's presence events.
+
+    With decoded_only, only devices with a decoded phone or card are ranked.
+    """
+    index = RankingIndex()
+
+    def on_event(kind, address, info, ad):
+        if kind == "leave" or (decoded_only and not (info["phone"] or info["card"])):
+            index.remove(address)
+        else:
+            index.update(address, info["presence"].rssi)
+
+    pipeline.add_listener(on_event)
+    return index
@@ -0,0 +1,298 @@
+"""Replay recorded scan sessions through the scan pipeline.
+
+ReplaySource reads advertisements from NDJSON session logs (session_log.py)
+or the older text logs saved by the UI (logs/ble_*.txt) and hands them to the
+ScanEngine callback exactly like BleakScanner does, in real time, N times
+faster, or as fast as possible (speed=0).
+
+Run headless to load-test the pipeline without a radio:
+
+    python replay.py logs/ble_20260125_100814.txt --speed 0 --repeat 50 --fanout 20 --dedup 0
+"""
+import argparse
+import ast
+import asyncio
+import datetime
+import json
+import os
+import re
+import sys
+import time
+from collections import namedtuple
+
+from device_filter import DeviceFilter, FilterError
+from scan_engine import FakeDevice, FakeAdvertisementData
+from session_log import iter_records
+
+RecordedAdvert = namedtuple(
+    "RecordedAdvert", "ts address name rssi uuids manufacturer_data service_data"
+)
+
+TEXT_FOUND = re.compile(r'^\[(\d\d):(\d\d):(\d\d)\] \[SCAN\] Found: (.*) \(([^()]+)\) \| RSSI: (-?\d+)\s*$')
+TEXT_UUIDS = re.compile(r'^\[\d\d:\d\d:\d\d\]\s+- UUIDs: (\[.*\])\s*$')
+TEXT_FILENAME = re.compile(r'(\d{8})_(\d{6})')
+
+
+def _text_base_date(path):
+    """Date and time-of-day encoded in a ble_YYYYMMDD_HHMMSS.txt name (the save time)."""
+    match = TEXT_FILENAME.search(os.path.basename(path))
+    if not match:
+        return datetime.datetime(1970, 1, 1), None
+    saved = datetime.datetime.strptime(match.group(1) + match.group(2), "%Y%m%d%H%M%S")
+    midnight = saved.replace(hour=0, minute=0, second=0)
+    return midnight, (saved - midnight).total_seconds()
+
+
+def iter_text_adverts(path):
+    """Adverts from a UI log file; only "[SCAN] Found" lines (plus their UUID line) are used."""
+    midnight, saved_tod = _text_base_date(path)
+    day_offset = None
+    last_tod = None
+    pending = None
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            match = TEXT_FOUND.match(line)
+            if match:
+                if pending is not None:
+                    yield pending
+                h, m, s, name, address, rssi = match.groups()
+                tod = int(h) * 3600 + int(m) * 60 + int(s)
+                if day_offset is None:
+                    # Files are saved at the end of a session; a first line later
+                    # in the day than the save time means it started the day before.
+                    day_offset = -86400 if saved_tod is not None and tod > saved_tod else 0
+                elif tod < last_tod:
+                    day_offset += 86400
+                last_tod = tod
+                ts = midnight.timestamp() + day_offset + tod
+                pending = RecordedAdvert(ts, address, name, int(rssi), [], {}, {})
+                continue
+            if pending is not None:
+                uuid_match = TEXT_UUIDS.match(line)
+                if uuid_match:
+                    try:
+                        pending = pending._replace(uuids=list(ast.literal_eval(uuid_match.group(1))))
+                    except (ValueError, SyntaxError):
+                        pass
+                    continue
+                if "- DECODED" in line:
+                    continue
+                yield pending
+                pending = None
+    if pending is not None:
+        yield pending
+
+
+def iter_ndjson_adverts(path):
+    for record in iter_records(path):
+        if record.get("event") != "advert":
+            continue
+        yield RecordedAdvert(
+            record["ts"],
+            record["address"],
+            record.get("name") or "Unknown",
+            record.get("rssi", 0),
+            record.get("uuids") or [],
+            {int(k): bytes.fromhex(v) for k, v in (record.get("manufacturer_data") or {}).items()},
+            {k: bytes.fromhex(v) for k, v in (record.get("service_data") or {}).items()},
+        )
+
+
+def iter_recorded_adverts(paths):
+    """Streams RecordedAdverts from NDJSON (.ndjson, .ndjson.gz) and text (.txt) logs."""
+    if isinstance(paths, str):
+        paths = [paths]
+    for path in paths:
+        if path.endswith(".txt"):
+            yield from iter_text_adverts(path)
+        else:
+            yield from iter_ndjson_adverts(path)
+
+
+class ReplaySource:
+    """Scanner stand-in that plays back recorded adverts.
+
+    speed=1 replays in real time, speed=N N times faster, speed=0 as fast as
+    possible. `repeat` plays the recording several times back to back and
+    `fanout` clones every advert onto that many distinct addresses, to turn
+    a short recording into a large population. `finished` is set at the end.
+    """
+
+    def __init__(self, detection_callback, paths, speed=1.0, repeat=1, fanout=1, batch=256):
+        self.detection_callback = detection_callback
+        self.paths = paths
+        self.speed = speed
+        self.repeat = repeat
+        self.fanout = fanout
+        self.batch = batch
+        self.emitted = 0
+        self.finished = asyncio.Event()
+        self._task = None
+
+    @classmethod
+    def factory(cls, paths, **kwargs):
+        """ScanEngine scanner_factory; the created source is kept in `factory.sources`."""
+        def create(detection_callback, scanning_mode):
+            source = cls(detection_callback, paths, **kwargs)
+            create.sources.append(source)
+            return source
+        create.sources = []
+        return create
+
+    def _emit(self, rec):
+        for k in range(self.fanout):
+            address = rec.address if k == 0 else f"{rec.address}-{k:04d}"
+            device = FakeDevice(address, rec.name)
+            adv = FakeAdvertisementData(rec.name, rec.rssi, rec.uuids, rec.manufacturer_data, rec.service_data)
+            self.detection_callback(device, adv)
+            self.emitted += 1
+
+    async def _run(self):
+        try:
+            for _ in range(self.repeat):
+                first_ts = None
+                started = time.perf_counter()
+                since_yield = 0
+                for rec in iter_recorded_adverts(self.paths):
+                    if self.speed > 0:
+                        if first_ts is None:
+                            first_ts = rec.ts
+                        delay = (rec.ts - first_ts) / self.speed - (time.perf_counter() - started)
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                    self._emit(rec)
+                    since_yield += self.fanout
+                    if since_yield >= self.batch:
+                        # Let the render and log loops run between batches.
+                        since_yield = 0
+                        await asyncio.sleep(0)
+        finally:
+            self.finished.set()
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+async def run_headless(paths, speed=0.0, repeat=1, fanout=1, dedup_interval=0.0,
+                       name_filter="", render_interval=0.25):
+    """Replays `paths` through ScanEngine → ScanPipeline → DeviceTable/LogSink without a page."""
+    import flet as ft
+    from decoder import UuidDecoder
+    from device_table import DeviceTable
+    from log_sink import LogSink
+    from pipeline import ScanPipeline, StageTimer, render_to_table
+    from scan_engine import ScanEngine, LatencyTracker
+
+    timer = StageTimer()
+    latency = LatencyTracker(maxlen=100_000)
+    sink = LogSink(ft.ListView(), update=lambda: None)
+    table = DeviceTable(ft.DataTable(columns=[ft.DataColumn(ft.Text(c)) for c in "ABCDE"], rows=[]),
+                        on_connect=lambda addr: None)
+    pipeline = ScanPipeline(UuidDecoder(), sink.log, name_filter=name_filter, timer=timer)
+
+    def on_advertisement(ad):
+        t0 = time.perf_counter()
+        pipeline.handle(ad)
+        timer.record("pipeline", time.perf_counter() - t0)
+
+    factory = ReplaySource.factory(paths, speed=speed, repeat=repeat, fanout=fanout)
+    engine = ScanEngine(on_advertisement, dedup_interval=dedup_interval, scanner_factory=factory)
+
+    def render():
+        pipeline.sweep()
+        t0 = time.perf_counter()
+        render_to_table(pipeline, table)
+        t1 = time.perf_counter()
+        sink.flush()
+        t2 = time.perf_counter()
+        timer.record("table", t1 - t0)
+        timer.record("log_flush", t2 - t1)
+        for detected_at in pipeline.take_pending():
+            latency.record(detected_at, t2)
+
+    started = time.perf_counter()
+    await engine.start()
+    source = factory.sources[0]
+    while not source.finished.is_set():
+        try:
+            await asyncio.wait_for(source.finished.wait(), render_interval)
+        except asyncio.TimeoutError:
+            pass
+        render()
+    await engine.stop()
+    render()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "elapsed_s": elapsed,
+        "emitted": source.emitted,
+        "delivered": engine.delivered,
+        "duplicates": engine.duplicates,
+        "adverts_per_s": source.emitted / elapsed if elapsed else 0.0,
+        "devices": len(pipeline.devices),
+        "rows": len(table),
+        "stages": timer.summary(),
+        "latency": latency.summary(),
+        "decoder": pipeline.decoder.stats(),
+        "log": sink.stats(),
+    }
+
+
+def print_report(report):
+    print(f"emitted {report['emitted']} adverts in {report['elapsed_s']:.2f} s "
+          f"-> {report['adverts_per_s']:,.0f} adverts/s")
+    print(f"delivered {report['delivered']} | duplicates {report['duplicates']} | "
+          f"devices {report['devices']} | rows {report['rows']}")
+    print(f"{'stage':<12} {'count':>9} {'mean us':>9} {'p50 us':>9} {'p95 us':>9} {'max us':>10}")
+    for stage, s in report["stages"].items():
+        print(f"{stage:<12} {s['count']:>9} {s['mean_us']:>9.2f} {s['p50_us']:>9.2f} "
+              f"{s['p95_us']:>9.2f} {s['max_us']:>10.2f}")
+    lat = report["latency"]
+    print(f"detection-to-render latency p50 {lat['p50_ms']:.1f} ms | p95 {lat['p95_ms']:.1f} ms | max {lat['max_ms']:.1f} ms")
+    print(f"decoder {report['decoder']}")
+    print(f"log {report['log']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded scan sessions through the pipeline.")
+    parser.add_argument("paths", nargs="+", help="session_*.ndjson[.gz] or ble_*.txt files")
+    parser.add_argument("--speed", type=float, default=0.0, help="1 = real time, N = N times faster, 0 = max speed")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--fanout", type=int, default=1, help="clone each advert onto this many addresses")
+    parser.add_argument("--dedup", type=float, default=0.0, help="ScanEngine duplicate filter window (s)")
+    parser.add_argument("--filter", default="", help="device filter expression (see device_filter.py)")
+    parser.add_argument("--render-interval", type=float, default=0.25)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--profile", metavar="FILE", help="run under cProfile and write the stats on exit")
+    args = parser.parse_args(argv)
+    try:
+        device_filter = DeviceFilter(args.filter)
+    except FilterError as ex:
+        parser.error(f"--filter: {ex}")
+    if args.profile:
+        from metrics import start_profile
+        start_profile(args.profile)
+
+    report = asyncio.run(run_headless(
+        args.paths, speed=args.speed, repeat=args.repeat, fanout=args.fanout,
+        dedup_interval=args.dedup, name_filter=device_filter, render_interval=args.render_interval,
+    ))
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""Continuous, callback-driven BLE scanning.
+
+ScanEngine keeps a single scanner running for the whole session and forwards
+every advertisement to the app as soon as the backend reports it, instead of
+collecting results in fixed BleakScanner.discover() windows.
+"""
+import asyncio
+import random
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class Advertisement:
+    """One advertisement as delivered to the app."""
+    address: str
+    name: str
+    rssi: int
+    service_uuids: list
+    manufacturer_data: dict
+    service_data: dict
+    detected_at: float  # time.perf_counter() when the backend callback fired
+    device: object = None
+
+    def payload_key(self):
+        """Hashable view of everything except RSSI, used for duplicate filtering."""
+        return (
+            self.name,
+            tuple(self.service_uuids),
+            tuple(sorted(self.manufacturer_data.items())),
+            tuple(sorted(self.service_data.items())),
+        )
+
+
+class LatencyTracker:
+    """Keeps the most recent detection-to-display latencies (in seconds)."""
+
+    def __init__(self, maxlen=1000):
+        self.samples = deque(maxlen=maxlen)
+
+    def record(self, detected_at, now=None):
+        if now is None:
+            now = time.perf_counter()
+        self.samples.append(now - detected_at)
+
+    def summary(self):
+        if not self.samples:
+            return {"count": 0, "p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        ordered = sorted(self.samples)
+        n = len(ordered)
+        return {
+            "count": n,
+            "p50_ms": ordered[n // 2] * 1000,
+            "p95_ms": ordered[min(n - 1, int(n * 0.95))] * 1000,
+            "max_ms": ordered[-1] * 1000,
+        }
+
+
+def bleak_scanner_factory(detection_callback, scanning_mode):
+    """Default backend: a real BleakScanner."""
+    from bleak import BleakScanner
+    return BleakScanner(detection_callback=detection_callback, scanning_mode=scanning_mode)
+
+
+class ScanEngine:
+    """Long-lived scanner that pushes adverts to `on_advertisement` as they arrive.
+
+    scanning_mode is "active" (request scan responses, gets names) or "passive".
+    Adverts whose payload (name, UUIDs, manufacturer/service data) did not change
+    for the same address within `dedup_interval` seconds are dropped; set it to 0
+    to deliver every advert.
+    """
+
+    def __init__(self, on_advertisement, scanning_mode="active", dedup_interval=1.0,
+                 scanner_factory=None):
+        if scanning_mode not in ("active", "passive"):
+            raise ValueError(f"Unknown scanning mode: {scanning_mode}")
+        self.on_advertisement = on_advertisement
+        self.scanning_mode = scanning_mode
+        self.dedup_interval = dedup_interval
+        self.scanner_factory = scanner_factory or bleak_scanner_factory
+        self.received = 0
+        self.delivered = 0
+        self.duplicates = 0
+        self._last_seen = OrderedDict()  # address: (payload_key, perf_counter), oldest first
+        self._scanner = None
+
+    @property
+    def is_running(self):
+        return self._scanner is not None
+
+    async def start(self):
+        if self._scanner is not None:
+            return
+        self._scanner = self.scanner_factory(self._on_detection, self.scanning_mode)
+        await self._scanner.start()
+
+    async def stop(self):
+        scanner, self._scanner = self._scanner, None
+        if scanner is not None:
+            await scanner.stop()
+
+    def forget(self, address):
+        """Drops duplicate-filter state for a device that left."""
+        self._last_seen.pop(address, None)
+
+    def _on_detection(self, device, adv):
+        now = time.perf_counter()
+        self.received += 1
+        ad = Advertisement(
+            address=device.address,
+            name=device.name or adv.local_name or "Unknown",
+            rssi=adv.rssi,
+            service_uuids=list(adv.service_uuids or []),
+            manufacturer_data=dict(adv.manufacturer_data or {}),
+            service_data=dict(adv.service_data or {}),
+            detected_at=now,
+            device=device,
+        )
+        if self.dedup_interval > 0:
+            last_seen = self._last_seen
+            # Entries older than the window cannot suppress anything any more.
+            while last_seen:
+                oldest = next(iter(last_seen.values()))
+                if now - oldest[1] < self.dedup_interval:
+                    break
+                last_seen.popitem(last=False)
+            key = ad.payload_key()
+            prev = last_seen.get(ad.address)
+            if prev is not None and prev[0] == key:
+                self.duplicates += 1
+                return
+            last_seen[ad.address] = (key, now)
+            last_seen.move_to_end(ad.address)
+        self.delivered += 1
+        self.on_advertisement(ad)
+
+
+# --- Fake backend (no radio required) ---
+
+class FakeDevice:
+    __slots__ = ("address", "name")
+
+    def __init__(self, address, name):
+        self.address = address
+        self.name = name
+
+
+class FakeAdvertisementData:
+    __slots__ = ("local_name", "rssi", "service_uuids", "manufacturer_data", "service_data")
+
+    def __init__(self, local_name, rssi, service_uuids, manufacturer_data=None, service_data=None):
+        self.local_name = local_name
+        self.rssi = rssi
+        self.service_uuids = service_uuids
+        self.manufacturer_data = manufacturer_data or {}
+        self.service_data = service_data or {}
+
+
+# UUIDs seen in logs/ plus an ASCII-encoded (Rule B) sample.
+FAKE_UUID_SETS = [
+    ["12345678-1234-5678-0000-123400805f9b", "0000fff0-0000-1000-8000-00805f9b34fb"],
+    ["12345678-90ab-cdef-1234-1234567890ab"],
+    ["30313031-3233-3435-3637-380000000000"],
+    ["0000fd69-0000-1000-8000-00805f9b34fb"],
+    ["0000fef3-0000-1000-8000-00805f9b34fb"],
+]
+
+
+class FakeAdvertisementSource:
+    """Drop-in replacement for BleakScanner that emits synthetic adverts.
+
+    Every `interval` seconds each of `devices` fake tags advertises once with a
+    noisy RSSI. Use `FakeAdvertisementSource.factory(...)` as a ScanEngine
+    scanner_factory, or call `emit_round()` directly from benchmarks.
+    """
+
+    def __init__(self, detection_callback, devices=10, interval=0.1, name="mcandle",
+                 uuid_sets=None, seed=None):
+        self.detection_callback = detection_callback
+        self.interval = interval
+        self.uuid_sets = uuid_sets or FAKE_UUID_SETS
+        self._rng = random.Random(seed)
+        self.devices = [
+            FakeDevice(f"FA:KE:00:{i >> 8 & 0xFF:02X}:{i & 0xFF:02X}:{i * 7 & 0xFF:02X}", f"{name}-{i}")
+            for i in range(devices)
+        ]
+        self._base_rssi = [self._rng.randint(-90, -40) for _ in self.devices]
+        self._task = None
+
+    @classmethod
+    def factory(cls, **kwargs):
+        return lambda detection_callback, scanning_mode: cls(detection_callback, **kwargs)
+
+    def emit_round(self):
+        for i, device in enumerate(self.devices):
+            adv = FakeAdvertisementData(
+                local_name=device.name,
+                rssi=self._base_rssi[i] + self._rng.randint(-4, 4),
+                service_uuids=self.uuid_sets[i % len(self.uuid_sets)],
+            )
+            self.detection_callback(device, adv)
+
+    async def _run(self):
+        while True:
+            self.emit_round()
+            await asyncio.sleep(self.interval)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
@@ -0,0 +1,189 @@
+"""Headless scanner core: scanning, decoding and the device registry, no UI.
+
+ScannerCore owns a ScanEngine and a ScanPipeline and publishes a device event
+for every advertisement that reaches the registry. Any number of consumers
+(the HTTP/WebSocket API in scanner_service.py, tests, benchmarks) subscribe
+with their own bounded queue, so a slow consumer never throttles scanning.
+"""
+import asyncio
+import time
+from itertools import islice
+
+from decoder import UuidDecoder
+from metrics import Metrics, add_scan_gauges
+from pipeline import ScanPipeline
+from presence import PresenceTracker
+from ranking import attach_ranking
+from scan_engine import ScanEngine
+
+
+def device_to_json(address, info):
+    """JSON-safe view of one ScanPipeline.devices entry."""
+    return {
+        "address": address,
+        "name": info["name"],
+        "phone": info["phone"],
+        "card": info["card"],
+        "rssi": info["rssi"],
+        "raw_rssi": info["raw_rssi"],
+        "uuids": info["uuids"],
+        "adverts": info["presence"].adverts,
+        "dwell": round(info["presence"].dwell, 3),
+    }
+
+
+def advert_to_json(ad):
+    return {
+        "address": ad.address,
+        "name": ad.name,
+        "rssi": ad.rssi,
+        "uuids": ad.service_uuids,
+        "manufacturer_data": {str(k): v.hex() for k, v in ad.manufacturer_data.items()},
+        "service_data": {k: v.hex() for k, v in ad.service_data.items()},
+    }
+
+
+class Subscription:
+    """Bounded event queue for one consumer; oldest events are dropped when full."""
+
+    def __init__(self, core, maxsize):
+        self._core = core
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def put(self, event):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self._core.unsubscribe(self)
+
+
+class ScannerCore:
+    """Scanning + decoding + device registry with a push stream of device events.
+
+    Events are dicts: {"type": "device", "change": "appear" | "update" | "leave",
+    "ts": ..., "device": {...}, "advert": {...}} ("advert" is absent for leave).
+    """
+
+    def __init__(self, scanner_factory=None, scanning_mode="active", dedup_interval=1.0,
+                 session_log=None, log_message=None, name_filter="", decoder=None,
+                 presence=None, sweep_interval=1.0, metrics=None):
+        self.decoder = decoder or UuidDecoder()
+        self.metrics = metrics or Metrics()
+        self.session_log = session_log
+        self._log_message = log_message
+        self.pipeline = ScanPipeline(self.decoder, self.log_message, session_log,
+                                     name_filter=name_filter, track_changes=False,
+                                     presence=presence or PresenceTracker(), timer=self.metrics)
+        self.pipeline.add_listener(self._on_device_event)
+        self.devices = self.pipeline.devices
+        self.ranking = attach_ranking(self.pipeline)
+        self.engine = ScanEngine(
+            self.pipeline.handle,
+            scanning_mode=scanning_mode,
+            dedup_interval=dedup_interval,
+            scanner_factory=scanner_factory,
+        )
+        self.sweep_interval = sweep_interval
+        self.started_at = None
+        self._subscribers = set()
+        self._sweeper = None
+        add_scan_gauges(self.metrics, self.pipeline, lambda: self.engine)
+        self.metrics.gauge("subscribers", lambda: len(self._subscribers))
+
+    def log_message(self, msg, color="white"):
+        if self._log_message is not None:
+            self._log_message(msg, color)
+        elif self.session_log is not None:
+            self.session_log.write("log", msg=msg, color=color)
+
+    @property
+    def is_scanning(self):
+        return self.engine.is_running
+
+    async def start(self):
+        if self.engine.is_running:
+            return
+        self.log_message(f"Starting BLE Scan ({self.engine.scanning_mode} mode)...", color="amber")
+        if self.session_log is not None:
+            self.session_log.write("scan_start", mode=self.engine.scanning_mode)
+        await self.engine.start()
+        self.started_at = time.time()
+        self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self):
+        if not self.engine.is_running:
+            return
+        await self.engine.stop()
+        sweeper, self._sweeper = self._sweeper, None
+        if sweeper is not None:
+            sweeper.cancel()
+        if self.session_log is not None:
+            self.session_log.write("scan_stop", devices=len(self.devices))
+        self.log_message("Scan stopped.", color="amber")
+
+    def subscribe(self, maxsize=1000):
+        subscription = Subscription(self, maxsize)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self._subscribers.discard(subscription)
+
+    def publish(self, event):
+        for subscription in self._subscribers:
+            subscription.put(event)
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            with self.metrics.time("sweep"):
+                self.pipeline.sweep()
+
+    def _on_device_event(self, kind, address, info, ad):
+        if not self._subscribers or address not in self.pipeline.visible:
+            return
+        event = {
+            "type": "device",
+            "change": kind,
+            "ts": time.time(),
+            "device": device_to_json(address, info),
+        }
+        if ad is not None:
+            event["advert"] = advert_to_json(ad)
+        self.publish(event)
+
+    def snapshot(self):
+        visible = self.pipeline.visible
+        return [device_to_json(address, info) for address, info in self.devices.items() if address in visible]
+
+    def nearest(self, k=1, min_rssi=None):
+        """The k strongest decoded visible devices (optionally only those at or above min_rssi)."""
+        if self.pipeline.device_filter:
+            visible = self.pipeline.visible
+            ranked = islice(((address, rssi) for address, rssi in self.ranking
+                             if address in visible and (min_rssi is None or rssi >= min_rssi)), k)
+        else:
+            ranked = self.ranking.top(k) if min_rssi is None else self.ranking.above(min_rssi)[:k]
+        return [device_to_json(address, self.devices[address]) for address, _ in ranked]
+
+    def status(self):
+        return {
+            "scanning": self.is_scanning,
+            "mode": self.engine.scanning_mode,
+            "started_at": self.started_at,
+            "devices": len(self.devices),
+            "visible": len(self.pipeline.visible),
+            "tracked": len(self.pipeline.presence),
+            "subscribers": len(self._subscribers),
+            "received": self.engine.received,
+            "delivered": self.engine.delivered,
+            "duplicates": self.engine.duplicates,
+            "decoder": self.decoder.stats(),
+        }
@@ -0,0 +1,348 @@
+"""Headless scanner service with a local HTTP + WebSocket API.
+
+Runs a ScannerCore without any GUI and serves it on localhost:
+
+    GET  /status            engine, decoder and subscriber counters
+    GET  /devices           current device registry
+    GET  /devices/<address> one device
+    GET  /nearest?k=&min_rssi= strongest decoded devices (default k=1)
+    GET  /metrics           per-stage histograms and counters (Prometheus text)
+    GET  /metrics.json      the same as JSON
+    POST /scan/start        start scanning
+    POST /scan/stop         stop scanning
+    GET  /events            WebSocket: a "snapshot" message, then one "device"
+                            message per advertisement that reached the registry
+
+    python scanner_service.py --port 8765
+    python scanner_service.py --fake-scanner
+    python main.py --connect ws://127.0.0.1:8765/events   # UI as a client
+
+RemoteScannerSource is the client side: a ScanEngine scanner_factory that
+turns the /events stream back into advertisements, so the Flet UI (or any
+other display) can share one radio with other clients.
+"""
+import argparse
+import asyncio
+import json
+import signal
+import urllib.parse
+
+import ws_protocol
+from device_filter import DeviceFilter, FilterError
+from scan_engine import FakeDevice, FakeAdvertisementData, FakeAdvertisementSource
+from scanner_core import ScannerCore, device_to_json
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_HEADER_LINES = 100
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+
+class ScannerService:
+    """asyncio HTTP/WebSocket front end for a ScannerCore."""
+
+    def __init__(self, core, host=DEFAULT_HOST, port=DEFAULT_PORT, queue_size=1000):
+        self.core = core
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        sockets = self._server.sockets or []
+        if sockets:
+            self.port = sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            parts = request_line.decode("latin-1").split()
+            if len(parts) != 3:
+                return
+            method, target, _ = parts
+            headers = {}
+            for _ in range(MAX_HEADER_LINES):
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            url = urllib.parse.urlsplit(target)
+            path = url.path
+
+            if path == "/events" and headers.get("upgrade", "").lower() == "websocket":
+                await self._serve_events(reader, writer, headers)
+                return
+            status, body = await self._route(method, path, urllib.parse.parse_qs(url.query))
+            if isinstance(body, str):
+                self._write_body(writer, status, body.encode("utf-8"), "text/plain; version=0.0.4")
+            else:
+                self._write_json(writer, status, body)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, path, query=None):
+        if path == "/status":
+            return (200, self.core.status()) if method == "GET" else (405, {"error": "GET only"})
+        if path == "/devices":
+            return (200, self.core.snapshot()) if method == "GET" else (405, {"error": "GET only"})
+        if path.startswith("/devices/"):
+            if method != "GET":
+                return 405, {"error": "GET only"}
+            address = urllib.parse.unquote(path[len("/devices/"):])
+            info = self.core.devices.get(address)
+            if info is None or address not in self.core.pipeline.visible:
+                return 404, {"error": f"Unknown device: {address}"}
+            return 200, device_to_json(address, info)
+        if path in ("/metrics", "/metrics.json"):
+            if method != "GET":
+                return 405, {"error": "GET only"}
+            metrics = self.core.metrics
+            return 200, metrics.snapshot() if path.endswith(".json") else metrics.to_prometheus()
+        if path == "/nearest":
+            if method != "GET":
+                return 405, {"error": "GET only"}
+            query = query or {}
+            try:
+                k = int(query.get("k", ["1"])[0])
+                min_rssi = float(query["min_rssi"][0]) if "min_rssi" in query else None
+            except ValueError as ex:
+                return 400, {"error": str(ex)}
+            if k < 1:
+                return 400, {"error": f"k must be at least 1, got {k}"}
+            return 200, self.core.nearest(k, min_rssi)
+        if path in ("/scan/start", "/scan/stop"):
+            if method != "POST":
+                return 405, {"error": "POST only"}
+            try:
+                if path == "/scan/start":
+                    await self.core.start()
+                else:
+                    await self.core.stop()
+            except Exception as ex:
+                return 400, {"error": str(ex)}
+            return 200, self.core.status()
+        return 404, {"error": f"Unknown path: {path}"}
+
+    @classmethod
+    def _write_json(cls, writer, status, body):
+        cls._write_body(writer, status, json.dumps(body).encode("utf-8"), "application/json")
+
+    @staticmethod
+    def _write_body(writer, status, payload, content_type):
+        writer.write((
+            f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode("ascii") + payload)
+
+    async def _serve_events(self, reader, writer, headers):
+        key = headers.get("sec-websocket-key")
+        if not key:
+            self._write_json(writer, 400, {"error": "Missing Sec-WebSocket-Key"})
+            await writer.drain()
+            return
+        writer.write((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {ws_protocol.accept_key(key)}\r\n\r\n"
+        ).encode("ascii"))
+        subscription = self.core.subscribe(self.queue_size)
+        writer.write(ws_protocol.encode_frame(json.dumps({"type": "snapshot", "devices": self.core.snapshot()})))
+        await writer.drain()
+
+        async def receive():
+            # Only control frames matter from the client side.
+            while True:
+                opcode, payload = await ws_protocol.read_frame(reader)
+                if opcode == ws_protocol.OP_CLOSE:
+                    return
+                if opcode == ws_protocol.OP_PING:
+                    writer.write(ws_protocol.encode_frame(payload, ws_protocol.OP_PONG))
+
+        receiver = asyncio.create_task(receive())
+        try:
+            while not receiver.done():
+                getter = asyncio.create_task(subscription.get())
+                done, _ = await asyncio.wait({getter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+                if getter not in done:
+                    getter.cancel()
+                    break
+                writer.write(ws_protocol.encode_frame(json.dumps(getter.result())))
+                await writer.drain()
+            writer.write(ws_protocol.encode_frame(b"", ws_protocol.OP_CLOSE))
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ws_protocol.WebSocketError):
+            pass
+        finally:
+            subscription.close()
+            receiver.cancel()
+
+
+class RemoteScannerSource:
+    """ScanEngine backend that consumes a scanner service's /events stream.
+
+    Reconnects with exponential backoff (up to `max_backoff` seconds) when the
+    service goes away. The snapshot sent on connect is replayed as adverts so
+    the client starts with the full registry.
+    """
+
+    def __init__(self, detection_callback, url, max_backoff=10.0):
+        self.detection_callback = detection_callback
+        parsed = urllib.parse.urlsplit(url)
+        self.host = parsed.hostname or DEFAULT_HOST
+        self.port = parsed.port or DEFAULT_PORT
+        self.path = parsed.path or "/events"
+        self.max_backoff = max_backoff
+        self.connected = False
+        self.received = 0
+        self._task = None
+
+    @classmethod
+    def factory(cls, url, **kwargs):
+        return lambda detection_callback, scanning_mode: cls(detection_callback, url, **kwargs)
+
+    def _emit(self, device):
+        adv = FakeAdvertisementData(
+            device.get("name"), device.get("rssi", 0), device.get("uuids") or [],
+            {int(k): bytes.fromhex(v) for k, v in (device.get("manufacturer_data") or {}).items()},
+            {k: bytes.fromhex(v) for k, v in (device.get("service_data") or {}).items()},
+        )
+        self.received += 1
+        self.detection_callback(FakeDevice(device["address"], device.get("name")), adv)
+
+    async def _run(self):
+        backoff = 0.5
+        while True:
+            try:
+                reader, writer = await ws_protocol.client_connect(self.host, self.port, self.path)
+            except (OSError, asyncio.TimeoutError, ws_protocol.WebSocketError):
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            self.connected = True
+            backoff = 0.5
+            try:
+                while True:
+                    opcode, payload = await ws_protocol.read_frame(reader)
+                    if opcode == ws_protocol.OP_CLOSE:
+                        break
+                    if opcode == ws_protocol.OP_PING:
+                        writer.write(ws_protocol.encode_frame(payload, ws_protocol.OP_PONG, mask=True))
+                        continue
+                    if opcode != ws_protocol.OP_TEXT:
+                        continue
+                    message = json.loads(payload)
+                    if message.get("type") == "snapshot":
+                        for device in message.get("devices", []):
+                            self._emit(device)
+                    elif message.get("type") == "device" and "advert" in message:
+                        self._emit(message["advert"])
+            except (ConnectionError, asyncio.IncompleteReadError, ws_protocol.WebSocketError, ValueError):
+                pass
+            finally:
+                self.connected = False
+                writer.close()
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+def build_scanner_factory(args):
+    if args.replay:
+        from replay import ReplaySource
+        return ReplaySource.factory(args.replay, speed=args.replay_speed)
+    if args.fake_scanner:
+        return FakeAdvertisementSource.factory(devices=20, interval=0.5)
+    return None
+
+
+async def serve(args):
+    from session_log import SessionLogWriter
+
+    session_log = None if args.no_session_log else SessionLogWriter(args.log_dir).start()
+    log = (lambda msg, color="white": print(msg, flush=True)) if args.verbose else None
+    core = ScannerCore(
+        scanner_factory=build_scanner_factory(args),
+        scanning_mode=args.mode,
+        dedup_interval=args.dedup,
+        session_log=session_log,
+        log_message=log,
+        name_filter=args.device_filter,
+    )
+    service = await ScannerService(core, args.host, args.port).start()
+    print(f"Scanner service listening on http://{service.host}:{service.port} (events: ws://{service.host}:{service.port}/events)", flush=True)
+    if not args.no_autostart:
+        await core.start()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows: Ctrl+C raises KeyboardInterrupt instead
+    try:
+        await stop.wait()
+    finally:
+        await core.stop()
+        await service.stop()
+        if session_log is not None:
+            session_log.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless BLE scanner service (HTTP + WebSocket API).")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--mode", choices=("active", "passive"), default="active")
+    parser.add_argument("--dedup", type=float, default=1.0, help="duplicate filter window (s)")
+    parser.add_argument("--filter", default="", help="device filter expression applied by the service (see device_filter.py)")
+    parser.add_argument("--fake-scanner", action="store_true")
+    parser.add_argument("--replay", nargs="+", metavar="FILE")
+    parser.add_argument("--replay-speed", type=float, default=1.0)
+    parser.add_argument("--log-dir", default="logs")
+    parser.add_argument("--no-session-log", action="store_true")
+    parser.add_argument("--no-autostart", action="store_true", help="wait for POST /scan/start")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print scan log lines")
+    parser.add_argument("--profile", metavar="FILE", help="run under cProfile and write the stats on exit")
+    args = parser.parse_args(argv)
+    try:
+        args.device_filter = DeviceFilter(args.filter)
+    except FilterError as ex:
+        parser.error(f"--filter: {ex}")
+    if args.profile:
+        from metrics import start_profile
+        start_profile(args.profile)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""Streaming structured session log.
+
+SessionLogWriter appends one JSON object per line (NDJSON) to files in
+`logs/`, rotating them by size and age. Records are queued by the caller and
+written by a background thread, so the asyncio/Flet loop never blocks on disk.
+Rotated files can optionally be gzip-compressed.
+
+The module also reads those files back: iter_records() streams one or many
+sessions (plain or .gz) and follow() tails the live file across rotations.
+
+    python session_log.py cat logs/session_*.ndjson*
+    python session_log.py tail --directory logs
+"""
+import argparse
+import datetime
+import gzip
+import json
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+
+SUFFIX = ".ndjson"
+_STOP = object()
+
+
+def _json_default(value):
+    if isinstance(value, (bytes, bytearray)):
+        return value.hex()
+    return str(value)
+
+
+class SessionLogWriter:
+    """Background NDJSON writer with size/time rotation.
+
+    A new file is started when the current one exceeds `max_bytes` or is older
+    than `max_age` seconds. With `compress=True` each finished file is gzipped
+    (`*.ndjson.gz`) and the plain file removed. Buffered data reaches disk at
+    least every `flush_interval` seconds.
+    """
+
+    def __init__(self, directory="logs", prefix="session", max_bytes=10 * 1024 * 1024,
+                 max_age=3600, compress=False, flush_interval=1.0, buffer_size=64 * 1024):
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.compress = compress
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+        self.current_path = None
+        self.records_written = 0
+        self.files_rotated = 0
+        self.errors = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._file = None
+        self._file_bytes = 0
+        self._file_opened_at = 0.0
+
+    def start(self):
+        if self._thread is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._thread = threading.Thread(target=self._run, name="session-log-writer", daemon=True)
+            self._thread.start()
+        return self
+
+    def write(self, event, **fields):
+        """Queues one record; safe to call from any thread."""
+        record = {"ts": round(time.time(), 3), "event": event}
+        record.update(fields)
+        self._queue.put(record)
+
+    def close(self, timeout=5.0):
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def stats(self):
+        return {
+            "records_written": self.records_written,
+            "files_rotated": self.files_rotated,
+            "errors": self.errors,
+            "current_path": self.current_path,
+        }
+
+    # --- writer thread ---
+
+    def _run(self):
+        try:
+            while True:
+                try:
+                    record = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    self._flush()
+                    self._maybe_rotate()
+                    continue
+                if record is _STOP:
+                    break
+                self._write_record(record)
+                # Drain whatever else is already queued before flushing.
+                while True:
+                    try:
+                        record = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if record is _STOP:
+                        return
+                    self._write_record(record)
+                self._flush()
+        finally:
+            self._close_file()
+
+    def _write_record(self, record):
+        try:
+            line = json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=_json_default) + "\n"
+            self._maybe_rotate()
+            if self._file is None:
+                self._open_file()
+            self._file.write(line)
+            self._file_bytes += len(line.encode("utf-8"))
+            self.records_written += 1
+        except Exception:
+            self.errors += 1
+
+    def _flush(self):
+        if self._file is not None:
+            try:
+                self._file.flush()
+            except Exception:
+                self.errors += 1
+
+    def _maybe_rotate(self):
+        if self._file is None:
+            return
+        if self._file_bytes >= self.max_bytes or time.time() - self._file_opened_at >= self.max_age:
+            self._close_file()
+            self.files_rotated += 1
+
+    def _open_file(self):
+        stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(self.directory, f"{self.prefix}_{stamp}{SUFFIX}")
+        counter = 1
+        while os.path.exists(path) or os.path.exists(path + ".gz"):
+            path = os.path.join(self.directory, f"{self.prefix}_{stamp}_{counter}{SUFFIX}")
+            counter += 1
+        self._file = open(path, "w", encoding="utf-8", buffering=self.buffer_size)
+        self._file_bytes = 0
+        self._file_opened_at = time.time()
+        self.current_path = path
+
+    def _close_file(self):
+        if self._file is None:
+            return
+        path = self.current_path
+        try:
+            self._file.close()
+        except Exception:
+            self.errors += 1
+        self._file = None
+        if self.compress:
+            try:
+                with open(path, "rb") as src, gzip.open(path + ".gz", "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                os.remove(path)
+            except Exception:
+                self.errors += 1
+
+
+# --- Reading ---
+
+def session_files(directory="logs", prefix="session"):
+    """Session files in `directory`, oldest first (names sort by timestamp)."""
+    if not os.path.isdir(directory):
+        return []
+    names = [
+        n for n in os.listdir(directory)
+        if n.startswith(prefix + "_") and (n.endswith(SUFFIX) or n.endswith(SUFFIX + ".gz"))
+    ]
+    return [os.path.join(directory, n) for n in sorted(names)]
+
+
+def open_text(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def iter_records(paths):
+    """Streams records from one or many session files; skips truncated lines."""
+    if isinstance(paths, str):
+        paths = [paths]
+    for path in paths:
+        with open_text(path) as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # partially written last line
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def follow(directory="logs", prefix="session", poll_interval=0.5, from_start=False):
+    """Tails the newest session file, moving on to newer files as they rotate in."""
+    current = None
+    f = None
+    pending = ""
+    try:
+        while True:
+            files = [p for p in session_files(directory, prefix) if not p.endswith(".gz")]
+            newest = files[-1] if files else None
+            if newest != current and newest is not None:
+                if f is not None:
+                    f.close()
+                current = newest
+                f = open(current, "r", encoding="utf-8")
+                if not from_start:
+                    f.seek(0, os.SEEK_END)
+                from_start = True  # later files are read from their beginning
+                pending = ""
+            if f is None:
+                time.sleep(poll_interval)
+                continue
+            chunk = f.readline()
+            if not chunk:
+                time.sleep(poll_interval)
+                continue
+            pending += chunk
+            if not pending.endswith("\n"):
+                continue
+            line, pending = pending, ""
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+    finally:
+        if f is not None:
+            f.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Read NDJSON session logs.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    cat = sub.add_parser("cat", help="print records from session files")
+    cat.add_argument("paths", nargs="*", help="files to read (default: all sessions in --directory)")
+    cat.add_argument("--directory", default="logs")
+    cat.add_argument("--event", help="only records of this event type")
+    tail = sub.add_parser("tail", help="follow the live session file")
+    tail.add_argument("--directory", default="logs")
+    tail.add_argument("--event", help="only records of this event type")
+    args = parser.parse_args(argv)
+
+    if args.command == "cat":
+        records = iter_records(args.paths or session_files(args.directory))
+    else:
+        records = follow(args.directory)
+    try:
+        for record in records:
+            if args.event and record.get("event") != args.event:
+                continue
+            sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
+
+
+if __name__ == "__main__":
+    main()
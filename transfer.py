@@ -0,0 +1,198 @@
+"""MTU-aware chunked writes with sequence numbers and a CRC.
+
+A payload that does not fit into one ATT write is split into frames of at
+most the negotiated write size:
+
+    frame   = flags (1 byte) | seq (uint16 BE) | body
+    flags   = FIRST (0x01) on the first frame, LAST (0x02) on the last one
+    message = total length (uint32 BE) | payload | CRC-32 of payload (uint32 BE)
+
+The message is cut into frame bodies in order, so the length is at the start
+of the first frame and the CRC at the end of the last. FrameAssembler does
+the reverse (receiver side; used by benchmarks/bench_transfer.py to check
+what the fake peripheral received).
+
+ChunkedWriter streams the frames with write-without-response when the
+characteristic allows it, making every `window`-th frame and the last one an
+acknowledged write so the sender never runs more than a window ahead of the
+peripheral. If the characteristic cannot do writes without response, or one
+fails, it continues with acknowledged writes only.
+"""
+import struct
+import time
+import zlib
+
+FLAG_FIRST = 0x01
+FLAG_LAST = 0x02
+HEADER = struct.Struct(">BH")  # flags, seq
+LENGTH = struct.Struct(">I")
+CRC = struct.Struct(">I")
+DEFAULT_MTU = 23  # ATT default before an MTU exchange
+
+
+class FrameError(ValueError):
+    pass
+
+
+def write_size(client, char):
+    """Largest single write to `char` on this connection (ATT MTU - 3 if the backend does not say)."""
+    size = getattr(char, "max_write_without_response_size", None)
+    if not size:
+        size = (getattr(client, "mtu_size", None) or DEFAULT_MTU) - 3
+    return size
+
+
+def frame_payload(payload, size):
+    """Splits `payload` into frames of at most `size` bytes."""
+    room = size - HEADER.size
+    if room < 1:
+        raise ValueError(f"Write size {size} is too small for framing")
+    body = LENGTH.pack(len(payload)) + bytes(payload) + CRC.pack(zlib.crc32(payload))
+    frames = []
+    count = (len(body) + room - 1) // room
+    for seq in range(count):
+        flags = (FLAG_FIRST if seq == 0 else 0) | (FLAG_LAST if seq == count - 1 else 0)
+        frames.append(HEADER.pack(flags, seq & 0xFFFF) + body[seq * room:(seq + 1) * room])
+    return frames
+
+
+class FrameAssembler:
+    """Reassembles frames into messages; feed() returns the payload once complete."""
+
+    def __init__(self, max_size=1024 * 1024):
+        self.max_size = max_size
+        self.messages = 0
+        self.errors = 0
+        self._parts = None
+        self._next_seq = 0
+        self._size = 0
+
+    def reset(self):
+        self._parts = None
+
+    def feed(self, frame):
+        if len(frame) < HEADER.size:
+            return self._fail("short frame")
+        flags, seq = HEADER.unpack_from(frame)
+        if flags & FLAG_FIRST:
+            self._parts = []
+            self._next_seq = seq
+            self._size = 0
+        elif self._parts is None:
+            return self._fail(f"frame {seq} without a first frame")
+        if seq != self._next_seq:
+            return self._fail(f"expected frame {self._next_seq}, got {seq}")
+        self._next_seq = (seq + 1) & 0xFFFF
+        self._parts.append(bytes(frame[HEADER.size:]))
+        self._size += len(frame) - HEADER.size
+        if self._size > self.max_size + LENGTH.size + CRC.size:
+            return self._fail("message too large")
+        if not flags & FLAG_LAST:
+            return None
+
+        body = b"".join(self._parts)
+        self._parts = None
+        if len(body) < LENGTH.size + CRC.size:
+            return self._fail("truncated message")
+        (length,) = LENGTH.unpack_from(body)
+        payload = body[LENGTH.size:-CRC.size]
+        (crc,) = CRC.unpack_from(body, len(body) - CRC.size)
+        if length != len(payload):
+            return self._fail(f"length {len(payload)} != announced {length}")
+        if zlib.crc32(payload) != crc:
+            return self._fail("CRC mismatch")
+        self.messages += 1
+        return payload
+
+    def _fail(self, reason):
+        self._parts = None
+        self.errors += 1
+        raise FrameError(reason)
+
+
+class TransferReport:
+    __slots__ = ("bytes", "frames", "frame_size", "unacked", "acked", "fallback", "elapsed")
+
+    def __init__(self, size, frames, frame_size):
+        self.bytes = size
+        self.frames = frames
+        self.frame_size = frame_size
+        self.unacked = 0   # writes without response
+        self.acked = 0     # writes with response
+        self.fallback = None  # why streaming switched to acknowledged writes
+        self.elapsed = 0.0
+
+    @property
+    def bytes_per_s(self):
+        return self.bytes / self.elapsed if self.elapsed else 0.0
+
+    def to_json(self):
+        data = {name: getattr(self, name) for name in self.__slots__}
+        data["bytes_per_s"] = round(self.bytes_per_s, 1)
+        return data
+
+    def __str__(self):
+        mode = f"{self.unacked} streamed + {self.acked} acknowledged" if self.unacked else f"{self.acked} acknowledged"
+        text = (f"{self.bytes} bytes in {self.frames} frame(s) of <= {self.frame_size} B, {mode}, "
+                f"{self.elapsed * 1000:.0f} ms, {self.bytes_per_s / 1024:.1f} KiB/s")
+        if self.fallback:
+            text += f" (fallback: {self.fallback})"
+        return text
+
+
+class ChunkedWriter:
+    """Writes payloads of any size to one characteristic.
+
+    stream=True uses writes without response (with an acknowledged write
+    every `window` frames); stream=False acknowledges every frame.
+    """
+
+    def __init__(self, client, char, stream=True, window=8):
+        self.client = client
+        self.char = char
+        self.window = max(1, window)
+        self.can_ack = "write" in char.properties
+        # Without "write" there is nothing to wait on: stream even if acknowledged writes were asked for.
+        self.stream = "write-without-response" in char.properties and (stream or not self.can_ack)
+
+    async def send(self, payload):
+        size = write_size(self.client, self.char)
+        frames = frame_payload(payload, size)
+        report = TransferReport(len(payload), len(frames), size)
+        started = time.perf_counter()
+        stream = self.stream
+        write = self.client.write_gatt_char
+        last = len(frames) - 1
+        for i, frame in enumerate(frames):
+            if stream:
+                ack = self.can_ack and ((i + 1) % self.window == 0 or i == last)
+                try:
+                    await write(self.char, frame, response=ack)
+                except Exception as ex:
+                    if not self.can_ack:
+                        raise
+                    report.fallback = str(ex) or type(ex).__name__
+                    stream = False
+                else:
+                    if ack:
+                        report.acked += 1
+                    else:
+                        report.unacked += 1
+                    continue
+            await write(self.char, frame, response=True)
+            report.acked += 1
+        report.elapsed = time.perf_counter() - started
+        return report
+
+
+async def send_payload(client, char, payload, response=True, window=8):
+    """Writes `payload`: a single write if it fits, otherwise a framed chunked transfer.
+
+    `response` only applies to the single write; a chunked transfer always
+    streams with an acknowledged write every `window` frames and at the end.
+    Returns None for a single write, or the TransferReport of the transfer.
+    """
+    if len(payload) <= write_size(client, char):
+        await client.write_gatt_char(char, payload, response=response)
+        return None
+    return await ChunkedWriter(client, char, window=window).send(payload)
@@ -0,0 +1,111 @@
+"""Minimal WebSocket (RFC 6455) framing on top of asyncio streams.
+
+Only what the scanner service needs: the opening handshake on both sides,
+unfragmented text/binary frames, ping/pong and close. Kept dependency-free so
+the headless service runs with the same requirements as the app.
+"""
+import asyncio
+import base64
+import hashlib
+import os
+import struct
+
+GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+MAX_FRAME = 1024 * 1024
+
+
+class WebSocketError(Exception):
+    pass
+
+
+def accept_key(key):
+    digest = hashlib.sha1((key + GUID).encode("ascii")).digest()
+    return base64.b64encode(digest).decode("ascii")
+
+
+def encode_frame(payload, opcode=OP_TEXT, mask=False):
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    header = bytearray([0x80 | opcode])
+    mask_bit = 0x80 if mask else 0
+    length = len(payload)
+    if length < 126:
+        header.append(mask_bit | length)
+    elif length < 1 << 16:
+        header.append(mask_bit | 126)
+        header += struct.pack("!H", length)
+    else:
+        header.append(mask_bit | 127)
+        header += struct.pack("!Q", length)
+    if mask:
+        key = os.urandom(4)
+        header += key
+        payload = bytes(b ^ key[i % 4] for i, b in enumerate(payload))
+    return bytes(header) + payload
+
+
+async def read_frame(reader):
+    """Reads one message; returns (opcode, payload). Continuation frames are joined."""
+    opcode = None
+    chunks = []
+    while True:
+        first, second = await reader.readexactly(2)
+        fin = first & 0x80
+        frame_op = first & 0x0F
+        length = second & 0x7F
+        if length == 126:
+            (length,) = struct.unpack("!H", await reader.readexactly(2))
+        elif length == 127:
+            (length,) = struct.unpack("!Q", await reader.readexactly(8))
+        if length > MAX_FRAME:
+            raise WebSocketError(f"Frame too large: {length}")
+        key = await reader.readexactly(4) if second & 0x80 else None
+        payload = await reader.readexactly(length)
+        if key is not None:
+            payload = bytes(b ^ key[i % 4] for i, b in enumerate(payload))
+        if frame_op >= OP_CLOSE:
+            # Control frames may arrive between fragments.
+            return frame_op, payload
+        if frame_op != OP_CONTINUATION:
+            opcode = frame_op
+        chunks.append(payload)
+        if fin:
+            return opcode, b"".join(chunks)
+
+
+async def client_connect(host, port, path="/", timeout=5.0):
+    """Opens a WebSocket connection; returns (reader, writer) after the handshake."""
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    key = base64.b64encode(os.urandom(16)).decode("ascii")
+    writer.write((
+        f"GET {path} HTTP/1.1\r\n"
+        f"Host: {host}:{port}\r\n"
+        "Upgrade: websocket\r\n"
+        "Connection: Upgrade\r\n"
+        f"Sec-WebSocket-Key: {key}\r\n"
+        "Sec-WebSocket-Version: 13\r\n\r\n"
+    ).encode("ascii"))
+    await writer.drain()
+    status = await asyncio.wait_for(reader.readline(), timeout)
+    if b" 101 " not in status:
+        writer.close()
+        raise WebSocketError(f"Handshake failed: {status.decode('latin-1').strip()}")
+    headers = {}
+    while True:
+        line = await asyncio.wait_for(reader.readline(), timeout)
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if headers.get("sec-websocket-accept") != accept_key(key):
+        writer.close()
+        raise WebSocketError("Handshake failed: bad Sec-WebSocket-Accept")
+    return reader, writer